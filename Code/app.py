@@ -1,26 +1,60 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_from_directory, Response, stream_with_context, g
+from werkzeug.exceptions import RequestEntityTooLarge, TooManyRequests, GatewayTimeout
+from werkzeug.utils import secure_filename
 import os
-import uuid
+import logging
+import tarfile
+import zipfile
 import json
 import time
 from datetime import datetime
 
 from db import init_db, create_user, get_user
+from ingest import IngestRequest, HashingUploadFile, finalize_upload, ingest_stream
+from janitor import start_janitor, sweep, get_metrics as janitor_metrics
+from audit import start_audit, log_event, query_audit, get_metrics as audit_metrics
+from config import MAX_UPLOAD_BYTES, CHAIN_PAGE_SIZE, CHAIN_MAX_PAGE_SIZE
+from config import RECONSTRUCTED_DIR, ARTIFACT_WAIT_SECONDS, AUDIT_PAGE_SIZE, METRICS_ENABLED, REQUEST_TIMINGS
+from config import PROFILE_DIR, PROFILE_ENDPOINTS, PROFILE_HEADER, ADMIN_EMAILS, BATCH_MAX_ITEMS, BATCH_MAX_BYTES
+import metrics
+import profiling
+from core.ledger import query_ledger, load_ledger, rebuild_checkpoints
+from core import checkpoints
+from core.cache import json_cache
+from core.registry import pack_cache_stats, find_reference
+from core import similarity
 
 # --- IMPORTS ---
+# services.image_verify_service (NumPy / PIL) is imported inside the views
+# that need it, and OpenCV inside the video services, so login-only
+# processes never load the media libraries.
 from services.image_register_service import register_image
-from services.image_verify_service import verify_image
 from services.video_register_service import register_video
-from services.video_verify_service import verify_video, reconstruct_video_content 
+from services.video_verify_service import verify_video, precheck_video, reconstruct_video_content 
+from services.batch_verify_service import verify_batch_ndjson
+from core.media_types import detect_media_type
+from services.bundle_service import export_bundle
+from services import artifact_service
+from services import compute_service
 
 app = Flask(__name__)
 app.secret_key = "dev-secret-key"
 
+# Uploads are hashed + size-checked while streaming to disk (see ingest.py)
+app.request_class = IngestRequest
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
+
 # =========================
 # INIT DB
 # =========================
 init_db()
 
+# Background retention for temp uploads / derived artifacts
+start_janitor()
+
+# Buffered audit log writer
+start_audit()
+
 # =========================
 # PATHS
 # =========================
@@ -34,43 +68,108 @@ os.makedirs(UPLOAD_VIDEO, exist_ok=True)
 os.makedirs(OUTPUTS_DIR, exist_ok=True)
 os.makedirs(REGISTRY_DIR, exist_ok=True)
 
+# =========================
+# REQUEST METRICS
+# Every request records its stage timings (including those replayed from
+# compute workers); see metrics.py and GET /metrics.
+# =========================
+def timings_requested():
+    return REQUEST_TIMINGS or request.args.get("timings") == "1" or request.headers.get("X-Request-Timings") == "1"
+
+
+def with_timings(result):
+    """Adds the per-stage breakdown of this request to a JSON result when asked for."""
+    if timings_requested():
+        result = dict(result, timings=metrics.current_timings())
+    return result
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.metrics_token = metrics.start_recording()
+
+
+@app.after_request
+def finish_request_metrics(response):
+    started = g.get("metrics_started")
+    if started is None:
+        return response
+
+    elapsed = time.perf_counter() - started
+    metrics.observe("http_request_seconds", elapsed, endpoint=request.endpoint or "unmatched",
+                    method=request.method, status=response.status_code)
+
+    if timings_requested():
+        stages = [f"{stage.replace('.', '_')};dur={seconds * 1000:.1f}"
+                  for stage, seconds in metrics.current_timings().items()]
+        response.headers["Server-Timing"] = ", ".join(stages + [f"total;dur={elapsed * 1000:.1f}"])
+    return response
+
+
+@app.teardown_request
+def stop_request_metrics(_exc):
+    token = g.pop("metrics_token", None)
+    if token is not None:
+        metrics.stop_recording(token)
+
+@app.teardown_request
+def discard_upload_spools(_exc):
+    # Upload parts the view rejected before finalize_upload() would stay in staging;
+    # finalized uploads become evictable by the janitor again
+    request.discard_spools()
+    request.release_uploads()
+
+# =========================
+# REQUEST PROFILING (opt-in, see profiling.py)
+# Header "X-Profile: 1" (admins), POST /admin/profiles {"next": N} or sampling.
+# Only logged-in requests are profiled, so rejected ones neither write
+# profiles nor use up armed slots. The response names the profile in X-Profile-Id.
+# =========================
+@app.before_request
+def start_request_profile():
+    if request.endpoint not in PROFILE_ENDPOINTS or "user" not in session:
+        return
+    trigger = profiling.should_profile(request.headers.get(PROFILE_HEADER) if is_admin() else None)
+    if trigger:
+        g.profile = profiling.start(trigger, request.headers.get("X-Request-ID"))
+
+
+@app.after_request
+def tag_request_profile(response):
+    session_profile = g.get("profile")
+    if session_profile is not None:
+        g.profile_status = response.status_code
+        response.headers["X-Profile-Id"] = session_profile["id"]
+    return response
+
+
+@app.teardown_request
+def stop_request_profile(exc):
+    session_profile = g.pop("profile", None)
+    if session_profile is None:
+        return
+    try:
+        # Runs before stop_request_metrics (teardowns run in reverse), so timings are still recorded
+        profiling.finish(session_profile, endpoint=request.endpoint, method=request.method, path=request.path,
+                         status=g.get("profile_status", 500), user=session.get("user"),
+                         error=str(exc) if exc else None, timings=metrics.current_timings())
+    except Exception:
+        metrics.inc("profile_failures_total")
+        app.logger.exception("Saving profile %s failed", session_profile["id"])
+
 # =========================
 # HELPER: LOG USER LOGIN
 # =========================
 def log_user_login(username, email):
     """
-    Appends login events to registry/user_logs.json
+    Records login events in the audit log (registry/audit/audit.jsonl)
     """
-    log_path = os.path.join(REGISTRY_DIR, "user_logs.json")
-    
-    # Create entry
-    entry = {
-        "username": username,
-        "email": email,
-        "timestamp": datetime.utcnow().isoformat() + "Z",  # UTC time
-        "event": "LOGIN_SUCCESS"
-    }
+    log_event("LOGIN_SUCCESS", username, email=email)
 
-    try:
-        data = []
-        # Read existing logs if file exists
-        if os.path.exists(log_path):
-            with open(log_path, "r") as f:
-                try:
-                    data = json.load(f)
-                    if not isinstance(data, list): data = []
-                except:
-                    data = []
-        
-        # Append new entry
-        data.append(entry)
-        
-        # Write back to file
-        with open(log_path, "w") as f:
-            json.dump(data, f, indent=4)
-            
-    except Exception as e:
-        print(f"Logging Failed: {e}")
+def is_admin():
+    """Admin-only endpoints: accounts listed in config.ADMIN_EMAILS."""
+    return "user" in session and session.get("email") in ADMIN_EMAILS
 
 # =========================
 # AUTH ROUTES
@@ -96,6 +195,7 @@ def login():
         # SUCCESSFUL LOGIN
         session["user_id"] = user["id"]
         session["user"] = user["username"]
+        session["email"] = user["email"]
         
         # --- NEW: LOG THE LOGIN ---
         log_user_login(user["username"], email)
@@ -153,17 +253,6 @@ def dashboard():
         user=session["user"]
     )
 
-# =========================
-# MEDIA TYPE DETECTION
-# =========================
-def detect_media_type(filename):
-    ext = filename.lower().rsplit(".", 1)[-1]
-    if ext in ["jpg", "jpeg", "png", "webp"]:
-        return "image"
-    if ext in ["mp4", "avi"]:
-        return "video"
-    return None
-
 # =========================
 # REGISTER MEDIA
 # =========================
@@ -190,17 +279,20 @@ def register_media():
             register_result={"status": "error", "message": "Unsupported media type."}
         )
 
-    filename = f"{uuid.uuid4().hex}_{media.filename}"
     owner = session["user"]
 
     if media_type == "image":
-        path = os.path.join(UPLOAD_IMAGE, filename)
-        media.save(path)
-        result = register_image(ref_id, path, owner)
+        upload = finalize_upload(media, UPLOAD_IMAGE)
+        result = compute_service.run(register_image, ref_id, upload["path"], owner,
+                                     sha=upload["sha"], original_filename=media.filename)
     else:  # video
-        path = os.path.join(UPLOAD_VIDEO, filename)
-        media.save(path)
-        result = register_video(ref_id, path, owner)
+        upload = finalize_upload(media, UPLOAD_VIDEO)
+        result = compute_service.run(register_video, ref_id, upload["path"], owner,
+                                     sha=upload["sha"], original_filename=media.filename)
+
+    log_event("REGISTER", owner, ref_id=ref_id, media_type=media_type, sha=upload["sha"],
+              filename=media.filename, status=result.get("status"))
+    metrics.inc("registrations_total", media_type=media_type, status=result.get("status"))
 
     return render_template(
         "dashboard.html",
@@ -229,24 +321,192 @@ def verify_media():
     if not final_type:
          return jsonify({"status": "error", "message": "Unsupported media type."}), 400
 
-    filename = f"{uuid.uuid4().hex}_{media.filename}"
-    
     if final_type == "image":
-        path = os.path.join(UPLOAD_IMAGE, filename)
-        media.save(path)
+        from services.image_verify_service import verify_image
+        upload = finalize_upload(media, UPLOAD_IMAGE)
         # Images verify AND reconstruct instantly
-        result = verify_image(ref_id, path, original_filename=media.filename)
+        result = compute_service.run(verify_image, ref_id, upload["path"],
+                                     original_filename=media.filename, sha=upload["sha"])
         
     elif final_type == "video":
-        path = os.path.join(UPLOAD_VIDEO, filename)
-        media.save(path)
+        upload = finalize_upload(media, UPLOAD_VIDEO)
         # Videos ONLY verify hash. Reconstruction is skipped here (Wait for button click).
-        result = verify_video(ref_id, path, original_filename=media.filename)
+        result = verify_video(ref_id, upload["path"], original_filename=media.filename, sha=upload["sha"])
         
     else:
         return jsonify({"status": "error", "message": "Invalid media type."}), 400
 
-    return jsonify(result)
+    details = result.get("details") or {}
+    log_event("VERIFY", session["user"], ref_id=ref_id or details.get("matched_id"), media_type=final_type,
+              sha=upload["sha"], filename=media.filename, status=result.get("status"),
+              tamper_score=details.get("tamper_score"))
+    metrics.inc("verdicts_total", media_type=final_type, status=result.get("status"), batch="false")
+
+    return jsonify(with_timings(result))
+
+# =========================
+# VERIFY PRE-CHECK (Hash Only, No Upload)
+# Phase 1 of the two-phase verify: the client sends the SHA-256 and size it
+# computed locally. AUTHENTIC / UNREGISTERED are answered from the hash index;
+# "UPLOAD_REQUIRED" tells the client to fall back to POST /verify (forensics,
+# or the similarity search for an unregistered hash when SIMILARITY_ENABLED).
+# =========================
+@app.route("/verify/precheck", methods=["POST"])
+def verify_precheck():
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    payload = request.get_json(silent=True) or request.form
+    sha = str(payload.get("sha", "")).strip().lower()
+    ref_id = str(payload.get("ref_id", "") or "").strip()
+    filename = payload.get("filename")
+    media_type = payload.get("media_type") or (detect_media_type(filename) if filename else None)
+
+    try:
+        size = int(payload.get("size", 0))
+    except (TypeError, ValueError):
+        size = 0
+
+    if len(sha) != 64 or any(c not in "0123456789abcdef" for c in sha):
+        return jsonify({"status": "error", "message": "A hex SHA-256 digest is required."}), 400
+
+    if size > MAX_UPLOAD_BYTES:
+        return jsonify({
+            "status": "error",
+            "message": f"File too large. Maximum upload size is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."
+        }), 413
+
+    if media_type == "image":
+        from services.image_verify_service import precheck_image
+        result = precheck_image(ref_id, sha, original_filename=filename)
+    elif media_type == "video":
+        result = precheck_video(ref_id, sha, original_filename=filename)
+    else:
+        return jsonify({"status": "error", "message": "Unsupported media type."}), 400
+
+    log_event("VERIFY_PRECHECK", session["user"], ref_id=ref_id or None, media_type=media_type,
+              sha=sha, filename=filename, status=result.get("status"))
+    metrics.inc("verdicts_total", media_type=media_type, status=result.get("status"), batch="false")
+
+    return jsonify(with_timings(result))
+
+# =========================
+# BATCH VERIFY (Many Files, NDJSON Stream)
+# Accepts several "media" parts and/or .zip / .tar(.gz) archives.
+# Optional "ref_map" form field: JSON {filename: ref_id}.
+# A batch unpacks at most BATCH_MAX_ITEMS files / BATCH_MAX_BYTES in total.
+# =========================
+def _batch_too_large():
+    return RequestEntityTooLarge(f"Batch exceeds {BATCH_MAX_ITEMS} files or {BATCH_MAX_BYTES // (1024 * 1024)} MB unpacked.")
+
+
+def _take_budget(budget, size):
+    if budget["items"] <= 0 or budget["bytes"] <= 0 or size > budget["bytes"]:
+        raise _batch_too_large()
+    budget["items"] -= 1
+    budget["bytes"] -= size
+
+
+def _expand_batch_upload(media, ref_map, budget):
+    """Yields batch items for one uploaded part (loose file or archive members)."""
+    name = media.filename or ""
+    lower = name.lower()
+
+    def item_for(filename, stream):
+        media_type = detect_media_type(filename)
+        if not media_type:
+            return None
+        _take_budget(budget, 0)
+        upload_dir = UPLOAD_IMAGE if media_type == "image" else UPLOAD_VIDEO
+        # A member may use what is left of the batch budget (and never more than one upload)
+        try:
+            upload = ingest_stream(stream, filename, upload_dir, max_bytes=min(MAX_UPLOAD_BYTES, budget["bytes"]))
+        except RequestEntityTooLarge:
+            if budget["bytes"] < MAX_UPLOAD_BYTES:
+                raise _batch_too_large()
+            raise
+        budget["bytes"] -= upload["size"]
+        return {
+            "path": upload["path"],
+            "sha": upload["sha"],
+            "filename": filename,
+            "media_type": media_type,
+            "ref_id": ref_map.get(filename, "")
+        }
+
+    if lower.endswith((".zip", ".tar", ".tar.gz", ".tgz")):
+        yield from _expand_archive(media.stream, lower, item_for)
+        # The archive itself is not evidence; drop its spool right away
+        if isinstance(media.stream, HashingUploadFile):
+            media.stream.discard()
+        return
+
+    media_type = detect_media_type(name)
+    if media_type:
+        upload = finalize_upload(media, UPLOAD_IMAGE if media_type == "image" else UPLOAD_VIDEO)
+        _take_budget(budget, upload["size"])
+        yield {
+            "path": upload["path"],
+            "sha": upload["sha"],
+            "filename": name,
+            "media_type": media_type,
+            "ref_id": ref_map.get(name, "")
+        }
+
+
+def _expand_archive(stream, lower_name, item_for):
+    if lower_name.endswith(".zip"):
+        with zipfile.ZipFile(stream) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                with archive.open(info) as member:
+                    item = item_for(os.path.basename(info.filename), member)
+                if item:
+                    yield item
+    else:
+        stream.seek(0)
+        with tarfile.open(fileobj=stream, mode="r|*") as archive:
+            for info in archive:
+                if not info.isfile():
+                    continue
+                item = item_for(os.path.basename(info.name), archive.extractfile(info))
+                if item:
+                    yield item
+
+
+@app.route("/verify/batch", methods=["POST"])
+def verify_batch_media():
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    files = request.files.getlist("media")
+    if not files:
+        return jsonify({"status": "error", "message": "No media files uploaded."}), 400
+
+    try:
+        ref_map = json.loads(request.form.get("ref_map") or "{}")
+    except ValueError:
+        ref_map = None
+    if not isinstance(ref_map, dict):
+        return jsonify({"status": "error", "message": "ref_map must be a JSON object."}), 400
+
+    items = []
+    budget = {"items": BATCH_MAX_ITEMS, "bytes": BATCH_MAX_BYTES}
+    try:
+        for media in files:
+            items.extend(_expand_batch_upload(media, ref_map, budget))
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        return jsonify({"status": "error", "message": f"Unreadable archive: {e}"}), 400
+    except RequestEntityTooLarge as e:
+        return jsonify({"status": "error", "message": e.description}), 413
+
+    if not items:
+        return jsonify({"status": "error", "message": "No supported media found in upload."}), 400
+
+    log_event("VERIFY_BATCH", session["user"], items=len(items))
+
+    return Response(stream_with_context(verify_batch_ndjson(items)), mimetype="application/x-ndjson")
 
 # =========================
 # RECONSTRUCT MEDIA (Heavy Lifting - FIXED)
@@ -263,15 +523,19 @@ def reconstruct_media():
         return jsonify({"status": "error", "message": "Reference ID is missing."}), 400
 
     try:
-        # Pass ID directly to service
-        reconstructed_url = reconstruct_video_content(ref_id)
+        # Pass ID directly to service; frame decoding runs on the compute pool
+        reconstructed_url = compute_service.run(reconstruct_video_content, ref_id)
+        log_event("RECONSTRUCT", session["user"], ref_id=ref_id, status="success")
         
-        return jsonify({
+        return jsonify(with_timings({
             "status": "success",
             "reconstructed_url": reconstructed_url
-        })
+        }))
+    except (TooManyRequests, GatewayTimeout):
+        raise  # 429 / 504 via the error handlers below
     except Exception as e:
-        print(f"Reconstruction Error: {e}")
+        app.logger.exception("Reconstruction failed for %s", ref_id)
+        log_event("RECONSTRUCT", session["user"], ref_id=ref_id, status="error", message=str(e))
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
@@ -283,23 +547,305 @@ def get_chain():
     if "user" not in session:
         return jsonify({"status": "error", "message": "Unauthorized"}), 401
         
-    path = "registry/ledger.json"
-    if not os.path.exists(path):
-        return jsonify({}) 
-        
-    with open(path, "r") as f:
-        try:
-            chain_data = json.load(f)
-            return jsonify(chain_data)
-        except:
-            return jsonify({})
+    # Cursor pagination: ?cursor=<last index seen>&limit=50&order=asc|desc
+    # Filters: owner, media_type, reference_id, since, until (ISO timestamps)
+    args = request.args
+    try:
+        cursor = int(args["cursor"]) if args.get("cursor") not in (None, "") else None
+        limit = max(1, min(int(args.get("limit", CHAIN_PAGE_SIZE)), CHAIN_MAX_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"status": "error", "message": "cursor and limit must be integers."}), 400
+
+    page = query_ledger(
+        cursor=cursor,
+        limit=limit,
+        order="desc" if args.get("order") == "desc" else "asc",
+        owner=args.get("owner"),
+        media_type=args.get("media_type"),
+        reference_id=args.get("reference_id"),
+        since=args.get("since"),
+        until=args.get("until")
+    )
+    return jsonify(page)
 
 @app.route("/chain/validate", methods=["POST"])
 def validate_chain():
-    path = "registry/ledger.json"
-    if os.path.exists(path):
-        return jsonify({"status": "valid", "message": "Cryptographic links verified."})
-    return jsonify({"status": "error", "message": "Chain not found."})
+    # From the last checkpoint to the tip; ?full=1 walks from genesis and re-derives every checkpoint
+    data = load_ledger()
+    if request.args.get("full") == "1":
+        return jsonify(checkpoints.validate_full(data))
+    return jsonify(checkpoints.validate_tip(data))
+
+@app.route("/chain/proof", methods=["GET"])
+def chain_proof():
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    try:
+        index = int(request.args.get("index", ""))
+    except ValueError:
+        return jsonify({"status": "error", "message": "index must be an integer."}), 400
+
+    proof = checkpoints.membership_proof(load_ledger(), index)
+    if proof is None:
+        return jsonify({"status": "error", "message": "Block not found."}), 404
+    return jsonify({"status": "success", "proof": proof})
+
+@app.route("/admin/ledger/checkpoints", methods=["GET", "POST"])
+def ledger_checkpoints():
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    # POST rebuilds the sidecar from ledger.json, accepting its current history
+    if request.method == "POST":
+        if not is_admin():
+            return jsonify({"status": "error", "message": "Admin only."}), 403
+        rebuild_checkpoints()
+
+    sidecar = checkpoints.load()
+    stored = sidecar.get("checkpoints", [])
+    return jsonify({"status": "success", "interval": sidecar.get("interval"), "count": len(stored),
+                    "last": stored[-1] if stored else None})
+
+# =========================
+# OFFLINE VERIFICATION BUNDLE
+# GET /bundle?ref_id=IMG001 -> zip checked by bundle_verifier.py without this server
+# =========================
+@app.route("/bundle", methods=["GET"])
+def export_verification_bundle():
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    ref_id = request.args.get("ref_id", "").strip()
+    if not ref_id:
+        return jsonify({"status": "error", "message": "Reference ID is missing."}), 400
+
+    result = export_bundle(ref_id)
+    log_event("EXPORT_BUNDLE", session["user"], ref_id=ref_id, status=result["status"])
+    if result["status"] != "success":
+        return jsonify(result), 404
+
+    return Response(result["data"], mimetype="application/zip",
+                    headers={"Content-Disposition": f'attachment; filename="{result["filename"]}"'})
+
+# =========================
+# NEAR-DUPLICATES OF A REGISTERED RECORD
+# GET /similar?ref_id=IMG001 -> registered media with close perceptual hashes
+# =========================
+@app.route("/similar", methods=["GET"])
+def similar_media():
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    key, header = find_reference(request.args.get("ref_id", "").strip())
+    if not header:
+        return jsonify({"status": "error", "message": "Reference ID not found."}), 404
+
+    hashes = similarity.record_hashes(header)
+    if not hashes:
+        return jsonify({"status": "error", "message": "Record has no perceptual hashes (run index_similarity.py)."}), 409
+
+    return jsonify({"status": "success", "ref_id": key, "similar": similarity.find_similar(hashes, exclude=key),
+                    "index": similarity.index_stats()})
+
+# =========================
+# UPLOAD LIMIT
+# =========================
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({
+        "status": "error",
+        "message": f"File too large. Maximum upload size is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."
+    }), 413
+
+# =========================
+# COMPUTE BACKPRESSURE (serve.py worker pool)
+# =========================
+@app.errorhandler(TooManyRequests)
+def compute_busy(e):
+    response = jsonify({"status": "error", "message": e.description})
+    response.headers["Retry-After"] = str(e.retry_after or 1)
+    return response, 429
+
+@app.errorhandler(GatewayTimeout)
+def compute_timeout(e):
+    return jsonify({"status": "error", "message": e.description}), 504
+
+@app.route("/admin/compute", methods=["GET"])
+def compute_status():
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "compute": compute_service.stats()})
+
+# =========================
+# METRICS (Prometheus text format; scraped without a session)
+# =========================
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    if not METRICS_ENABLED:
+        return jsonify({"status": "error", "message": "Metrics are disabled."}), 404
+
+    compute = compute_service.stats()
+    artifacts = artifact_service.stats()
+    cache = json_cache.stats()
+    gauges = {
+        "compute_inflight": compute["inflight"],
+        "compute_workers": compute["workers"],
+        "artifact_pending": artifacts["pending"],
+        "json_cache_bytes": cache["bytes"],
+        "audit_buffered_events": audit_metrics()["buffered"],
+    }
+    return Response(metrics.render(gauges), mimetype="text/plain; version=0.0.4")
+
+# =========================
+# REQUEST PROFILES
+# =========================
+@app.route("/admin/profiles", methods=["GET", "POST"])
+def profiles_index():
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    if not is_admin():
+        return jsonify({"status": "error", "message": "Admin only."}), 403
+
+    # POST {"sample_percent": 5} and/or {"next": 3} (profile the next 3 matching requests)
+    if request.method == "POST":
+        data = request.get_json(silent=True) or request.form
+        fields = {k: data.get(k) for k in ("sample_percent", "next") if data.get(k) not in (None, "")}
+        try:
+            profiling.configure(sample_percent=fields.get("sample_percent"), next_requests=fields.get("next"))
+        except (TypeError, ValueError):
+            return jsonify({"status": "error", "message": "sample_percent and next must be numbers."}), 400
+
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), 500))
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit must be an integer."}), 400
+
+    return jsonify({"status": "success", "profiles": profiling.list_profiles(limit), "metrics": profiling.get_metrics()})
+
+@app.route("/admin/profiles/<profile_id>", methods=["GET"])
+def profile_download(profile_id):
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    if not is_admin():
+        return jsonify({"status": "error", "message": "Admin only."}), 403
+
+    # ?format=text&sort=cumulative|tottime|calls for a pstats report instead of the .prof file
+    if request.args.get("format") == "text":
+        sort = request.args.get("sort", "cumulative")
+        if sort not in ("cumulative", "tottime", "calls", "ncalls", "time"):
+            return jsonify({"status": "error", "message": "Unsupported sort key."}), 400
+        text = profiling.profile_text(profile_id, sort=sort)
+        if text is None:
+            return jsonify({"status": "error", "message": "Profile not found."}), 404
+        return Response(text, mimetype="text/plain")
+
+    if profiling.profile_path(profile_id) is None:
+        return jsonify({"status": "error", "message": "Profile not found."}), 404
+    return send_from_directory(PROFILE_DIR, profile_id + ".prof", as_attachment=True)
+
+# =========================
+# STORAGE RETENTION (Janitor)
+# =========================
+@app.route("/admin/janitor", methods=["GET", "POST"])
+def janitor_status():
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    # POST runs a sweep immediately instead of waiting for the next interval
+    if request.method == "POST":
+        if not is_admin():
+            return jsonify({"status": "error", "message": "Admin only."}), 403
+        sweep()
+
+    return jsonify({"status": "success", "metrics": janitor_metrics()})
+
+# =========================
+# READ CACHE STATS
+# =========================
+@app.route("/admin/cache", methods=["GET"])
+def cache_status():
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "json_cache": json_cache.stats(), "pack_cache": pack_cache_stats()})
+
+# =========================
+# AUDIT LOG
+# =========================
+@app.route("/audit", methods=["GET"])
+def get_audit():
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    # Newest first: ?event=VERIFY&username=...&ref_id=...&since=...&until=...&limit=100&offset=0
+    # Users see their own events; only admins can read anyone's.
+    args = request.args
+    username = args.get("username")
+    if not is_admin():
+        if username and username.lower() != session["user"].lower():
+            return jsonify({"status": "error", "message": "Admin only."}), 403
+        username = session["user"]
+    try:
+        limit = max(1, min(int(args.get("limit", AUDIT_PAGE_SIZE)), 10 * AUDIT_PAGE_SIZE))
+        offset = max(0, int(args.get("offset", 0)))
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit and offset must be integers."}), 400
+
+    page = query_audit(
+        event=args.get("event"),
+        username=username,
+        ref_id=args.get("ref_id"),
+        since=args.get("since"),
+        until=args.get("until"),
+        limit=limit,
+        offset=offset
+    )
+    return jsonify(dict(page, status="success", metrics=audit_metrics()))
+
+# =========================
+# FORENSIC ARTIFACTS (rendered asynchronously)
+# =========================
+@app.route("/artifacts/<name>", methods=["GET"])
+def serve_artifact(name):
+    # Session first: resolving a lazy artifact starts a full-resolution render
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    if secure_filename(name) != name:
+        return jsonify({"status": "error", "message": "Invalid artifact name."}), 400
+
+    # ?wait=0 polls without blocking
+    try:
+        wait = max(0.0, min(float(request.args.get("wait", ARTIFACT_WAIT_SECONDS)), ARTIFACT_WAIT_SECONDS))
+    except ValueError:
+        wait = ARTIFACT_WAIT_SECONDS
+
+    result = artifact_service.resolve(name, wait=wait)
+
+    if result["status"] == "ready":
+        response = send_from_directory(RECONSTRUCTED_DIR, name)
+        info = result.get("info") or {}
+        if "encode_seconds" in info:
+            response.headers["X-Artifact-Encode-Seconds"] = str(info["encode_seconds"])
+        if "render_seconds" in info:
+            response.headers["X-Artifact-Render-Seconds"] = str(info["render_seconds"])
+        return response
+    if result["status"] == "pending":
+        response = jsonify({"status": "pending", "message": "Artifact is still rendering."})
+        response.headers["Retry-After"] = "1"
+        return response, 202
+    if result["status"] == "error":
+        return jsonify({"status": "error", "message": result.get("message", "Rendering failed.")}), 500
+    return jsonify({"status": "error", "message": "Artifact not found or expired."}), 404
+
+@app.route("/admin/artifacts", methods=["GET"])
+def artifact_status():
+    if "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "artifacts": artifact_service.stats()})
 
 # =========================
 # SERVE OUTPUTS
@@ -311,5 +857,7 @@ def serve_outputs(filename):
 # =========================
 # MAIN
 # =========================
+# Development server. For production use serve.py (worker processes for forensics).
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     app.run(debug=True, threaded=True)
\ No newline at end of file
@@ -0,0 +1,317 @@
+import os
+import json
+import time
+import logging
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+
+import metrics
+from core.cache import LRUCache
+from functools import partial
+from config import (
+    RECONSTRUCTED_DIR, ARTIFACT_STATE_DIR, ARTIFACT_DEFERRED_DIR, ASYNC_ARTIFACTS, ARTIFACT_WORKERS,
+    ARTIFACT_MAX_PENDING, ARTIFACT_JOB_ENTRIES, ARTIFACT_WAIT_SECONDS, ARTIFACT_STALE_SECONDS,
+    ARTIFACT_TTL_SECONDS, ARTIFACT_FORMAT, PNG_COMPRESS_LEVEL
+)
+
+# ==========================================
+# FORENSIC ARTIFACT JOBS
+# verify_image() returns as soon as the tamper map is known; the images
+# behind its URLs are rendered here. Eager jobs (forensic overlay) start
+# immediately on the pool, lazy jobs (clean reconstruction) only when
+# their URL is first requested.
+# ==========================================
+_jobs = LRUCache(ARTIFACT_JOB_ENTRIES)  # name -> job
+_lock = threading.Lock()
+_executor = None
+_pending = 0
+
+# Set in compute worker processes (see services.compute_service). The front
+# process serves the URLs but cannot see a worker's job table, so workers
+# leave state in ARTIFACT_STATE_DIR: <name>.pending while rendering and
+# <name>.error on failure. Lazy jobs go to ARTIFACT_DEFERRED_DIR as
+# <name>.json, a spec naming a @deferrable renderer and its JSON arguments,
+# which the front process rebuilds and runs on first request.
+PENDING_SUFFIX = ".pending"
+ERROR_SUFFIX = ".error"
+DEFERRED_SUFFIX = ".json"
+_detached = False
+log = logging.getLogger(__name__)
+
+# Renderers a deferred spec may name: "module:function" -> function.
+# Specs only ever import from _RENDERER_MODULES.
+_renderers = {}
+_RENDERER_MODULES = ("services.image_verify_service",)
+_last_prune = 0.0
+
+_stats = {
+    "submitted": 0, "rendered": 0, "failed": 0, "inline": 0,
+    "render_seconds": 0.0, "encode_seconds": 0.0, "bytes_written": 0
+}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, ARTIFACT_WORKERS), thread_name_prefix="artifact")
+    return _executor
+
+
+def artifact_url(name):
+    return f"/artifacts/{name}"
+
+
+def detach():
+    """Switches this process to detached mode (job state kept on disk, see above)."""
+    global _detached
+    _detached = True
+    os.makedirs(ARTIFACT_STATE_DIR, exist_ok=True)
+    os.makedirs(ARTIFACT_DEFERRED_DIR, exist_ok=True)
+
+
+def deferrable(fn):
+    """Marks a module-level renderer whose partial(fn, *json_args) jobs may be deferred."""
+    _renderers[f"{fn.__module__}:{fn.__name__}"] = fn
+    return fn
+
+
+def _state_path(name, suffix):
+    if suffix == DEFERRED_SUFFIX:
+        return os.path.join(ARTIFACT_DEFERRED_DIR, name + suffix)
+    return os.path.join(ARTIFACT_STATE_DIR, name + suffix)
+
+
+def _write_state(name, suffix, data=b""):
+    path = _state_path(name, suffix)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def _remove_state(name, suffix):
+    try:
+        os.remove(_state_path(name, suffix))
+    except FileNotFoundError:
+        pass
+
+
+def _defer(name, render):
+    """
+    Hands a lazy job to the front process. False unless render is
+    partial(<@deferrable renderer>, *args) with JSON-serializable args.
+    """
+    if not isinstance(render, partial) or render.keywords:
+        return False
+    key = f"{render.func.__module__}:{render.func.__name__}"
+    if _renderers.get(key) is not render.func:
+        return False
+    try:
+        # default=int: NumPy integers in tamper indices / regions
+        data = json.dumps({"renderer": key, "args": list(render.args)}, default=int)
+    except (TypeError, ValueError):
+        return False
+    _prune_deferred()
+    _write_state(name, DEFERRED_SUFFIX, data.encode())
+    return True
+
+
+def _load_deferred(name):
+    """Rebuilds a deferred job's render callable, or None (missing, expired or not a known renderer)."""
+    path = _state_path(name, DEFERRED_SUFFIX)
+    try:
+        if time.time() - os.path.getmtime(path) > ARTIFACT_TTL_SECONDS:
+            return None
+        with open(path, "r") as f:
+            spec = json.load(f)
+        key = spec["renderer"]
+        args = spec["args"]
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    except (OSError, ValueError, KeyError, TypeError):
+        log.warning("Ignoring unreadable deferred artifact job %s", name)
+        return None
+
+    module = str(key).split(":", 1)[0]
+    if key not in _renderers and module in _RENDERER_MODULES:
+        importlib.import_module(module)  # registers its renderers
+    fn = _renderers.get(key)
+    if fn is None or not isinstance(args, list):
+        log.warning("Ignoring deferred artifact job %s for unknown renderer %r", name, key)
+        return None
+    return partial(fn, *args)
+
+
+def _prune_deferred():
+    """Removes deferred jobs older than ARTIFACT_TTL_SECONDS (at most once a minute)."""
+    global _last_prune
+    now = time.time()
+    if now - _last_prune < 60:
+        return
+    _last_prune = now
+    try:
+        names = os.listdir(ARTIFACT_DEFERRED_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(ARTIFACT_DEFERRED_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > ARTIFACT_TTL_SECONDS:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _run(job):
+    started = time.time()
+    try:
+        # render(path) may return encode stats ({"format", "encode_seconds", "bytes"})
+        info = dict(job["render"](job["path"]) or {})
+        info["render_seconds"] = round(time.time() - started, 4)
+        metrics.observe("artifact_render_seconds", time.time() - started, artifact=job["name"].rsplit("_", 1)[0])
+        info.setdefault("bytes", os.path.getsize(job["path"]))
+        job["info"] = info
+        with _lock:
+            _stats["rendered"] += 1
+            _stats["encode_seconds"] += info.get("encode_seconds", 0.0)
+            _stats["bytes_written"] += info["bytes"]
+    except Exception as e:
+        with _lock:
+            _stats["failed"] += 1
+        metrics.inc("artifact_failures_total")
+        log.exception("Rendering artifact %s failed", job["name"])
+        if _detached:
+            _write_state(job["name"], ERROR_SUFFIX, str(e).encode())
+        raise
+    finally:
+        job["render"] = None  # drop captured pixels / digests
+        if _detached:
+            _remove_state(job["name"], PENDING_SUFFIX)
+        with _lock:
+            _stats["render_seconds"] += time.time() - started
+
+
+def _done(_future):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def _start(job):
+    """Schedules job once; returns its Future. Renders inline when the pool is saturated."""
+    global _pending
+    with _lock:
+        if job["future"] is not None:
+            return job["future"]
+
+        inline = not ASYNC_ARTIFACTS or _pending >= ARTIFACT_MAX_PENDING
+        if not inline:
+            _pending += 1
+            job["future"] = _get_executor().submit(_run, job)
+            job["future"].add_done_callback(_done)
+            return job["future"]
+
+        # Backpressure: the caller pays for the render instead of queueing pixels
+        job["future"] = Future()
+        _stats["inline"] += 1
+
+    try:
+        _run(job)
+        job["future"].set_result(None)
+    except Exception as e:
+        job["future"].set_exception(e)
+    return job["future"]
+
+
+def submit(name, render, eager=True):
+    """
+    Registers artifact `name` (a file in RECONSTRUCTED_DIR) produced by
+    render(path). Returns its URL immediately.
+    """
+    os.makedirs(RECONSTRUCTED_DIR, exist_ok=True)
+    with _lock:
+        _stats["submitted"] += 1
+
+    if _detached:
+        if not eager and ASYNC_ARTIFACTS and _defer(name, render):
+            return artifact_url(name)
+        # Nobody in this process will ever ask for it: render now
+        _write_state(name, PENDING_SUFFIX)
+        eager = True
+
+    job = {"name": name, "path": os.path.join(RECONSTRUCTED_DIR, name), "render": render, "future": None, "info": None}
+    _jobs.put(name, job)
+
+    if eager or not ASYNC_ARTIFACTS:
+        _start(job)
+    return artifact_url(name)
+
+
+def resolve(name, wait=ARTIFACT_WAIT_SECONDS):
+    """
+    Waits up to `wait` seconds for an artifact (starting it if lazy).
+    Returns {"status": "ready" | "pending" | "error" | "missing", "path", "info"?, "message"?}
+    info: encode stats of the rendered artifact (format, encode_seconds, render_seconds, bytes).
+    """
+    path = os.path.join(RECONSTRUCTED_DIR, name)
+    job = _jobs.get(name) or _adopt_deferred(name)
+
+    if job is None:
+        # Evicted from the job table, rendered by a compute worker process or
+        # by a previous process. A lazy job evicted before anyone asked for it
+        # reports "missing".
+        return _resolve_on_disk(name, path, wait)
+
+    future = _start(job)
+    try:
+        future.result(timeout=wait)
+    except FutureTimeout:
+        return {"status": "pending", "path": path}
+    except Exception as e:
+        return {"status": "error", "path": path, "message": str(e)}
+
+    return {"status": "ready" if os.path.exists(path) else "missing", "path": path, "info": job["info"]}
+
+
+def _adopt_deferred(name):
+    """Turns a worker's deferred <name>.json into a local lazy job (once)."""
+    with _lock:
+        job = _jobs.get(name)
+        if job is not None:
+            return job
+        render = _load_deferred(name)
+        if render is None:
+            return None
+        job = {"name": name, "path": os.path.join(RECONSTRUCTED_DIR, name), "render": render, "future": None, "info": None}
+        _jobs.put(name, job)
+
+    _remove_state(name, DEFERRED_SUFFIX)
+    return job
+
+
+def _marker_pending(name):
+    try:
+        return time.time() - os.path.getmtime(_state_path(name, PENDING_SUFFIX)) < ARTIFACT_STALE_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def _resolve_on_disk(name, path, wait):
+    deadline = time.time() + wait
+    while _marker_pending(name):
+        if time.time() >= deadline:
+            return {"status": "pending", "path": path}
+        time.sleep(0.05)
+
+    try:
+        with open(_state_path(name, ERROR_SUFFIX), "r") as f:
+            return {"status": "error", "path": path, "message": f.read() or "Rendering failed."}
+    except FileNotFoundError:
+        pass
+    return {"status": "ready" if os.path.exists(path) else "missing", "path": path}
+
+
+def stats():
+    with _lock:
+        return dict(_stats, pending=_pending, workers=ARTIFACT_WORKERS, async_enabled=ASYNC_ARTIFACTS,
+                    detached=_detached, format=ARTIFACT_FORMAT, png_compress_level=PNG_COMPRESS_LEVEL)
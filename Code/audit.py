@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+import metrics
+from config import (
+    AUDIT_DIR, AUDIT_MAX_BYTES, AUDIT_ROTATE_DAILY, AUDIT_KEEP_FILES,
+    AUDIT_BUFFER_MAX, AUDIT_FLUSH_SECONDS, AUDIT_FLUSH_BATCH, LEGACY_LOGIN_LOG
+)
+
+AUDIT_PATH = os.path.join(AUDIT_DIR, "audit.jsonl")
+
+# =========================
+# BUFFER
+# Request threads only append to an in-memory deque; one background thread
+# appends batches to audit.jsonl. A full buffer is flushed by the caller
+# (backpressure) instead of dropping events.
+# =========================
+_buffer = deque()
+_lock = threading.Lock()        # guards _buffer
+_write_lock = threading.Lock()  # serializes file appends / rotation
+_wake = threading.Event()
+_stop = threading.Event()
+_thread = None
+
+_metrics = {"events": 0, "flushes": 0, "flush_failures": 0, "rotations": 0, "sync_flushes": 0, "last_flush": None}
+log = logging.getLogger(__name__)
+
+
+def log_event(event, username=None, **fields):
+    """
+    Records one audit event, e.g. log_event("VERIFY", "alice", ref_id="X", status="TAMPERED").
+    Never raises into the request path.
+    """
+    entry = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "event": event,
+        "username": username
+    }
+    entry.update({k: v for k, v in fields.items() if v is not None})
+
+    with _lock:
+        _buffer.append(entry)
+        _metrics["events"] += 1
+        size = len(_buffer)
+
+    if size >= AUDIT_BUFFER_MAX or _thread is None:
+        # No flusher running (CLI use) or buffer full: write now
+        with _lock:
+            _metrics["sync_flushes"] += 1
+        flush()
+    elif size >= AUDIT_FLUSH_BATCH:
+        _wake.set()
+
+
+# =========================
+# WRITER
+# =========================
+def _rotated_name(now):
+    return os.path.join(AUDIT_DIR, f"audit-{now.strftime('%Y%m%d-%H%M%S-%f')}.jsonl")
+
+
+def _rotated_files():
+    """Rotated segments, newest first."""
+    try:
+        names = [n for n in os.listdir(AUDIT_DIR) if n.startswith("audit-") and n.endswith(".jsonl")]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+    return [os.path.join(AUDIT_DIR, n) for n in sorted(names, reverse=True)]
+
+
+def _maybe_rotate(incoming_bytes):
+    """Caller holds _write_lock."""
+    try:
+        st = os.stat(AUDIT_PATH)
+    except FileNotFoundError:
+        return
+
+    now = datetime.utcnow()
+    too_big = st.st_size and st.st_size + incoming_bytes > AUDIT_MAX_BYTES
+    new_day = AUDIT_ROTATE_DAILY and datetime.utcfromtimestamp(st.st_mtime).date() != now.date()
+    if not (too_big or new_day):
+        return
+
+    os.replace(AUDIT_PATH, _rotated_name(now))
+    _metrics["rotations"] += 1
+
+    for old in _rotated_files()[AUDIT_KEEP_FILES:]:
+        os.remove(old)
+
+
+def flush():
+    """Appends everything buffered so far. Safe to call from any thread."""
+    with _write_lock:
+        with _lock:
+            if not _buffer:
+                return 0
+            entries = list(_buffer)
+            _buffer.clear()
+
+        data = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries)
+        try:
+            os.makedirs(AUDIT_DIR, exist_ok=True)
+            _maybe_rotate(len(data))
+            with open(AUDIT_PATH, "a") as f:
+                f.write(data)
+        except OSError:
+            # Keep the events for the next attempt rather than losing them
+            with _lock:
+                _buffer.extendleft(reversed(entries))
+                _metrics["flush_failures"] += 1
+            metrics.inc("audit_flush_failures_total")
+            log.exception("Audit flush failed (%d events kept for the next attempt)", len(entries))
+            return 0
+
+        _metrics["flushes"] += 1
+        _metrics["last_flush"] = datetime.utcnow().isoformat()
+        return len(entries)
+
+
+def _run(interval):
+    while not _stop.is_set():
+        _wake.wait(interval)
+        _wake.clear()
+        flush()
+    flush()
+
+
+def start_audit(interval=AUDIT_FLUSH_SECONDS):
+    """Starts the daemon flusher once per process (and imports the legacy login log)."""
+    global _thread
+    if _thread and _thread.is_alive():
+        return _thread
+    migrate_legacy_logins()
+    _stop.clear()
+    _thread = threading.Thread(target=_run, args=(interval,), name="audit-flusher", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def stop_audit():
+    _stop.set()
+    _wake.set()
+
+
+# Daemon threads die with the interpreter; don't lose the tail
+atexit.register(flush)
+
+
+def get_metrics():
+    with _lock:
+        return dict(_metrics, buffered=len(_buffer))
+
+
+# =========================
+# LEGACY LOGIN LOG (registry/user_logs.json)
+# =========================
+def migrate_legacy_logins(path=LEGACY_LOGIN_LOG):
+    """One-time copy of the old JSON array into the audit log. The old file is left untouched."""
+    if os.path.exists(AUDIT_PATH) or _rotated_files() or not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if not isinstance(data, list):
+        return 0
+
+    os.makedirs(AUDIT_DIR, exist_ok=True)
+    with _write_lock, open(AUDIT_PATH, "a") as f:
+        for entry in data:
+            if isinstance(entry, dict):
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    return len(data)
+
+
+# =========================
+# QUERY API
+# =========================
+def _iter_lines_reversed(path, chunk_size=64 * 1024):
+    """Yields the lines of a file last-to-first without reading it whole."""
+    try:
+        f = open(path, "rb")
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    with f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b""
+        while pos > 0:
+            step = min(chunk_size, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + tail).split(b"\n")
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if tail.strip():
+            yield tail
+
+
+def _iter_newest_first():
+    with _lock:
+        pending = list(_buffer)
+    for entry in reversed(pending):
+        yield entry
+
+    for path in [AUDIT_PATH] + _rotated_files():
+        for line in _iter_lines_reversed(path):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue  # torn line after a crash
+
+
+def query_audit(event=None, username=None, ref_id=None, since=None, until=None, limit=100, offset=0):
+    """
+    Newest-first audit events. Filters are exact (event, ref_id) or
+    case-insensitive (username); since/until are ISO timestamps.
+    Returns {"events", "has_more"}.
+    """
+    events = []
+    skipped = 0
+    event = event.upper() if event else None
+    username = username.lower() if username else None
+
+    for entry in _iter_newest_first():
+        ts = str(entry.get("timestamp", ""))
+        if until and ts > until:
+            continue
+        if since and ts < since:
+            break  # older files only get older
+        if event and entry.get("event") != event:
+            continue
+        if username and str(entry.get("username") or "").lower() != username:
+            continue
+        if ref_id and entry.get("ref_id") != ref_id:
+            continue
+
+        if skipped < offset:
+            skipped += 1
+            continue
+        if len(events) == limit:
+            return {"events": events, "has_more": True}
+        events.append(entry)
+
+    return {"events": events, "has_more": False}
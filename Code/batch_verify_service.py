@@ -0,0 +1,135 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import metrics
+from core.hashing import sha256_file
+from core.registry import load_chain
+from core.media_types import detect_media_type
+from services import compute_service
+from services.video_verify_service import verify_video_sha
+from config import BATCH_VERIFY_WORKERS
+
+
+# =======================================================
+# REGISTRY SNAPSHOT (loaded ONCE per batch)
+# =======================================================
+def _build_index(chain):
+    by_sha = {}
+    by_ref = {}
+    filenames = set()
+    for key, entry in chain.items():
+        stored = entry.get("sha") or entry.get("fingerprint")
+        if stored:
+            by_sha.setdefault(stored, key)
+        by_ref[key.lower()] = key
+        if entry.get("filename"):
+            filenames.add(entry["filename"])
+    return by_sha, by_ref, filenames
+
+
+# =======================================================
+# SINGLE ITEM (runs inside the pool)
+# =======================================================
+def _verify_item(item, chain, by_sha, by_ref, filenames):
+    path = item["path"]
+    filename = item.get("filename") or os.path.basename(path)
+    ref_id = (item.get("ref_id") or "").strip()
+    media_type = item.get("media_type") or detect_media_type(filename)
+
+    if not media_type:
+        return {"status": "ERROR", "message": "Unsupported media type."}
+
+    # 1. Hash (skipped when the upload layer already produced it)
+    sha = item.get("sha")
+    if not sha:
+        try:
+            sha = sha256_file(path)
+        except Exception as e:
+            return {"status": "ERROR", "message": f"File read error: {e}"}
+
+    ref_key = by_ref.get(ref_id.lower()) if ref_id else None
+
+    # 2. Hash hit with no conflicting reference -> AUTHENTIC straight from the index
+    if sha in by_sha and (not ref_key or ref_key == by_sha[sha]):
+        key = by_sha[sha]
+        return {
+            "status": "AUTHENTIC",
+            "details": {
+                "sha": sha,
+                "matched_id": key,
+                "matched_filename": chain[key].get("filename"),
+                "tamper_score": 0
+            }
+        }
+
+    # 3. Nothing to compare against -> UNREGISTERED without touching the file again
+    if not ref_key and not (media_type == "video" and filename in filenames):
+        return {
+            "status": "UNREGISTERED",
+            "details": {"incoming_sha": sha, "incoming_filename": filename}
+        }
+
+    # 4. Mismatch against a known record -> full service path (forensics),
+    # on the compute pool like a single /verify upload
+    if media_type == "image":
+        from services.image_verify_service import verify_image  # NumPy / PIL, loaded on first forensic item
+        return compute_service.run(verify_image, ref_id, path, original_filename=filename, sha=sha)
+    return verify_video_sha(ref_id, sha, original_filename=filename)
+
+
+# =======================================================
+# BATCH VERIFY (generator -> one result per item)
+# =======================================================
+def verify_batch(items, workers=BATCH_VERIFY_WORKERS):
+    """
+    items: iterable of {"path", "filename"?, "ref_id"?, "media_type"?, "sha"?}
+    Yields {"index", "filename", "media_type", "status", ...} as each item finishes.
+    The registry is parsed once and hashing runs in a thread pool (hashlib
+    releases the GIL); forensics go to compute_service like /verify, so a
+    busy pool answers that item with an ERROR rather than queueing it.
+    """
+    items = list(items)
+    chain = load_chain()
+    by_sha, by_ref, filenames = _build_index(chain)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(_verify_item, item, chain, by_sha, by_ref, filenames): idx
+            for idx, item in enumerate(items)
+        }
+
+        for future in as_completed(futures):
+            idx = futures[future]
+            item = items[idx]
+            filename = item.get("filename") or os.path.basename(item["path"])
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"status": "ERROR", "message": str(e)}
+
+            media_type = item.get("media_type") or detect_media_type(filename)
+            metrics.inc("verdicts_total", media_type=media_type or "unknown", status=result.get("status"), batch="true")
+            yield dict(result, index=idx, filename=filename, media_type=media_type)
+
+
+def verify_batch_ndjson(items, workers=BATCH_VERIFY_WORKERS):
+    """Same as verify_batch, encoded as NDJSON lines plus a trailing summary line."""
+    started = time.time()
+    counts = {}
+    total = 0
+
+    for result in verify_batch(items, workers):
+        total += 1
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        yield json.dumps(result) + "\n"
+
+    elapsed = time.time() - started
+    yield json.dumps({
+        "summary": True,
+        "total": total,
+        "by_status": counts,
+        "elapsed_seconds": round(elapsed, 3),
+        "files_per_second": round(total / elapsed, 2) if elapsed > 0 else None
+    }) + "\n"
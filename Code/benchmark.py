@@ -0,0 +1,518 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import subprocess
+import platform
+import argparse
+import tempfile
+import threading
+import contextlib
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from config import (
+    BENCH_RESOLUTIONS, BENCH_TAMPER_RATIOS, BENCH_VIDEO_LENGTHS, BENCH_REGISTRY_SIZES,
+    BENCH_REPEAT, BENCH_BASELINE_PATH, BENCH_REGRESSION_TOLERANCE
+)
+
+# =========================
+# PIPELINE BENCHMARK
+#   python benchmark.py                          # full matrix
+#   python benchmark.py --quick                  # small smoke run
+#   python benchmark.py --save-baseline          # record benchmarks/baseline.json
+#   python benchmark.py --compare                # exit 1 on regressions
+#   python benchmark.py --startup-only           # import time / memory per entry point
+#
+# Runs in a scratch working directory (fresh registry, ledger and storage),
+# so the real registry is never touched. Synthetic images (PNG, several
+# resolutions) and videos (cv2.VideoWriter, several lengths) are generated
+# once; the registry is then padded to each size in --registry-sizes and
+# register / verify / reconstruct are timed against it.
+# =========================
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+VIDEO_SIZE = (320, 240)
+VIDEO_FPS = 30
+
+
+def _csv(value, cast):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def _resolution(value):
+    w, h = value.lower().split("x")
+    return int(w), int(h)
+
+
+# =========================
+# SYNTHETIC MEDIA
+# Smooth colour fields plus light noise: compresses like a photo rather
+# than like white noise, and every block hashes differently.
+# =========================
+def synthetic_image(width, height, seed):
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, size=(max(2, height // 64), max(2, width // 64), 3), dtype=np.uint8)
+    img = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.integers(-8, 9, size=img.shape, dtype=np.int16)
+    return np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def tamper(img, ratio):
+    """Inverts a centred rectangle covering `ratio` of the image area."""
+    out = img.copy()
+    if ratio <= 0:
+        return out
+    h, w = out.shape[:2]
+    side = min(1.0, ratio) ** 0.5
+    th, tw = max(1, int(h * side)), max(1, int(w * side))
+    y, x = (h - th) // 2, (w - tw) // 2
+    out[y:y + th, x:x + tw] = 255 - out[y:y + th, x:x + tw]
+    return out
+
+
+def stamp(img, n):
+    """A distinct file per registration (duplicate-SHA checks would reject copies)."""
+    out = img.copy()
+    out[0, :8] = [(n >> (i * 8)) & 0xFF for i in range(3)]
+    return out
+
+
+def write_video(path, frames, seed, tampered=False):
+    w, h = VIDEO_SIZE
+    base = synthetic_image(w * 2, h, seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), VIDEO_FPS, (w, h))
+    if not writer.isOpened():
+        raise RuntimeError("cv2.VideoWriter could not open an mp4v stream (OpenCV built without video I/O?)")
+    for i in range(frames):
+        x = (i * 4) % w  # slow pan across the wide base image
+        frame = np.ascontiguousarray(base[:, x:x + w])
+        if tampered and i == frames // 2:
+            frame = tamper(frame, 0.25)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+# =========================
+# MEASUREMENT
+# =========================
+class _RssSampler:
+    """Peak resident set size while a block runs (Linux /proc; ru_maxrss elsewhere)."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            import resource
+            scale = 1 if sys.platform == "darwin" else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))]
+
+
+class Recorder:
+    def __init__(self, quiet):
+        self.quiet = quiet
+        self.samples = {}  # key -> {"seconds": [...], "rss": [...], "stages": {...}, "statuses": {...}}
+
+    def measure(self, key, fn, *args, **kwargs):
+        import metrics
+
+        quiet = io.StringIO() if self.quiet else None
+        error = None
+        with metrics.recording():
+            with _RssSampler() as rss, contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+                started = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    error = e
+                seconds = time.perf_counter() - started
+            stages = metrics.current_timings()
+
+        if error is not None:
+            self.fail(key, f"{type(error).__name__}: {error}")
+            return {"status": "exception"}
+
+        self.add(key, seconds, rss.peak, result.get("status") if isinstance(result, dict) else "ok", stages)
+        return result
+
+    def _series(self, key):
+        return self.samples.setdefault(key, {"seconds": [], "rss": [], "stages": {}, "statuses": {}})
+
+    def fail(self, key, message):
+        # Counted, but kept out of the latency figures
+        s = self._series(key)
+        s["statuses"]["exception"] = s["statuses"].get("exception", 0) + 1
+        print(f"  {key}: {message}")
+
+    def add(self, key, seconds, rss_bytes, status, stages=None):
+        """Records one sample measured elsewhere (e.g. in a child process)."""
+        s = self._series(key)
+        s["seconds"].append(seconds)
+        s["rss"].append(rss_bytes)
+        for stage, value in (stages or {}).items():
+            s["stages"][stage] = s["stages"].get(stage, 0.0) + value
+        s["statuses"][status] = s["statuses"].get(status, 0) + 1
+
+    def summary(self):
+        out = {}
+        for key, s in self.samples.items():
+            seconds = sorted(s["seconds"])
+            n = len(seconds)
+            if not n:
+                out[key] = {"n": 0, "throughput": None, "p50_ms": None, "p99_ms": None,
+                            "peak_rss_mb": None, "stages_ms": {}, "statuses": s["statuses"]}
+                continue
+            out[key] = {
+                "n": n,
+                "throughput": round(n / sum(seconds), 3) if sum(seconds) else None,
+                "p50_ms": round(_percentile(seconds, 0.50) * 1000, 2),
+                "p99_ms": round(_percentile(seconds, 0.99) * 1000, 2),
+                "peak_rss_mb": round(max(s["rss"]) / (1024 * 1024), 1),
+                "stages_ms": {k: round(v / n * 1000, 2) for k, v in sorted(s["stages"].items())},
+                "statuses": s["statuses"]
+            }
+        return out
+
+
+# =========================
+# STARTUP
+# Each probe runs in a fresh interpreter inside the scratch dir and reports
+# its import time, peak RSS and which media libraries got loaded.
+# =========================
+STARTUP_PROBES = [
+    ("import app", "import app"),                                  # web worker serving auth / light routes
+    ("cli register", "import services.image_register_service"),  # register.py / bulk_register.py
+    ("compute worker", "from services import compute_service; compute_service._init_worker()"),
+]
+HEAVY_MODULES = ("cv2", "numpy", "PIL")
+
+# Peak RSS from VmHWM: ru_maxrss of an exec'd child starts at the parent's peak on Linux
+_PROBE = """
+import sys, time, json
+started = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - started
+heavy = [m for m in {heavy!r} if m in sys.modules]
+try:
+    with open("/proc/self/status") as f:
+        peak = next(int(l.split()[1]) * 1024 for l in f if l.startswith("VmHWM:"))
+except (OSError, StopIteration):
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+print(json.dumps({{"seconds": seconds, "peak_rss": peak, "heavy": heavy}}))
+"""
+
+
+def bench_startup(rec, repeat):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [APP_DIR, os.environ.get("PYTHONPATH")])))
+    for name, statement in STARTUP_PROBES:
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, "-c", _PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+                                  capture_output=True, text=True, env=env)
+            lines = proc.stdout.strip().splitlines()
+            if proc.returncode != 0 or not lines:
+                rec.fail(f"startup|-|{name}", (proc.stderr.strip().splitlines() or ["no output"])[-1])
+                continue
+            probe = json.loads(lines[-1])
+            rec.add(f"startup|-|{name}", probe["seconds"], probe["peak_rss"],
+                    "loads " + "+".join(probe["heavy"]) if probe["heavy"] else "no media libs")
+
+
+# =========================
+# REGISTRY PADDING
+# Synthetic header-only records (no packs): large enough to exercise
+# registry / ledger rewrites, SHA lookups and the video scan.
+# =========================
+def pad_registry(target):
+    from core.registry import load_chain, register_references
+    from core.ledger import append_batch_to_ledger
+
+    have = len(load_chain())
+    if have >= target:
+        return 0
+
+    entries, ledger_entries = {}, []
+    now = datetime.utcnow().isoformat()
+    for i in range(have, target):
+        ref_id = f"SEED{i:07d}"
+        media_type = "video" if i % 10 == 0 else "image"
+        sha = hashlib.sha256(ref_id.encode()).hexdigest()
+        entries[ref_id] = {
+            "media_type": media_type,
+            "filename": f"{ref_id.lower()}.{'mp4' if media_type == 'video' else 'png'}",
+            "owner": "benchmark",
+            "sha": sha,
+            "merkle_root": hashlib.sha256(sha.encode()).hexdigest(),
+            "timestamp": now
+        }
+        ledger_entries.append({"ref_id": ref_id, "sha": sha, "owner": "benchmark",
+                               "filename": entries[ref_id]["filename"], "media_type": media_type})
+
+    register_references(entries)
+    append_batch_to_ledger(ledger_entries)
+    return len(entries)
+
+
+# =========================
+# SCENARIOS
+# =========================
+def _artifact_name(url):
+    return url.rsplit("/", 1)[-1] if url else None
+
+
+def _render_artifacts(result):
+    """Waits for the forensic overlay and renders the (lazy) clean reconstruction."""
+    from services import artifact_service
+
+    details = result.get("details") or {}
+    statuses = [artifact_service.resolve(_artifact_name(details.get(k)))["status"]
+                for k in ("reconstructed_url", "clean_url") if details.get(k)]
+    return {"status": "ready" if statuses and all(s == "ready" for s in statuses) else ",".join(statuses) or "none"}
+
+
+def bench_images(rec, size, media_dir, args, counter, originals):
+    from services.image_register_service import register_image
+    from services.image_verify_service import verify_image
+
+    for width, height in args.resolutions:
+        res = f"{width}x{height}"
+        base = synthetic_image(width, height, seed=width * 7 + height)
+
+        # The unmodified image is registered once (at the first registry size);
+        # its tampered copies (ratio 0 = the original file) are verified against it
+        if res not in originals:
+            path = os.path.join(media_dir, f"img_{res}.png")
+            cv2.imwrite(path, base)
+            originals[res] = {"ref_id": f"BENCH_IMG_{res}", "files": {}}
+            with contextlib.redirect_stdout(io.StringIO()):
+                status = register_image(originals[res]["ref_id"], path, "benchmark")["status"]
+            if status != "registered":
+                raise RuntimeError(f"Could not register the {res} reference image: {status}")
+            for ratio in args.tamper_ratios:
+                originals[res]["files"][ratio] = path
+                if ratio > 0:
+                    originals[res]["files"][ratio] = os.path.join(media_dir, f"img_{res}_t{ratio}.png")
+                    cv2.imwrite(originals[res]["files"][ratio], tamper(base, ratio))
+
+        # Register: a fresh file per repetition (and per registry size)
+        for _ in range(args.repeat):
+            counter[0] += 1
+            path = os.path.join(media_dir, f"reg_{res}_{counter[0]}.png")
+            cv2.imwrite(path, stamp(base, counter[0]))
+            ref_id = f"BENCH_IMG_{counter[0]}"
+            rec.measure(f"register_image|{size}|{res}", register_image, ref_id, path, "benchmark")
+            os.remove(path)
+
+        for ratio, path in originals[res]["files"].items():
+            for _ in range(args.repeat):
+                result = rec.measure(f"verify_image|{size}|{res} tamper={ratio}", verify_image,
+                                     originals[res]["ref_id"], path)
+                if result.get("status") == "TAMPERED":
+                    rec.measure(f"render_artifacts|{size}|{res} tamper={ratio}", _render_artifacts, result)
+
+
+def bench_videos(rec, size, media_dir, args, counter):
+    from services.video_register_service import register_video
+    from services.video_verify_service import verify_video, reconstruct_video_content
+
+    for frames in args.video_lengths:
+        for _ in range(args.repeat):
+            counter[0] += 1
+            path = write_video(os.path.join(media_dir, f"vid_{frames}_{counter[0]}.mp4"), frames, seed=counter[0])
+            ref_id = f"BENCH_VID_{counter[0]}"
+            rec.measure(f"register_video|{size}|{frames}f", register_video, ref_id, path, "benchmark")
+
+            tampered = write_video(os.path.join(media_dir, f"vid_{frames}_{counter[0]}_t.mp4"), frames,
+                                   seed=counter[0], tampered=True)
+            rec.measure(f"verify_video|{size}|{frames}f authentic", verify_video, ref_id, path)
+            rec.measure(f"verify_video|{size}|{frames}f tampered", verify_video, ref_id, tampered)
+            rec.measure(f"reconstruct_video|{size}|{frames}f", reconstruct_video_content, ref_id)
+            os.remove(path)
+            os.remove(tampered)
+
+
+# =========================
+# BASELINES
+# =========================
+def compare(current, baseline, tolerance):
+    """Returns [(key, metric, baseline, current)] for p50 / peak RSS beyond tolerance and new failures."""
+    regressions = []
+    for key, now in current.items():
+        before = baseline.get(key)
+        if not before:
+            continue
+        failed_before = before.get("statuses", {}).get("exception", 0)
+        failed_now = now["statuses"].get("exception", 0)
+        if failed_now > failed_before:
+            regressions.append((key, "exceptions", failed_before, failed_now))
+        for metric in ("p50_ms", "peak_rss_mb"):
+            if before.get(metric) and now.get(metric) and now[metric] > before[metric] * (1 + tolerance):
+                regressions.append((key, metric, before[metric], now[metric]))
+    return regressions
+
+
+def print_table(results):
+    print(f"{'scenario':<48} {'size':>7} {'n':>3} {'ops/s':>8} {'p50 ms':>10} {'p99 ms':>10} {'rss MB':>8}  statuses")
+    for key in results:
+        op, size, variant = key.split("|")
+        r = results[key]
+        print(f"{(op + ' ' + variant)[:48]:<48} {size:>7} {r['n']:>3} {str(r['throughput']):>8} "
+              f"{str(r['p50_ms']):>10} {str(r['p99_ms']):>10} {str(r['peak_rss_mb']):>8}  {r['statuses']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark register / verify / reconstruct on synthetic media.")
+    # Scenario options default to None so --quick can tell which ones were given
+    parser.add_argument("--resolutions", help="e.g. 640x480,1920x1080")
+    parser.add_argument("--tamper-ratios", help="Fractions of the image area altered (0 = authentic re-upload)")
+    parser.add_argument("--video-lengths", help="Frames")
+    parser.add_argument("--registry-sizes")
+    parser.add_argument("--repeat", type=int, help="Samples per scenario and registry size")
+    parser.add_argument("--quick", action="store_true",
+                        help="640x480, 30 frames, registry 10 and 1000, 3 samples (unless given explicitly)")
+    parser.add_argument("--skip-images", action="store_true")
+    parser.add_argument("--skip-videos", action="store_true")
+    parser.add_argument("--skip-startup", action="store_true", help="Skip the import-time / memory probes")
+    parser.add_argument("--startup-only", action="store_true")
+    parser.add_argument("--workdir", help="Scratch directory (default: a new temp dir, removed afterwards)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    parser.add_argument("--output", help="Also write this run's results (JSON) here")
+    parser.add_argument("--save-baseline", nargs="?", const=BENCH_BASELINE_PATH, metavar="PATH")
+    parser.add_argument("--compare", nargs="?", const=BENCH_BASELINE_PATH, metavar="PATH",
+                        help="Flag regressions against a saved baseline (exit status 1)")
+    parser.add_argument("--tolerance", type=float, default=BENCH_REGRESSION_TOLERANCE)
+    parser.add_argument("--verbose", action="store_true", help="Show the services' own log output")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        defaults = {"resolutions": "640x480", "tamper_ratios": "0,0.1", "video_lengths": "30",
+                    "registry_sizes": "10,1000", "repeat": 3}
+    else:
+        defaults = {"resolutions": ",".join(BENCH_RESOLUTIONS),
+                    "tamper_ratios": ",".join(str(r) for r in BENCH_TAMPER_RATIOS),
+                    "video_lengths": ",".join(str(n) for n in BENCH_VIDEO_LENGTHS),
+                    "registry_sizes": ",".join(str(n) for n in BENCH_REGISTRY_SIZES),
+                    "repeat": BENCH_REPEAT}
+    for name, value in defaults.items():
+        if getattr(args, name) is None:
+            setattr(args, name, value)
+    args.resolutions = _csv(args.resolutions, _resolution)
+    args.tamper_ratios = _csv(args.tamper_ratios, float)
+    args.video_lengths = _csv(args.video_lengths, int)
+    sizes = sorted(_csv(args.registry_sizes, int))
+
+    # Paths given on the command line are relative to where it was run
+    output, save_path, compare_path = (os.path.abspath(p) if p else None
+                                       for p in (args.output, args.save_baseline, args.compare))
+    baseline = None
+    if compare_path:
+        with open(compare_path, "r") as f:
+            baseline = json.load(f)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="forensics-bench-")
+    if os.path.exists(os.path.join(workdir, "registry", "blockchain.json")):
+        raise SystemExit(f"{workdir} already holds a registry; pass an empty --workdir.")
+    media_dir = os.path.join(workdir, "media")
+    os.makedirs(os.path.join(workdir, "registry"), exist_ok=True)
+    os.makedirs(media_dir, exist_ok=True)
+    for name in ("blockchain.json", "ledger.json"):
+        with open(os.path.join(workdir, "registry", name), "w") as f:
+            json.dump({}, f)
+
+    # Every relative path in config.py now resolves inside the scratch dir
+    sys.path.insert(0, APP_DIR)
+    os.chdir(workdir)
+    print(f"Benchmark workdir: {workdir}")
+
+    rec = Recorder(quiet=not args.verbose)
+    counter = [0]
+    originals = {}
+    started = time.time()
+    try:
+        if not args.skip_startup:
+            print("Startup probes")
+            bench_startup(rec, args.repeat)
+        for size in ([] if args.startup_only else sizes):
+            padded = pad_registry(size)
+            print(f"Registry size {size} (+{padded} synthetic records)")
+            if not args.skip_images:
+                bench_images(rec, size, media_dir, args, counter, originals)
+            if not args.skip_videos:
+                bench_videos(rec, size, media_dir, args, counter)
+    finally:
+        if not args.keep:
+            os.chdir(APP_DIR)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = rec.summary()
+    print()
+    print_table(results)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seconds": round(time.time() - started, 1),
+            "args": {k: v for k, v in vars(args).items() if k in ("resolutions", "tamper_ratios", "video_lengths", "repeat")},
+            "registry_sizes": sizes
+        },
+        "results": results
+    }
+    for path in (output, save_path):
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Results written to {path}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline.get("results", {}), args.tolerance)
+        missing = [k for k in baseline.get("results", {}) if k not in results]
+        print(f"\nCompared with {compare_path} (tolerance {args.tolerance:.0%}): "
+              f"{len(regressions)} regression(s), {len(missing)} baseline scenario(s) not run")
+        for key, metric, before, now in regressions:
+            change = f" ({(now / before - 1):+.0%})" if before else ""
+            print(f"  REGRESSION {key} {metric}: {before} -> {now}{change}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import hashlib
+import tempfile
+
+from config import BLOCK_PACK_DIR
+
+DIGEST_SIZE = 32  # raw SHA-256
+
+# =========================
+# PACK / UNPACK
+# 64-char hex digests <-> one contiguous blob of 32-byte digests
+# =========================
+def pack_hashes(hex_hashes):
+    return bytes.fromhex("".join(hex_hashes))
+
+def unpack_hashes(blob):
+    hex_blob = blob.hex()
+    step = DIGEST_SIZE * 2
+    return [hex_blob[i:i + step] for i in range(0, len(hex_blob), step)]
+
+
+# =========================
+# SIDE FILES (registry/packs/<sha256-of-blob>.bin)
+# Content-addressed: immutable, de-duplicated and self-verifying.
+# =========================
+def write_pack(hex_hashes):
+    """Stores the packed digests and returns the pack id to keep on the record."""
+    blob = pack_hashes(hex_hashes)
+    pack_id = hashlib.sha256(blob).hexdigest()
+    path = os.path.join(BLOCK_PACK_DIR, f"{pack_id}.bin")
+
+    if not os.path.exists(path):
+        os.makedirs(BLOCK_PACK_DIR, exist_ok=True)
+        # Unique temp name: two workers may store the same pack at once
+        fd, tmp_path = tempfile.mkstemp(dir=BLOCK_PACK_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+
+    return pack_id
+
+def read_pack(pack_id):
+    with open(os.path.join(BLOCK_PACK_DIR, f"{pack_id}.bin"), "rb") as f:
+        blob = f.read()
+    if len(blob) % DIGEST_SIZE:
+        raise ValueError(f"Corrupt block pack {pack_id}: size {len(blob)}")
+    return unpack_hashes(blob)
+
+
+# =========================
+# POSITIONS (derived, never stored)
+# =========================
+def grid_shape(height, width, block_size):
+    return [-(-height // block_size), -(-width // block_size)]  # ceil division
+
+def grid_positions(rows, cols, block_size):
+    """Same row-major (y, x) order as core.preprocess.slice_blocks."""
+    return [(r * block_size, c * block_size) for r in range(rows) for c in range(cols)]
@@ -0,0 +1,241 @@
+import sys
+import os
+import csv
+import json
+import time
+import argparse
+from datetime import datetime
+from multiprocessing import Pool
+
+from core.hashing import sha256_file
+from core.registry import load_chain, add_references
+from core.ledger import append_batch_to_ledger, LedgerIntegrityError
+from services.image_register_service import build_image_record
+from services.video_register_service import build_video_record
+from core.media_types import detect_media_type
+from config import BULK_REGISTER_WORKERS, BULK_COMMIT_SIZE
+
+# -------------------------------
+# Usage:
+#   python bulk_register.py <directory> [--ref-prefix ARCHIVE/] [--owner NAME]
+#   python bulk_register.py <manifest.csv|manifest.jsonl> [--owner NAME]
+#
+# Manifest rows: ref_id,path[,owner]  (CSV)  or  {"ref_id", "path", "owner"?}  (JSONL)
+# Directory mode derives ref_id from the relative path without extension.
+#
+# Images/videos are hashed and sliced in a process pool; registry and
+# ledger entries (same schema as the register services) are committed
+# every --commit-size items with a single rewrite each.
+# -------------------------------
+
+_known_shas = set()
+
+
+def _init_worker(known_shas):
+    global _known_shas
+    _known_shas = known_shas
+
+    from core.streaming import allow_large_images
+    allow_large_images()  # operator-chosen files, not uploads
+
+
+# -------------------------------
+# Task discovery
+# -------------------------------
+def iter_directory(root, ref_prefix, owner):
+    for dirpath, _, names in os.walk(root):
+        for name in sorted(names):
+            path = os.path.join(dirpath, name)
+            if not detect_media_type(name):
+                continue
+            rel = os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, "/")
+            yield (f"{ref_prefix}{rel}", path, owner)
+
+
+def iter_manifest(manifest_path, owner):
+    with open(manifest_path, "r", newline="") as f:
+        if manifest_path.lower().endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield (row["ref_id"], row["path"], row.get("owner") or owner)
+        else:
+            for row in csv.reader(f):
+                if not row or row[0].strip().lower() == "ref_id":
+                    continue  # blank line / header
+                yield (row[0].strip(), row[1].strip(), (row[2].strip() if len(row) > 2 and row[2].strip() else owner))
+
+
+# -------------------------------
+# Worker (runs in the process pool)
+# -------------------------------
+def _process_item(task):
+    ref_id, path, owner = task
+    result = {"ref_id": ref_id, "path": path, "owner": owner}
+
+    try:
+        media_type = detect_media_type(path)
+        if not media_type:
+            return dict(result, status="error", message="Unsupported media type.")
+
+        sha = sha256_file(path)
+        result.update(sha=sha, media_type=media_type, bytes=os.path.getsize(path))
+
+        # Skip the heavy slicing for content already on the blockchain
+        if sha in _known_shas:
+            return dict(result, status="duplicate")
+
+        if media_type == "image":
+            record = build_image_record(path)
+        else:
+            record = build_video_record(ref_id, path)
+
+        return dict(result, status="ok", record=record)
+
+    except Exception as e:
+        return dict(result, status="error", message=str(e))
+
+
+# -------------------------------
+# Batched commit (one ledger + one registry rewrite)
+# -------------------------------
+def commit_batch(pending):
+    """
+    Registers the pending items, ledger first. Items whose ref_id or SHA was
+    registered since the run started (a concurrent upload) are left alone.
+    Returns {"registered": {ref_id: block_index}, "duplicates": [ref_id, ...]}.
+    """
+    if not pending:
+        return {"registered": {}, "duplicates": []}
+
+    timestamp = datetime.utcnow().isoformat()
+    entries = {}
+    ledger_entries = {}
+
+    for item in pending:
+        filename = os.path.basename(item["path"])
+        entries[item["ref_id"]] = {
+            "media_type": item["media_type"],
+            "filename": filename,
+            "owner": item["owner"],
+            "sha": item["sha"],
+            **item["record"],
+            "timestamp": timestamp
+        }
+        ledger_entries[item["ref_id"]] = {
+            "ref_id": item["ref_id"],
+            "sha": item["sha"],
+            "owner": item["owner"],
+            "filename": filename,
+            "media_type": item["media_type"]
+        }
+
+    fresh, duplicates, indexes = add_references(
+        entries, before_write=lambda fresh: append_batch_to_ledger([ledger_entries[r] for r in fresh])
+    )
+    return {"registered": dict(zip(fresh, indexes or [])), "duplicates": duplicates}
+
+
+def _print_progress(stats, started):
+    elapsed = max(time.time() - started, 1e-9)
+    print(
+        f"[{elapsed:8.1f}s] processed={stats['processed']} registered={stats['registered']} "
+        f"duplicates={stats['duplicates']} skipped={stats['skipped']} errors={stats['errors']} "
+        f"| {stats['processed'] / elapsed:.1f} items/s, {stats['bytes'] / elapsed / (1024 * 1024):.1f} MB/s",
+        file=sys.stderr
+    )
+
+
+# -------------------------------
+# Main
+# -------------------------------
+def _commit(pending, stats):
+    try:
+        committed = commit_batch(pending)
+    except LedgerIntegrityError as e:
+        # Nothing of this batch was written; every later batch would be refused too
+        stats["errors"] += len(pending)
+        stats["ledger_error"] = str(e)
+        print(f"LEDGER ERROR: {e} {len(pending)} items not registered, run stopped.", file=sys.stderr)
+        return
+    stats["registered"] += len(committed["registered"])
+    stats["duplicates"] += len(committed["duplicates"])
+    for ref_id in committed["duplicates"]:
+        print(f"DUPLICATE {ref_id}: registered concurrently, skipped", file=sys.stderr)
+
+
+def run(tasks, workers=BULK_REGISTER_WORKERS, commit_size=BULK_COMMIT_SIZE):
+    chain = load_chain()
+    existing_refs = set(chain.keys())
+    known_shas = {e.get("sha") for e in chain.values() if e.get("sha")}
+    del chain
+
+    stats = {"processed": 0, "registered": 0, "duplicates": 0, "skipped": 0, "errors": 0, "bytes": 0,
+             "ledger_error": None}
+    started = time.time()
+
+    # Reference IDs already registered are never reprocessed
+    todo = []
+    for task in tasks:
+        if task[0] in existing_refs:
+            stats["skipped"] += 1
+        else:
+            existing_refs.add(task[0])
+            todo.append(task)
+
+    pending = []
+    with Pool(processes=max(1, workers), initializer=_init_worker, initargs=(known_shas,)) as pool:
+        chunksize = max(1, min(32, len(todo) // (workers * 4 or 1)))
+
+        for result in pool.imap_unordered(_process_item, todo, chunksize=chunksize):
+            stats["processed"] += 1
+            stats["bytes"] += result.get("bytes", 0)
+
+            if result["status"] == "error":
+                stats["errors"] += 1
+                print(f"ERROR {result['ref_id']} ({result['path']}): {result['message']}", file=sys.stderr)
+            elif result["status"] == "duplicate" or result["sha"] in known_shas:
+                stats["duplicates"] += 1
+            else:
+                known_shas.add(result["sha"])
+                pending.append(result)
+
+            if len(pending) >= commit_size:
+                _commit(pending, stats)
+                pending = []
+                _print_progress(stats, started)
+                if stats["ledger_error"]:
+                    break
+
+    if not stats["ledger_error"]:
+        _commit(pending, stats)
+
+    stats["elapsed_seconds"] = round(time.time() - started, 3)
+    _print_progress(stats, started)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Register a directory or manifest of media in bulk.")
+    parser.add_argument("source", help="Directory to walk, or a .csv / .jsonl manifest")
+    parser.add_argument("--owner", default="bulk-import")
+    parser.add_argument("--ref-prefix", default="", help="Prefix for ref_ids derived from paths (directory mode)")
+    parser.add_argument("--workers", type=int, default=BULK_REGISTER_WORKERS)
+    parser.add_argument("--commit-size", type=int, default=BULK_COMMIT_SIZE)
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.source):
+        tasks = iter_directory(args.source, args.ref_prefix, args.owner)
+    elif os.path.isfile(args.source):
+        tasks = iter_manifest(args.source, args.owner)
+    else:
+        print(f"Source not found: {args.source}", file=sys.stderr)
+        return 1
+
+    stats = run(tasks, workers=args.workers, commit_size=args.commit_size)
+    print(json.dumps(stats))
+    return 1 if stats["errors"] or stats["ledger_error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import io
+import json
+import hashlib
+import zipfile
+from datetime import datetime
+
+from core.registry import find_reference, get_block_hashes, get_block_positions, get_frame_hashes
+from core.blockpack import pack_hashes
+from core.ledger import find_block, chain_segment
+from config import BLOCK_SIZE, BUNDLE_MAX_CHAIN_BLOCKS
+import metrics
+
+# =======================================================
+# OFFLINE VERIFICATION BUNDLE
+# A zip a third party can check media against with bundle_verifier.py,
+# without access to this server:
+#   manifest.json  record header, ledger block and the chain segment
+#                  from that block towards the tip
+#   blocks.bin     image block digests (32 raw bytes each, row-major)
+#   frames.bin     video frame digests (32 raw bytes each)
+# The digests are tied to the record by its Merkle root and the file to
+# the ledger by the block's fingerprint; the segment links the block
+# to a later ledger head by prev_hash. The verifier only trusts the bundle
+# when that segment reaches a block hash it got elsewhere (--trusted-head).
+# =======================================================
+BUNDLE_FORMAT = "forensics-bundle/1"
+
+# Header fields copied into the manifest (pack ids are server-side paths)
+RECORD_FIELDS = ("media_type", "filename", "owner", "sha", "merkle_root", "timestamp", "width", "height",
+                 "block_size", "grid", "color_mode", "block_count", "frame_count")
+
+
+def export_bundle(ref_id):
+    """
+    Builds the verification bundle of one registered reference.
+    Returns {"status": "success", "filename", "data": zip bytes} or {"status": "error", "message"}.
+    """
+    with metrics.span("bundle.lookup"):
+        key, header = find_reference(ref_id)
+    if not header:
+        return {"status": "error", "message": "Reference ID not found."}
+
+    sha = header.get("sha") or header.get("fingerprint")
+    block = find_block(key, sha)
+    if block is None:
+        return {"status": "error", "message": "No ledger block records this reference."}
+
+    with metrics.span("bundle.chain"):
+        segment, tip_index = chain_segment(block["index"], BUNDLE_MAX_CHAIN_BLOCKS)
+
+    record = {k: header[k] for k in RECORD_FIELDS if k in header}
+    record["sha"] = sha
+    files = {}
+
+    with metrics.span("bundle.digests"):
+        if header.get("media_type") == "video":
+            files["frames.bin"] = pack_hashes(get_frame_hashes(header, key))
+            record["frame_count"] = len(files["frames.bin"]) // 32
+        else:
+            files["blocks.bin"] = pack_hashes(get_block_hashes(header, key))
+            record["block_count"] = len(files["blocks.bin"]) // 32
+            record.setdefault("block_size", BLOCK_SIZE)
+            record.setdefault("color_mode", "L")  # legacy records were hashed in grayscale
+            if "grid" not in header:
+                # Legacy records: explicit (y, x) per block
+                record["positions"] = [list(p) for p in get_block_positions(header, key)]
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "reference_id": key,
+        "exported_at": datetime.utcnow().isoformat() + "Z",
+        "record": record,
+        "ledger_block": block,
+        "chain": {
+            "blocks": segment,
+            "tip_index": tip_index,
+            "complete": bool(segment) and segment[-1]["index"] == tip_index
+        },
+        "files": {name: hashlib.sha256(data).hexdigest() for name, data in files.items()}
+    }
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as bundle:
+        bundle.writestr("manifest.json", json.dumps(manifest, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+        for name, data in files.items():
+            bundle.writestr(name, data, compress_type=zipfile.ZIP_STORED)  # digests do not compress
+
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in key)
+    return {"status": "success", "filename": f"{safe_name}.bundle.zip", "data": buffer.getvalue()}
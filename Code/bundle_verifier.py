@@ -0,0 +1,246 @@
+import sys
+import json
+import hashlib
+import zipfile
+import argparse
+
+# -------------------------------
+# Standalone verifier for offline verification bundles
+# (GET /bundle?ref_id=... on the server, see services/bundle_service.py).
+#   python bundle_verifier.py IMG001.bundle.zip photo.png --trusted-head HASH
+#   python bundle_verifier.py IMG001.bundle.zip --trusted-head HASH   # bundle checks only
+#
+# A bundle is self-consistent by construction, so anyone can forge one.
+# It only proves something once its chain segment reaches a ledger block
+# hash obtained from a trusted source (the published ledger head, or the
+# block_hash of a published checkpoint): --trusted-head. Without a match
+# a file that matches the bundle is reported UNANCHORED, not AUTHENTIC.
+#
+# Needs no registry, server or project imports: copy this one file.
+# SHA and chain checks use the standard library only; locating tampered
+# image blocks additionally needs NumPy and Pillow.
+# -------------------------------
+BUNDLE_FORMAT = "forensics-bundle/1"
+DIGEST_SIZE = 32
+CHUNK_SIZE = 1024 * 1024
+
+
+class BundleError(Exception):
+    pass
+
+
+# -------------------------------
+# Hashing (same definitions as the server)
+# -------------------------------
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def merkle_root(hashes):
+    if not hashes:
+        return None
+    while len(hashes) > 1:
+        hashes = [
+            hashlib.sha256((hashes[i] + (hashes[i + 1] if i + 1 < len(hashes) else hashes[i])).encode()).hexdigest()
+            for i in range(0, len(hashes), 2)
+        ]
+    return hashes[0]
+
+
+def block_hash(block):
+    """Ledger block hash: SHA-256 of the canonical JSON of every other field."""
+    content = {k: v for k, v in block.items() if k != "block_hash"}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def unpack_digests(blob):
+    if len(blob) % DIGEST_SIZE:
+        raise BundleError(f"Digest file size {len(blob)} is not a multiple of {DIGEST_SIZE}.")
+    hex_blob = blob.hex()
+    step = DIGEST_SIZE * 2
+    return [hex_blob[i:i + step] for i in range(0, len(hex_blob), step)]
+
+
+# -------------------------------
+# Bundle checks
+# -------------------------------
+def load_bundle(path):
+    """Returns (manifest, digests) after checking file digests and the Merkle root."""
+    try:
+        with zipfile.ZipFile(path) as bundle:
+            manifest = json.loads(bundle.read("manifest.json"))
+            files = {name: bundle.read(name) for name in manifest.get("files", {})}
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+        raise BundleError(f"Unreadable bundle: {e}")
+
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise BundleError(f"Unsupported bundle format: {manifest.get('format')}")
+
+    for name, expected in manifest["files"].items():
+        if hashlib.sha256(files[name]).hexdigest() != expected:
+            raise BundleError(f"{name} does not match its digest in the manifest.")
+
+    record = manifest["record"]
+    name = "frames.bin" if record.get("media_type") == "video" else "blocks.bin"
+    if name not in files:
+        raise BundleError(f"Bundle has no {name}.")
+    digests = unpack_digests(files[name])
+    if merkle_root(list(digests)) != record.get("merkle_root"):
+        raise BundleError("Digests do not reproduce the record's Merkle root.")
+    return manifest, digests
+
+
+def check_chain(manifest, trusted_heads=()):
+    """
+    Checks the ledger block against the record and the chain segment's links.
+    Returns {"anchor_index", "anchor_hash", "complete", "trusted_index"}:
+    the last block the record is proven to precede, and the first block of
+    the segment whose hash is one of trusted_heads (None: not anchored).
+    """
+    record = manifest["record"]
+    block = manifest["ledger_block"]
+    segment = manifest["chain"]["blocks"]
+
+    if block.get("fingerprint") != record.get("sha"):
+        raise BundleError("Ledger block fingerprint does not match the record's SHA-256.")
+    if str(block.get("reference_id", "")).lower() != str(manifest.get("reference_id", "")).lower():
+        raise BundleError("Ledger block belongs to another reference.")
+    if not segment or segment[0] != block:
+        raise BundleError("Chain segment does not start at the record's ledger block.")
+
+    for i, b in enumerate(segment):
+        if b.get("block_hash") != block_hash(b):
+            raise BundleError(f"Ledger block {b.get('index')} does not match its block_hash.")
+        if i and b.get("prev_hash") != segment[i - 1]["block_hash"]:
+            raise BundleError(f"Ledger block {b.get('index')} does not link to block {segment[i - 1].get('index')}.")
+
+    trusted = {h.strip().lower() for h in trusted_heads if h}
+    trusted_index = next((b["index"] for b in segment if b["block_hash"] in trusted), None)
+    return {"anchor_index": segment[-1]["index"], "anchor_hash": segment[-1]["block_hash"],
+            "complete": manifest["chain"].get("complete", False), "trusted_index": trusted_index}
+
+
+# -------------------------------
+# Block localization (images; NumPy + Pillow)
+# -------------------------------
+def _positions(record):
+    size = record["block_size"]
+    if record.get("positions"):
+        return [tuple(p) for p in record["positions"]]
+    rows, cols = record["grid"]
+    return [(r * size, c * size) for r in range(rows) for c in range(cols)]
+
+
+def locate_tampering(record, digests, file_path):
+    """Returns (tampered block indexes, tamper percent, [x, y, w, h] regions) or None without NumPy/Pillow."""
+    try:
+        import numpy as np
+        from PIL import Image
+    except ImportError:
+        return None
+
+    Image.MAX_IMAGE_PIXELS = None  # the file is the user's own, not an upload
+    img = Image.open(file_path)
+    mode = record["color_mode"]
+    pixels = np.asarray(img if img.mode == mode else img.convert(mode))
+    height, width = pixels.shape[:2]
+    size = record["block_size"]
+
+    current = [hashlib.sha256(pixels[y:y + size, x:x + size].tobytes()).hexdigest()
+               for y in range(0, height, size) for x in range(0, width, size)]
+    positions = _positions(record)
+
+    tampered = [i for i in range(max(len(current), len(digests)))
+                if i >= len(current) or i >= len(digests) or current[i] != digests[i]]
+    percent = len(tampered) / max(len(current), len(digests)) * 100 if digests else 100.0
+    regions = [[x, y, min(size, width - x), min(size, height - y)]
+               for x, y in ((positions[i][1], positions[i][0]) for i in tampered if i < len(positions))
+               if x < width and y < height]
+    return tampered, percent, regions
+
+
+# -------------------------------
+# Verification
+# -------------------------------
+def _unanchored(chain, details, message):
+    first = details["ledger_index"]
+    return {"status": "UNANCHORED",
+            "message": f"{message} Nothing ties the bundle to the real ledger: pass --trusted-head with the "
+                       f"published hash of a ledger block from {first} to {chain['anchor_index']}.",
+            "details": details}
+
+
+def verify(bundle_path, file_path=None, trusted_heads=()):
+    """
+    Verifies a bundle and, when given, a file against it. trusted_heads are
+    ledger block hashes from a trusted source; the bundle's chain segment
+    must reach one of them.
+    Status: VALID_BUNDLE (no file), AUTHENTIC, TAMPERED, UNANCHORED (would be
+    VALID_BUNDLE / AUTHENTIC, but no trusted head anchors the bundle) or INVALID_BUNDLE.
+    """
+    try:
+        manifest, digests = load_bundle(bundle_path)
+        chain = check_chain(manifest, trusted_heads)
+    except BundleError as e:
+        return {"status": "INVALID_BUNDLE", "message": str(e)}
+    anchored = chain["trusted_index"] is not None
+
+    record = manifest["record"]
+    details = {
+        "reference_id": manifest["reference_id"],
+        "media_type": record.get("media_type"),
+        "expected_sha": record["sha"],
+        "ledger_index": manifest["ledger_block"]["index"],
+        "chain": chain
+    }
+    if file_path is None:
+        if not anchored:
+            return _unanchored(chain, details, "Bundle is internally consistent.")
+        return {"status": "VALID_BUNDLE", "message": "Bundle is consistent and anchored.", "details": details}
+
+    details["sha"] = sha256_file(file_path)
+    if details["sha"] == record["sha"]:
+        details["tamper_score"] = 0
+        if not anchored:
+            return _unanchored(chain, details, "File matches the bundle's original.")
+        return {"status": "AUTHENTIC", "message": "File matches the registered original.", "details": details}
+
+    details["tamper_score"] = 100
+    if record.get("media_type") != "video":
+        located = locate_tampering(record, digests, file_path)
+        if located is None:
+            details["localization"] = "unavailable (install numpy and Pillow)"
+        else:
+            tampered, percent, regions = located
+            if not tampered:
+                details["tamper_score"] = 0
+                if not anchored:
+                    return _unanchored(chain, details, "File matches the bundle's original (metadata mismatch only).")
+                return {"status": "AUTHENTIC", "message": "Metadata mismatch only.", "details": details}
+            details.update(tamper_score=round(percent, 2), tampered_blocks=len(tampered), tamper_regions=regions)
+    return {"status": "TAMPERED", "message": "Hash mismatch against the registered original.", "details": details}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify media against an offline verification bundle.")
+    parser.add_argument("bundle")
+    parser.add_argument("file", nargs="?")
+    parser.add_argument("--trusted-head", action="append", default=[], metavar="HASH",
+                        help="Ledger block hash from a trusted source (published head or checkpoint); repeatable")
+    parser.add_argument("--regions", action="store_true", help="Print every tamper region")
+    args = parser.parse_args(argv)
+
+    result = verify(args.bundle, args.file, args.trusted_head)
+    if not args.regions and "tamper_regions" in result.get("details", {}):
+        regions = result["details"].pop("tamper_regions")
+        result["details"]["tamper_regions_count"] = len(regions)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["status"] in ("AUTHENTIC", "VALID_BUNDLE") else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import metrics
+from config import JSON_CACHE_MAX_BYTES
+
+# =========================
+# LRU CACHE
+# =========================
+class LRUCache:
+    """Thread-safe LRU with hit/miss counters. Bounded by entry count."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+# =========================
+# JSON FILE CACHE
+# =========================
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+class JSONFileCache:
+    """
+    Process-wide cache of parsed JSON files (registry/blockchain.json,
+    registry/ledger.json). An entry is valid while the file's
+    (mtime, inode, size) is unchanged, so external writers are picked up;
+    in-process writers call notify_write() and skip the re-parse entirely.
+
+    Returned objects are SHARED: callers must copy before mutating.
+    Derived structures (indexes) can be attached with derive(); they are
+    dropped together with the parsed document.
+    """
+
+    def __init__(self, max_bytes=JSON_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> {"stamp", "data", "size", "derived"}
+        self._lock = threading.RLock()  # derive() builders may load other files
+        self.hits = 0
+        self.misses = 0
+        self.parses = 0
+
+    def _evict(self):
+        total = sum(e["size"] for e in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            total -= old["size"]
+
+    def _store(self, path, stamp, data):
+        self._entries[path] = {"stamp": stamp, "data": data, "size": stamp[2] if stamp else 0, "derived": {}}
+        self._entries.move_to_end(path)
+        self._evict()
+
+    def _current(self, path, default, strict):
+        """Returns the live entry for path (parsing on miss). Caller holds the lock."""
+        stamp = _stamp(path)
+        entry = self._entries.get(path)
+
+        if entry and entry["stamp"] == stamp:
+            self.hits += 1
+            self._entries.move_to_end(path)
+            return entry
+
+        self.misses += 1
+        data = default() if callable(default) else default
+        if stamp is not None:
+            with open(path, "r") as f, metrics.span("registry.json_parse"):
+                try:
+                    data = json.load(f)
+                    self.parses += 1
+                    metrics.inc("json_parses_total", file=os.path.basename(path))
+                except ValueError:
+                    # strict callers (the registry) must never treat a corrupt file as empty,
+                    # so the fallback is handed out uncached and the next call re-parses
+                    if strict:
+                        raise
+                    return {"stamp": None, "data": data, "size": 0, "derived": {}}
+
+        self._store(path, stamp, data)
+        return self._entries[path]
+
+    def load(self, path, default=dict, strict=False):
+        with self._lock:
+            return self._current(path, default, strict)["data"]
+
+    def derive(self, path, name, builder, default=dict, strict=False):
+        """builder(parsed) is computed once per file version and cached alongside it."""
+        with self._lock:
+            entry = self._current(path, default, strict)
+            if name not in entry["derived"]:
+                entry["derived"][name] = builder(entry["data"])
+            return entry["derived"][name]
+
+    def notify_write(self, path, data):
+        """Called right after an in-process write of `data` to `path`."""
+        with self._lock:
+            self._store(path, _stamp(path), data)
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "bytes": sum(e["size"] for e in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "parses": self.parses
+            }
+
+
+# Shared instance used by core.registry and core.ledger
+json_cache = JSONFileCache()
+
+
+# =========================
+# WRITE LOCKS
+# Registration runs in several worker processes (services/compute_service),
+# each with its own cache. A load -> modify -> replace of a shared JSON file
+# holds an exclusive lock on "<path>.lock" so no writer overwrites blocks or
+# entries another process added in between. Not re-entrant.
+# =========================
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def locked(path):
+    """Exclusive lock on `path` across threads and processes for the duration of the block."""
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(path, threading.Lock())
+
+    with thread_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".lock", "a+b") as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # gives up after ~10 s
+                        break
+                    except OSError:
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,312 @@
+import os
+import hmac
+import tempfile
+import json
+import hashlib
+
+from core.cache import json_cache
+from core.merkle import merkle_root, merkle_path, root_from_path
+from config import LEDGER_CHECKPOINT_PATH, LEDGER_CHECKPOINT_INTERVAL, LEDGER_CHECKPOINT_KEY
+
+GENESIS_HASH = hashlib.sha256(b"GENESIS_BLOCK").hexdigest()
+LEGACY_PREV_HASH = "00000000000000000000000000000000_LEGACY"  # same marker as core.ledger
+ZERO_ROOT = "0" * 64
+
+# ================================
+# LEDGER CHECKPOINTS (registry/ledger_checkpoints.json)
+# Every LEDGER_CHECKPOINT_INTERVAL blocks a checkpoint records
+#   index, block_hash       the block it pins
+#   window_root             Merkle root of the block hashes since the previous checkpoint
+#   cumulative_root         sha256(previous cumulative_root + window_root)
+#   checkpoint_hash         hash (HMAC with LEDGER_CHECKPOINT_KEY) of the fields above
+# and "head" records the last block written (sealed the same way), so a ledger
+# that lost blocks since then no longer validates. Tip validation then walks only the blocks after the last checkpoint, and a
+# membership proof is a Merkle path inside one window. Writes only ever
+# extend the sidecar: a ledger that no longer matches it is refused
+# (check_history), never re-pinned. rebuild() recreates the sidecar from
+# ledger.json as it is now and is an explicit operator action.
+# ================================
+def _block(data, index):
+    return data.get(str(index))
+
+
+def _content_hash(block):
+    content = {k: v for k, v in block.items() if k != "block_hash"}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def _leaf(block):
+    # Legacy blocks without a block_hash enter the accumulator by content
+    return block.get("block_hash") or _content_hash(block)
+
+
+def _seal(record, field="checkpoint_hash"):
+    payload = json.dumps({k: v for k, v in record.items() if k != field}, sort_keys=True).encode()
+    if LEDGER_CHECKPOINT_KEY:
+        key = LEDGER_CHECKPOINT_KEY.encode() if isinstance(LEDGER_CHECKPOINT_KEY, str) else LEDGER_CHECKPOINT_KEY
+        return hmac.new(key, payload, hashlib.sha256).hexdigest()
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _make_checkpoint(data, start, end, prev_cumulative):
+    leaves = [_leaf(_block(data, i)) for i in range(start, end + 1)]
+    window_root = merkle_root(leaves)
+    checkpoint = {
+        "index": end,
+        "block_hash": _block(data, end).get("block_hash"),
+        "window_start": start,
+        "window_root": window_root,
+        "cumulative_root": hashlib.sha256((prev_cumulative + window_root).encode()).hexdigest(),
+        "signed": bool(LEDGER_CHECKPOINT_KEY)
+    }
+    checkpoint["checkpoint_hash"] = _seal(checkpoint)
+    return checkpoint
+
+
+def _make_head(data):
+    tip = _tip_index(data)
+    head = {"index": tip, "block_hash": _block(data, tip).get("block_hash")}
+    head["head_hash"] = _seal(head, "head_hash")
+    return head
+
+
+# ================================
+# SIDECAR
+# ================================
+def load():
+    return json_cache.load(LEDGER_CHECKPOINT_PATH, default=lambda: {"interval": LEDGER_CHECKPOINT_INTERVAL, "checkpoints": []})
+
+
+def _save(sidecar):
+    os.makedirs(os.path.dirname(LEDGER_CHECKPOINT_PATH), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(LEDGER_CHECKPOINT_PATH), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(sidecar, f, indent=2)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, LEDGER_CHECKPOINT_PATH)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    json_cache.notify_write(LEDGER_CHECKPOINT_PATH, sidecar)
+
+
+def _tip_index(data):
+    return max(int(k) for k in data) if data else -1
+
+
+def _extend(data, checkpoints):
+    """Appends the checkpoints that full windows after the last one call for. Returns how many."""
+    added = 0
+    tip = _tip_index(data)
+    last = checkpoints[-1] if checkpoints else None
+    while True:
+        start = last["index"] + 1 if last else 0
+        end = (last["index"] if last else 0) + LEDGER_CHECKPOINT_INTERVAL
+        if end > tip:
+            return added
+        last = _make_checkpoint(data, start, end, last["cumulative_root"] if last else ZERO_ROOT)
+        checkpoints.append(last)
+        added += 1
+
+
+def check_history(data):
+    """
+    Called before every ledger write with the data about to be written:
+    returns why it does not extend the history the sidecar pinned (last
+    checkpoint and last written block changed or gone), or None.
+    """
+    sidecar = load()
+    if sidecar.get("interval") != LEDGER_CHECKPOINT_INTERVAL:
+        return "LEDGER_CHECKPOINT_INTERVAL changed since the checkpoints were written (rebuild them)."
+    checkpoints = sidecar.get("checkpoints", [])
+    if checkpoints:
+        error = _check_checkpoint(data, checkpoints[-1])
+        if error:
+            return error
+    return _check_head(data, sidecar.get("head"))
+
+
+def update(data):
+    """
+    Called after every ledger write with the new ledger data: adds due
+    checkpoints (O(interval) each) and records the new head. A ledger that
+    fails check_history() leaves the sidecar untouched.
+    """
+    error = check_history(data)
+    if error:
+        print(f"LEDGER ALARM: {error} Checkpoints left unchanged.")
+        return None
+    checkpoints = list(load().get("checkpoints", []))
+    _extend(data, checkpoints)
+    _save({"interval": LEDGER_CHECKPOINT_INTERVAL, "checkpoints": checkpoints, "head": _make_head(data)})
+    return len(checkpoints)
+
+
+def rebuild(data):
+    """
+    Recreates every checkpoint from the ledger (e.g. after editing the interval
+    or key). Operator action only: this pins whatever history `data` holds.
+    """
+    checkpoints = []
+    _extend(data, checkpoints)
+    _save({"interval": LEDGER_CHECKPOINT_INTERVAL, "checkpoints": checkpoints,
+           "head": _make_head(data) if data else None})
+    return {"checkpoints": len(checkpoints), "interval": LEDGER_CHECKPOINT_INTERVAL}
+
+
+# ================================
+# VALIDATION
+# ================================
+def _check_links(data, start, end):
+    """
+    Checks every block in [start, end]: its block_hash against its content and
+    its prev_hash against the block before. Returns an error message or None.
+    """
+    for i in range(start, end + 1):
+        block = _block(data, i)
+        if block is None:
+            return f"Block {i} is missing."
+        block_hash = block.get("block_hash")
+        if i == 0:
+            if block_hash not in (None, GENESIS_HASH):
+                return "Genesis block hash is not the genesis constant."
+            continue
+        if block_hash is not None and block_hash != _content_hash(block):
+            return f"Block {i} does not match its block_hash."
+        prev = _block(data, i - 1)
+        if prev is None:
+            return f"Block {i - 1} is missing."
+        if block.get("prev_hash") != prev.get("block_hash", LEGACY_PREV_HASH):
+            return f"Block {i} does not link to block {i - 1}."
+    return None
+
+
+def _check_checkpoint(data, checkpoint):
+    if checkpoint.get("checkpoint_hash") != _seal(checkpoint):
+        return f"Checkpoint {checkpoint.get('index')} does not match its checkpoint_hash."
+    block = _block(data, checkpoint["index"])
+    if block is None or block.get("block_hash") != checkpoint["block_hash"]:
+        return f"Block {checkpoint['index']} no longer matches its checkpoint."
+    return None
+
+
+def _check_head(data, head):
+    """The last block written must still be in the ledger, unchanged."""
+    if not head:
+        return None  # sidecar written before heads were recorded
+    if head.get("head_hash") != _seal(head, "head_hash"):
+        return "Recorded ledger head does not match its head_hash."
+    block = _block(data, head["index"])
+    if block is None:
+        return f"Ledger ends before block {head['index']}, the last one written (blocks were removed)."
+    if block.get("block_hash") != head["block_hash"]:
+        return f"Block {head['index']} changed since it was written."
+    return None
+
+
+def validate_tip(data):
+    """
+    Validates the chain head against the last checkpoint: only the pinned
+    block and those after it (at most the interval) are walked.
+    """
+    tip = _tip_index(data)
+    if tip < 0:
+        return {"status": "error", "message": "Chain not found."}
+
+    sidecar = load()
+    error = _check_head(data, sidecar.get("head"))
+    if error:
+        return {"status": "invalid", "message": error, "tip_index": tip}
+
+    checkpoints = sidecar.get("checkpoints", [])
+    start = 0
+    anchor = None
+    if checkpoints and checkpoints[-1]["index"] <= tip:
+        anchor = checkpoints[-1]
+        error = _check_checkpoint(data, anchor)
+        if error:
+            return {"status": "invalid", "message": error, "checkpoint": anchor["index"]}
+        start = anchor["index"]  # re-check the pinned block's own content and link too
+
+    error = _check_links(data, start, tip)
+    result = {
+        "checked_blocks": tip - start + 1,
+        "from_checkpoint": anchor["index"] if anchor else None,
+        "tip_index": tip,
+        "tip_hash": _block(data, tip).get("block_hash") if _block(data, tip) else None
+    }
+    if error:
+        return dict(result, status="invalid", message=error)
+    return dict(result, status="valid", message="Cryptographic links verified.")
+
+
+def validate_full(data):
+    """Walks the whole chain and recomputes every checkpoint."""
+    tip = _tip_index(data)
+    if tip < 0:
+        return {"status": "error", "message": "Chain not found."}
+
+    error = _check_links(data, 0, tip)
+    if error:
+        return {"status": "invalid", "message": error, "checked_blocks": tip + 1}
+
+    sidecar = load()
+    error = _check_head(data, sidecar.get("head"))
+    if error:
+        return {"status": "invalid", "message": error, "checked_blocks": tip + 1}
+
+    expected = []
+    _extend(data, expected)
+    stored = sidecar.get("checkpoints", [])
+    if stored != expected[:len(stored)]:
+        return {"status": "invalid", "message": "Checkpoints do not match the ledger (rebuild them).",
+                "checked_blocks": tip + 1}
+    return {"status": "valid", "message": "Cryptographic links verified.", "checked_blocks": tip + 1,
+            "checkpoints": len(stored), "missing_checkpoints": len(expected) - len(stored), "tip_index": tip}
+
+
+# ================================
+# MEMBERSHIP PROOF
+# ================================
+def membership_proof(data, index):
+    """
+    Proof that block `index` is in the ledger, bounded by the checkpoint interval:
+    a Merkle path to its checkpoint's window_root, or (after the last
+    checkpoint) the prev_hash-linked blocks from the last checkpoint to the tip.
+    """
+    block = _block(data, index)
+    if block is None:
+        return None
+
+    checkpoints = load().get("checkpoints", [])
+    for i, checkpoint in enumerate(checkpoints):
+        if checkpoint["window_start"] <= index <= checkpoint["index"]:
+            leaves = [_leaf(_block(data, j)) for j in range(checkpoint["window_start"], checkpoint["index"] + 1)]
+            return {
+                "type": "checkpoint",
+                "block": block,
+                "leaf": _leaf(block),
+                "merkle_path": merkle_path(leaves, index - checkpoint["window_start"]),
+                "checkpoint": checkpoint,
+                "prev_cumulative_root": checkpoints[i - 1]["cumulative_root"] if i else ZERO_ROOT
+            }
+
+    start = checkpoints[-1]["index"] if checkpoints else 0
+    return {
+        "type": "segment",
+        "block": block,
+        "checkpoint": checkpoints[-1] if checkpoints else None,
+        "segment": [_block(data, j) for j in range(start, _tip_index(data) + 1)]
+    }
+
+
+def verify_membership(proof):
+    """Checks a "checkpoint" proof without the ledger: path -> window_root -> cumulative_root -> seal."""
+    checkpoint = proof["checkpoint"]
+    if proof["leaf"] != _leaf(proof["block"]):
+        return False
+    if root_from_path(proof["leaf"], proof["merkle_path"]) != checkpoint["window_root"]:
+        return False
+    cumulative = hashlib.sha256((proof["prev_cumulative_root"] + checkpoint["window_root"]).encode()).hexdigest()
+    return cumulative == checkpoint["cumulative_root"] and _seal(checkpoint) == checkpoint["checkpoint_hash"]
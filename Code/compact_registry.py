@@ -0,0 +1,96 @@
+import sys
+import os
+import json
+
+from core.registry import load_chain, save_chain
+from core.blockpack import write_pack, grid_positions
+from core.cache import locked
+from config import BLOCKCHAIN_PATH, BLOCK_SIZE
+
+# -------------------------------
+# One-off migration: moves inline "blocks" (image) and "frames" (video)
+# lists into registry/packs/ and replaces "positions" with the grid shape,
+# leaving blockchain.json with small headers only.
+# Usage: python compact_registry.py [--dry-run]
+# -------------------------------
+
+
+def compact_entry(entry, store=write_pack):
+    """Returns a compacted copy of an image/video record, or None if nothing to do."""
+    if entry.get("media_type") == "video":
+        return compact_video_entry(entry, store)
+    if entry.get("media_type") != "image" or "blocks" not in entry:
+        return None
+
+    blocks = entry["blocks"]
+    positions = [tuple(p) for p in entry.get("positions", [])]
+
+    compacted = {k: v for k, v in entry.items() if k not in ("blocks", "positions")}
+    compacted["blocks_pack"] = store(blocks)
+    compacted["block_count"] = len(blocks)
+    compacted["block_size"] = BLOCK_SIZE
+
+    if positions:
+        rows = len({y for y, _ in positions})
+        cols = len({x for _, x in positions})
+        # Only drop positions if the grid reproduces them exactly
+        if grid_positions(rows, cols, BLOCK_SIZE) == positions:
+            compacted["grid"] = [rows, cols]
+        else:
+            compacted["positions"] = entry["positions"]
+
+    return compacted
+
+
+def compact_video_entry(entry, store=write_pack):
+    if "frames" not in entry:
+        return None
+
+    frames = entry["frames"]
+    compacted = {k: v for k, v in entry.items() if k not in ("frames", "frame_indexes")}
+    compacted["frames_pack"] = store(frames)
+    compacted["frame_count"] = len(frames)
+
+    # Keep explicit indexes only if they are not the implicit 0..n-1
+    if entry.get("frame_indexes", list(range(len(frames)))) != list(range(len(frames))):
+        compacted["frame_indexes"] = entry["frame_indexes"]
+
+    return compacted
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    dry_run = "--dry-run" in argv
+
+    before = os.path.getsize(BLOCKCHAIN_PATH) if os.path.exists(BLOCKCHAIN_PATH) else 0
+    changed = 0
+
+    # Dry run: same transformation, no pack files written
+    store = (lambda hashes: "0" * 64) if dry_run else write_pack
+
+    # A running server may register while this rewrites the registry
+    with locked(BLOCKCHAIN_PATH):
+        chain = dict(load_chain())
+        for ref_id, entry in chain.items():
+            compacted = compact_entry(entry, store)
+            if compacted:
+                chain[ref_id] = compacted
+                changed += 1
+
+        if not changed:
+            print("Registry already compact.")
+            return 0
+
+        if dry_run:
+            after = len(json.dumps(chain, indent=2))
+            print(f"Would compact {changed} records: {before} -> ~{after} bytes")
+            return 0
+
+        save_chain(chain)
+    after = os.path.getsize(BLOCKCHAIN_PATH)
+    print(f"Compacted {changed} records: {before} -> {after} bytes ({before / max(after, 1):.1f}x smaller)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
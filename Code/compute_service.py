@@ -0,0 +1,182 @@
+import time
+import logging
+import cProfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.exceptions import TooManyRequests, GatewayTimeout
+
+import metrics
+import profiling
+from config import COMPUTE_WORKERS, COMPUTE_MAX_QUEUE, COMPUTE_TIMEOUT_SECONDS, COMPUTE_RETRY_AFTER_SECONDS
+
+# ==========================================
+# CPU WORK POOL
+# serve.py starts a pool of worker processes; run() then hands forensics
+# and registration hashing to them so request threads never hold the GIL
+# for long. Without a pool (python app.py, CLI tools) run() calls inline.
+# ==========================================
+_executor = None
+_workers = 0
+_max_queue = 0
+_lock = threading.Lock()
+_inflight = 0
+log = logging.getLogger(__name__)
+
+_stats = {
+    "submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "timeouts": 0,
+    "busy_seconds": 0.0, "restarts": 0
+}
+
+
+def _init_worker():
+    # Artifact URLs are served by the front process; see artifact_service.detach()
+    from services import artifact_service
+    artifact_service.detach()
+
+    # Pay the heavy imports once per worker, not on its first request
+    import services.image_verify_service  # noqa: F401
+    import services.image_register_service  # noqa: F401
+    import services.video_register_service  # noqa: F401
+    import core_video.extract_frames  # noqa: F401  (OpenCV; the services load it lazily)
+
+
+def _warm():
+    return True
+
+
+def _call_recorded(fn, args, kwargs, profile=False):
+    # Metrics recorded in the worker travel back with the result (see metrics.replay),
+    # and so do cProfile stats when the request is being profiled
+    profiler = cProfile.Profile() if profile else None
+    with metrics.recording() as events:
+        if profiler is not None:
+            profiler.enable()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+    if profiler is None:
+        return result, events, None
+    profiler.create_stats()
+    return result, events, profiler.stats
+
+
+def _new_executor():
+    # spawn: the front process already runs threads (janitor, audit, artifacts),
+    # and forking a threaded process can copy a held lock into the child
+    return ProcessPoolExecutor(
+        max_workers=_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker
+    )
+
+
+def start_pool(workers=COMPUTE_WORKERS, max_queue=COMPUTE_MAX_QUEUE):
+    """Starts the worker processes and waits until each has finished importing."""
+    global _executor, _workers, _max_queue
+    with _lock:
+        if _executor is not None:
+            return
+        _workers = max(1, workers)
+        _max_queue = max(0, max_queue)
+        _executor = _new_executor()
+
+    for future in [_executor.submit(_warm) for _ in range(_workers)]:
+        future.result()
+    log.info("Compute pool ready: %d workers, queue %d", _workers, _max_queue)
+
+
+def stop_pool():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _done(future, started):
+    global _inflight
+    with _lock:
+        _inflight -= 1
+        _stats["busy_seconds"] += time.time() - started
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            _stats["failed"] += 1
+        else:
+            _stats["completed"] += 1
+
+
+def run(fn, *args, timeout=COMPUTE_TIMEOUT_SECONDS, **kwargs):
+    """
+    Runs fn(*args, **kwargs) in a worker process and returns its result.
+    fn must be a module-level function and its arguments picklable.
+    Raises TooManyRequests when every worker is busy and the queue is full,
+    GatewayTimeout when no result arrives within `timeout` seconds.
+    """
+    global _inflight, _executor
+    with _lock:
+        executor = _executor
+        if executor is not None:
+            if _inflight >= _workers + _max_queue:
+                _stats["rejected"] += 1
+                metrics.inc("compute_rejected_total")
+                raise TooManyRequests(
+                    "Server is busy with forensic jobs. Please retry shortly.",
+                    retry_after=COMPUTE_RETRY_AFTER_SECONDS
+                )
+            _inflight += 1
+            _stats["submitted"] += 1
+
+    if executor is None:
+        return fn(*args, **kwargs)
+
+    started = time.time()
+    try:
+        future = executor.submit(_call_recorded, fn, args, kwargs, profiling.is_active())
+    except BrokenProcessPool:
+        with _lock:
+            _inflight -= 1
+        _restart(executor)
+        raise
+    # A job that is already running cannot be interrupted: it keeps its slot
+    # until it finishes, so timeouts do not let more work in than the pool holds
+    future.add_done_callback(lambda f: _done(f, started))
+
+    try:
+        result, events, profile_stats = future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        with _lock:
+            _stats["timeouts"] += 1
+        metrics.inc("compute_timeouts_total")
+        raise GatewayTimeout(f"Forensic job did not finish within {timeout} seconds.")
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); replace the pool for later requests
+        _restart(executor)
+        raise
+
+    metrics.replay(events)
+    profiling.add_compute_stats(profile_stats)
+    return result
+
+
+def _restart(broken):
+    global _executor
+    with _lock:
+        if _executor is not broken:
+            return
+        _executor = _new_executor()
+        _stats["restarts"] += 1
+    metrics.inc("compute_restarts_total")
+    log.warning("Compute pool restarted after a worker died.")
+
+
+def stats():
+    with _lock:
+        return dict(_stats, enabled=_executor is not None, workers=_workers,
+                    max_queue=_max_queue, inflight=_inflight)
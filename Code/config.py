@@ -1,8 +1,41 @@
 BLOCK_SIZE = 32
 
+# Pixel mode used for block hashing and reconstruction of new image records:
+# "L" (grayscale, legacy), "RGB" or "YCbCr". Channels are hashed interleaved,
+# so colour-only edits (hue shifts) change the digest. Records keep the mode
+# they were registered with.
+COLOR_MODE = "RGB"
+
 BLOCKCHAIN_PATH = "registry/blockchain.json"
 BLOCK_STORAGE = "storage/blocks/"
 
+# Compact registry records: block digests go to registry/packs/<id>.bin
+# (32 raw bytes each) and positions are derived from width/height.
+# Records written with inline "blocks"/"positions" lists stay readable.
+COMPACT_BLOCKS = True
+BLOCK_PACK_DIR = "registry/packs"
+PACK_CACHE_ENTRIES = 64  # LRU of unpacked digest lists (TAMPERED path only)
+
+# Multi-resolution tile digests for coarse-to-fine tamper search.
+# Descending sizes, each dividing the previous one; the finest level
+# bounds the precision of the reported tamper regions. A level finer than
+# BLOCK_SIZE (e.g. 8) is opt-in: it stores (BLOCK_SIZE / size)^2 times more
+# digests than the blocks and slows registration accordingly.
+HIERARCHICAL_HASHING = True
+HIERARCHY_TILE_SIZES = [256, 64, 32]
+
+# Band streaming: images are hashed and rendered STREAM_BAND_ROWS pixel rows
+# at a time (must be a multiple of BLOCK_SIZE and of every hierarchy size).
+# Verification switches to the band pipeline at STREAMING_MIN_PIXELS.
+STREAM_BAND_ROWS = 256
+STREAMING_MIN_PIXELS = 40_000_000
+MAX_IMAGE_PIXELS = 1_000_000_000  # hard cap; above PIL's default guard only in bulk_register.py / register.py
+
+# Forensic overlays (red boxes) of larger images are rendered on a preview
+# no longer than this on its long edge; JPEGs are decoded with draft().
+# None keeps full-resolution overlays. The clean reconstruction is never scaled.
+FORENSIC_PREVIEW_MAX_SIDE = 2048
+
 VIDEO_FRAMES_PATH = "storage/video_frames"
 import os
 
@@ -10,17 +43,169 @@ import os
 # CONFIGURATION
 # =========================
 
+# Administration
+# Accounts (by email) allowed to use the admin-only endpoints: forced
+# janitor sweeps, profiling settings, checkpoint rebuilds, the full audit log.
+ADMIN_EMAILS = []
+
 # Database Configuration
 DB_NAME = "users.db"
+DB_POOL_SIZE = 8              # pooled SQLite connections (WAL mode)
+DB_BUSY_TIMEOUT_MS = 5000
+DB_STATEMENT_CACHE = 64       # prepared statements kept per connection
+USER_CACHE_ENTRIES = 1024     # user rows cached by email
+USER_CACHE_TTL_SECONDS = 300
 
 # Storage Paths
 BLOCK_STORAGE = "storage/blocks"
 VIDEO_FRAMES_PATH = "storage/video_frames"
+VIDEO_FRAME_STEP = 5  # every n-th decoded frame is extracted (and hashed)
 
 # NEW: Directory for Reconstructed Outputs (Fixes your error)
 OUTPUTS_DIR = "outputs"
 
-# Ensure directories exist
-os.makedirs(BLOCK_STORAGE, exist_ok=True)
-os.makedirs(VIDEO_FRAMES_PATH, exist_ok=True)
-os.makedirs(OUTPUTS_DIR, exist_ok=True)
\ No newline at end of file
+# Supported Media
+IMAGE_EXTENSIONS = ["jpg", "jpeg", "png", "webp"]
+VIDEO_EXTENSIONS = ["mp4", "avi"]
+
+# Upload Ingestion
+# Multipart file parts are streamed into the staging dir (hashed on the fly)
+# and then renamed into uploads/<type>/<sha256><ext>.
+UPLOAD_STAGING_DIR = "uploads/.incoming"
+MAX_UPLOAD_BYTES = 512 * 1024 * 1024  # 512 MB
+
+# Retention (janitor.py)
+# Temp uploads and derived artifacts are evicted after their TTL, or
+# oldest-first once the managed dirs exceed the budget. Uploads whose
+# content is registered on the blockchain are never evicted.
+RECONSTRUCTED_DIR = "static/reconstructed"
+UPLOAD_DIRS = ["uploads/images", "uploads/videos"]
+ARTIFACT_STATE_DIR = "registry/artifact_jobs"  # job markers shared with compute workers (serve.py)
+ARTIFACT_DIRS = [RECONSTRUCTED_DIR, OUTPUTS_DIR, ARTIFACT_STATE_DIR]
+STAGING_TTL_SECONDS = 3600  # orphaned .part files from aborted uploads
+UPLOAD_TTL_SECONDS = 24 * 3600
+ARTIFACT_TTL_SECONDS = 6 * 3600
+STORAGE_BUDGET_BYTES = 5 * 1024 * 1024 * 1024  # 5 GB
+JANITOR_MIN_AGE_SECONDS = 900  # never evicted for the budget before this age (in-flight requests)
+JANITOR_INTERVAL_SECONDS = 600
+
+# Forensic Artifacts (services/artifact_service.py)
+# Verify responds once the tamper map is known; forensic overlays render on
+# a worker pool and clean reconstructions only when first requested.
+# GET /artifacts/<name> blocks up to ARTIFACT_WAIT_SECONDS, then answers 202.
+ASYNC_ARTIFACTS = True
+ARTIFACT_WORKERS = 2
+ARTIFACT_MAX_PENDING = 16  # beyond this, renders run inline (backpressure)
+ARTIFACT_JOB_ENTRIES = 512
+ARTIFACT_WAIT_SECONDS = 30
+ARTIFACT_STALE_SECONDS = 600  # a ".pending" marker this old belongs to a dead worker process
+# Lazy jobs handed from compute workers to the front process (JSON job specs).
+# Not a janitor dir: artifact_service expires them after ARTIFACT_TTL_SECONDS.
+ARTIFACT_DEFERRED_DIR = "registry/artifact_deferred"
+
+# Artifact encoding (core/encoding.py)
+# "png" or "webp" (lossless; images over 16383 px fall back to PNG).
+# Band-streamed artifacts are always PNG. Lower compress_level / method
+# spends less CPU for larger files; PIL's PNG default is 6.
+ARTIFACT_FORMAT = "png"
+PNG_COMPRESS_LEVEL = 1
+WEBP_METHOD = 0
+
+# Audit Log (audit.py)
+# Login / register / verify / reconstruct events are buffered in memory and
+# appended to registry/audit/audit.jsonl by a background flusher. The file
+# rotates at AUDIT_MAX_BYTES or at UTC midnight; older segments beyond
+# AUDIT_KEEP_FILES are deleted.
+AUDIT_DIR = "registry/audit"
+AUDIT_MAX_BYTES = 64 * 1024 * 1024
+AUDIT_ROTATE_DAILY = True
+AUDIT_KEEP_FILES = 30
+AUDIT_BUFFER_MAX = 10000  # a full buffer is flushed by the logging thread
+AUDIT_FLUSH_SECONDS = 1.0
+AUDIT_FLUSH_BATCH = 256
+AUDIT_PAGE_SIZE = 100
+LEGACY_LOGIN_LOG = "registry/user_logs.json"  # imported once, then no longer written
+
+# Read Cache (core/cache.py)
+# Parsed registry/ledger JSON stays in memory until the file changes.
+JSON_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Bulk Registration (bulk_register.py)
+BULK_REGISTER_WORKERS = os.cpu_count() or 2
+BULK_COMMIT_SIZE = 500  # registry + ledger rewritten once per this many items
+
+# Ledger Checkpoints (core/checkpoints.py)
+# Every LEDGER_CHECKPOINT_INTERVAL blocks a checkpoint pins the block hash and
+# a cumulative root; /chain/validate then walks only the blocks after the last
+# one. Set LEDGER_CHECKPOINT_KEY to HMAC-sign checkpoints instead of hashing.
+# After changing the interval or key an admin must rebuild the checkpoints
+# (POST /admin/ledger/checkpoints); ledger appends are refused until then.
+LEDGER_CHECKPOINT_PATH = "registry/ledger_checkpoints.json"
+LEDGER_CHECKPOINT_INTERVAL = 100
+LEDGER_CHECKPOINT_KEY = None
+
+# Near-Duplicate Search (core/similarity.py)
+# Records carry a 64-bit pHash (images) or keyframe pHashes (videos);
+# verify suggests registered media within SIMILARITY_MAX_DISTANCE bits.
+SIMILARITY_ENABLED = True
+SIMILARITY_MAX_DISTANCE = 10          # Hamming distance out of 64 bits
+SIMILARITY_MAX_RESULTS = 5
+SIMILARITY_KEYFRAMES = 16             # keyframe hashes per video at most
+SIMILARITY_KEYFRAME_MIN_DISTANCE = 4  # closer consecutive keyframes are dropped
+
+# Offline Verification Bundles (GET /bundle, bundle_verifier.py)
+# The ledger segment from the record's block towards the tip is capped;
+# a capped bundle is anchored at its last block instead of the tip.
+BUNDLE_MAX_CHAIN_BLOCKS = 1000
+
+# Chain Explorer (/chain pagination)
+CHAIN_PAGE_SIZE = 50
+CHAIN_MAX_PAGE_SIZE = 500
+
+# Batch Verification (/verify/batch, verify_batch.py)
+BATCH_VERIFY_WORKERS = min(8, (os.cpu_count() or 2) * 2)
+# Archives expand beyond the request size: caps on what one batch may unpack
+BATCH_MAX_ITEMS = 1000
+BATCH_MAX_BYTES = 4 * MAX_UPLOAD_BYTES
+
+# Metrics (GET /metrics, Prometheus text format)
+METRICS_ENABLED = True
+METRICS_PREFIX = "forensics_"
+METRICS_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+REQUEST_TIMINGS = False  # always add a per-stage "timings" breakdown to JSON responses
+                         # (otherwise per request: ?timings=1 or header X-Request-Timings: 1)
+
+# Request Profiling (profiling.py, /admin/profiles)
+# Logged-in requests to PROFILE_ENDPOINTS run under cProfile when an admin
+# sends "PROFILE_HEADER: 1", when an admin armed the next N requests, or for
+# PROFILE_SAMPLE_PERCENT of them. Profiles are kept as <id>.prof files.
+PROFILE_DIR = "registry/profiles"
+PROFILE_ENDPOINTS = ["register_media", "verify_media", "reconstruct_media"]
+PROFILE_HEADER = "X-Profile"
+PROFILE_SAMPLE_PERCENT = 0  # 0-100; changeable at runtime via POST /admin/profiles
+PROFILE_KEEP = 200          # newest profiles kept on disk
+PROFILE_TEXT_LINES = 40     # functions shown by GET /admin/profiles/<id>?format=text
+
+# Production Serving (serve.py)
+# Request threads only parse uploads and wait; image forensics and
+# registration hashing run in COMPUTE_WORKERS processes (no shared GIL).
+SERVE_HOST = "0.0.0.0"
+SERVE_PORT = 8000
+SERVE_THREADS = 32
+COMPUTE_WORKERS = os.cpu_count() or 2
+COMPUTE_MAX_QUEUE = 2 * COMPUTE_WORKERS  # jobs waiting beyond busy workers; more -> 429
+COMPUTE_TIMEOUT_SECONDS = 120            # request gives up waiting -> 504
+COMPUTE_RETRY_AFTER_SECONDS = 2
+
+# Benchmarks (benchmark.py)
+# Default matrix; every run uses a scratch registry padded to each size.
+BENCH_RESOLUTIONS = ["640x480", "1920x1080", "4000x3000"]
+BENCH_TAMPER_RATIOS = [0, 0.01, 0.1, 0.5]  # fraction of the image area altered
+BENCH_VIDEO_LENGTHS = [30, 150]            # frames (320x240, 30 fps)
+BENCH_REGISTRY_SIZES = [10, 1000, 10000, 100000]
+BENCH_REPEAT = 5
+BENCH_BASELINE_PATH = "benchmarks/baseline.json"
+BENCH_REGRESSION_TOLERANCE = 0.25  # p50 / peak RSS this much above the baseline is flagged
+
+# Directories are created by the code that writes to them (app startup,
+# the register services, reconstruction), not when this module is imported.
\ No newline at end of file
@@ -0,0 +1,178 @@
+import hmac
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from core.cache import LRUCache
+from config import DB_NAME, DB_POOL_SIZE, DB_BUSY_TIMEOUT_MS, DB_STATEMENT_CACHE, USER_CACHE_ENTRIES, USER_CACHE_TTL_SECONDS
+
+# =========================
+# STATEMENTS
+# Fixed SQL text: sqlite3 compiles each once per connection and reuses the
+# prepared statement from its statement cache on every later call.
+# =========================
+SQL_CREATE_USERS = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        email TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        created_at TEXT
+    )
+"""
+# email is UNIQUE, which already gives it an index; drop the duplicate
+# that earlier versions created
+SQL_DROP_INDEX_EMAIL = "DROP INDEX IF EXISTS idx_users_email"
+SQL_INDEX_USERNAME = "CREATE INDEX IF NOT EXISTS idx_users_username ON users (username)"
+
+SQL_SELECT_BY_EMAIL = "SELECT id, username, email, password FROM users WHERE email = ?"
+SQL_INSERT_USER = "INSERT INTO users (username, email, password, created_at) VALUES (?, ?, ?, ?)"
+SQL_UPDATE_PASSWORD = "UPDATE users SET password = ? WHERE id = ?"
+
+# =========================
+# CONNECTION POOL
+# Connections are opened lazily and handed to one thread at a time, so they
+# are reused across requests even when the server spawns a thread per request.
+# =========================
+_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_opened = 0
+_pool_lock = threading.Lock()
+
+
+def _connect():
+    conn = sqlite3.connect(
+        DB_NAME,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,  # never shared concurrently; see _pool
+        cached_statements=DB_STATEMENT_CACHE,
+        isolation_level=None      # explicit BEGIN where a transaction is needed
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")     # readers don't block the writer
+    conn.execute("PRAGMA synchronous=NORMAL")   # safe with WAL, far fewer fsyncs
+    conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}")
+    return conn
+
+
+@contextmanager
+def get_connection():
+    """Borrows a pooled connection for the duration of the block."""
+    global _opened
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        with _pool_lock:
+            can_open = _opened < DB_POOL_SIZE
+            if can_open:
+                _opened += 1
+        if can_open:
+            try:
+                conn = _connect()
+            except Exception:
+                with _pool_lock:
+                    _opened -= 1  # the slot was never filled
+                raise
+        else:
+            try:
+                conn = _pool.get(timeout=DB_BUSY_TIMEOUT_MS / 1000)
+            except queue.Empty:
+                raise sqlite3.OperationalError("No database connection available (pool exhausted).")
+
+    try:
+        yield conn
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        _pool.put(conn)
+
+
+# =========================
+# USER CACHE
+# email -> (loaded_at, row). Rows only change through this module, which
+# invalidates them; the TTL covers edits made by other processes.
+# =========================
+_user_cache = LRUCache(USER_CACHE_ENTRIES)
+
+
+def _load_user_row(email):
+    cached = _user_cache.get(email)
+    if cached and time.time() - cached[0] < USER_CACHE_TTL_SECONDS:
+        return cached[1]
+
+    with get_connection() as conn:
+        row = conn.execute(SQL_SELECT_BY_EMAIL, (email,)).fetchone()
+    row = dict(row) if row else None
+    if row:
+        _user_cache.put(email, (time.time(), row))
+    return row
+
+
+def user_cache_stats():
+    return _user_cache.stats()
+
+
+# =========================
+# SCHEMA
+# =========================
+def init_db():
+    with get_connection() as conn:
+        conn.execute(SQL_CREATE_USERS)
+        conn.execute(SQL_DROP_INDEX_EMAIL)
+        conn.execute(SQL_INDEX_USERNAME)
+
+
+# =========================
+# USERS
+# =========================
+def _password_matches(stored, password):
+    # Rows created before hashing was introduced hold the plain password
+    if stored.startswith(("pbkdf2:", "scrypt:")):
+        return check_password_hash(stored, password), False
+    return hmac.compare_digest(stored.encode(), password.encode()), True
+
+
+def create_user(username, email, password):
+    """Returns False when the email address is already registered."""
+    password_hash = generate_password_hash(password)  # before borrowing a connection
+
+    with get_connection() as conn:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute(SQL_SELECT_BY_EMAIL, (email,)).fetchone():
+                conn.rollback()
+                return False
+            conn.execute(SQL_INSERT_USER, (username, email, password_hash, datetime.utcnow().isoformat()))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return False
+
+    _user_cache.invalidate(email)
+    return True
+
+
+def get_user(email, username, password):
+    """Returns {"id", "username", "email"} when all three credentials match, else None."""
+    row = _load_user_row(email)
+    if not row or row["username"] != username:
+        return None
+
+    # The password hash check is deliberately slow: do it without holding a connection
+    ok, needs_upgrade = _password_matches(row["password"], password)
+    if not ok:
+        return None
+
+    if needs_upgrade:
+        new_hash = generate_password_hash(password)
+        with get_connection() as conn:
+            conn.execute(SQL_UPDATE_PASSWORD, (new_hash, row["id"]))
+        _user_cache.invalidate(email)
+
+    return {"id": row["id"], "username": row["username"], "email": row["email"]}
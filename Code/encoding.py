@@ -0,0 +1,43 @@
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from config import ARTIFACT_FORMAT, PNG_COMPRESS_LEVEL, WEBP_METHOD
+
+WEBP_MAX_SIDE = 16383  # hard limit of the WebP format
+
+# =========================
+# ARTIFACT ENCODING
+# One place decides how forensic / clean images are written, so CPU time
+# can be traded against bytes on the wire from config.
+# =========================
+def artifact_format(width, height):
+    """File extension for an artifact of this size ("png" or "webp")."""
+    if ARTIFACT_FORMAT == "webp" and max(width, height) <= WEBP_MAX_SIDE:
+        return "webp"
+    return "png"
+
+
+def save_image(img, path):
+    """
+    Encodes a PIL image or uint8 array to `path`; the format follows the
+    extension. Returns {"format", "encode_seconds", "bytes"}.
+    """
+    if isinstance(img, np.ndarray):
+        img = Image.fromarray(img if img.dtype == np.uint8 else img.astype(np.uint8))
+
+    fmt = os.path.splitext(path)[1].lower().lstrip(".")
+    started = time.perf_counter()
+
+    if fmt == "webp":
+        img.save(path, "WEBP", lossless=True, method=WEBP_METHOD)
+    else:
+        img.save(path, "PNG", compress_level=PNG_COMPRESS_LEVEL)
+
+    return {
+        "format": fmt,
+        "encode_seconds": round(time.perf_counter() - started, 4),
+        "bytes": os.path.getsize(path)
+    }
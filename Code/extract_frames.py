@@ -1,7 +1,9 @@
 import cv2
 import os
 
-def extract_frames(video_path, output_dir, every_n_frames=5):
+from config import VIDEO_FRAME_STEP
+
+def extract_frames(video_path, output_dir, every_n_frames=VIDEO_FRAME_STEP):
     os.makedirs(output_dir, exist_ok=True)
 
     cap = cv2.VideoCapture(video_path)
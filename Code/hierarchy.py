@@ -0,0 +1,88 @@
+import hashlib
+
+from core.blockpack import write_pack, grid_shape
+
+# =========================
+# MULTI-RESOLUTION TILE HASHES
+# Each level hashes the image in square tiles of one size (e.g. 256, 64,
+# 32, 8). Sizes must be descending and each must divide the previous one,
+# so every child tile lies inside exactly one parent tile.
+# =========================
+def validate_sizes(sizes):
+    for parent, child in zip(sizes, sizes[1:]):
+        if child >= parent or parent % child:
+            raise ValueError(f"Tile sizes must be descending divisors: {sizes}")
+
+
+def _tile_hash(img, size, r, c):
+    tile = img[r * size:(r + 1) * size, c * size:(c + 1) * size]
+    return hashlib.sha256(tile.tobytes()).hexdigest()
+
+
+def pack_levels(sizes, levels):
+    """
+    levels: row-major digest lists, one per size (built band by band with
+    core.hashing.hash_tiles). Stores each as a pack and returns the small
+    record kept on the header.
+    """
+    validate_sizes(sizes)
+    return {
+        "sizes": list(sizes),
+        "packs": [write_pack(level) for level in levels]
+    }
+
+
+# =========================
+# COARSE-TO-FINE SEARCH
+# =========================
+def locate_tampering(img, sizes, stored_levels):
+    """
+    img: incoming image (same dimensions as the registered one).
+    stored_levels: list of digest lists, one per size.
+    Hashes the whole coarsest level, then only the children of mismatched
+    tiles. Returns (mismatched (r, c) tiles at the finest level, tiles hashed).
+    """
+    height, width = img.shape[:2]
+    hashed = 0
+    frontier = None  # None = every tile of the current level
+
+    for level, size in enumerate(sizes):
+        rows, cols = grid_shape(height, width, size)
+        stored = stored_levels[level]
+
+        if frontier is None:
+            candidates = [(r, c) for r in range(rows) for c in range(cols)]
+        else:
+            ratio = sizes[level - 1] // size
+            candidates = [
+                (cr, cc)
+                for pr, pc in frontier
+                for cr in range(pr * ratio, min((pr + 1) * ratio, rows))
+                for cc in range(pc * ratio, min((pc + 1) * ratio, cols))
+            ]
+
+        mismatched = []
+        for r, c in candidates:
+            hashed += 1
+            idx = r * cols + c
+            if idx >= len(stored) or _tile_hash(img, size, r, c) != stored[idx]:
+                mismatched.append((r, c))
+
+        if not mismatched:
+            return [], hashed
+        frontier = mismatched
+
+    return frontier, hashed
+
+
+def tiles_to_blocks(tiles, tile_size, height, width, block_size):
+    """Maps fine tiles onto indices of the BLOCK_SIZE grid used for recovery."""
+    _, cols = grid_shape(height, width, block_size)
+    indices = set()
+    for r, c in tiles:
+        y0, x0 = r * tile_size, c * tile_size
+        y1, x1 = min(y0 + tile_size, height), min(x0 + tile_size, width)
+        for br in range(y0 // block_size, (y1 - 1) // block_size + 1):
+            for bc in range(x0 // block_size, (x1 - 1) // block_size + 1):
+                indices.add(br * cols + bc)
+    return sorted(indices)
@@ -1,14 +1,18 @@
 import os
+import time
 import pickle
-import json
-import hashlib
 from datetime import datetime
 
-from core.preprocess import load_grayscale, slice_blocks
-from core.hashing import sha256_bytes, hash_block
+from core.hashing import sha256_file, hash_tiles
 from core.merkle import merkle_root
-from core.registry import register_reference, get_reference
-from config import BLOCK_STORAGE
+from core.registry import add_references, get_reference, find_by_sha
+from core.ledger import append_to_ledger, LedgerIntegrityError
+from core.blockpack import write_pack, grid_shape
+from core import similarity
+from core.hierarchy import pack_levels
+from config import BLOCK_STORAGE, BLOCK_SIZE, COMPACT_BLOCKS, HIERARCHICAL_HASHING, HIERARCHY_TILE_SIZES, COLOR_MODE
+from config import STREAM_BAND_ROWS, SIMILARITY_ENABLED
+import metrics
 
 # Ensure storage exists
 os.makedirs(BLOCK_STORAGE, exist_ok=True)
@@ -17,73 +21,105 @@ os.makedirs(BLOCK_STORAGE, exist_ok=True)
 # LEDGER LOGGING (With Blockchain Links)
 # ================================
 def log_to_ledger(ref_id, sha, owner, filename):
-    path = "registry/ledger.json"
-    data = {}
-    
-    # 1. Load Existing Chain
-    if os.path.exists(path):
-        with open(path, "r") as f:
-            try:
-                data = json.load(f)
-            except:
-                data = {}
-
-    # 2. Initialize Genesis Block if empty
-    if not data:
-        genesis_block = {
-            "index": 0,
-            "timestamp": str(datetime.utcnow()),
-            "filename": "GENESIS",
-            "media_type": "none",
-            "owner": "system",
-            "fingerprint": "0" * 64,
-            "prev_hash": "0" * 64,
-            "block_hash": hashlib.sha256(b"GENESIS_BLOCK").hexdigest()
-        }
-        data["0"] = genesis_block
-
-    # 3. Get Previous Block Info
-    # We find the highest index to link to
-    indices = [int(k) for k in data.keys()]
-    last_index = max(indices) if indices else 0
-    prev_block = data[str(last_index)]
-    
-    # Handle case where old ledger data might miss 'block_hash'
-    prev_hash = prev_block.get("block_hash", "00000000000000000000000000000000_LEGACY")
-    
-    new_index = last_index + 1
-
-    # 4. Create New Block Data
-    block_content = {
-        "index": new_index,
-        "reference_id": ref_id,
-        "media_type": "image",
-        "filename": filename,
-        "owner": owner,
-        "fingerprint": sha,
-        "timestamp": datetime.utcnow().isoformat(),
-        "prev_hash": prev_hash
-    }
+    return append_to_ledger(ref_id, sha, owner, filename, "image")
+
+
+# ================================
+# BLOCK PROCESSING (No Registry Access)
+# Shared with bulk_register.py worker processes.
+# ================================
+def build_image_record(image_path):
+    # NumPy / PIL load on the first registration, not at import
+    from core.preprocess import slice_blocks
+    from core.streaming import open_image, iter_bands
+
+    with metrics.span("register.image.decode"):
+        img = open_image(image_path, COLOR_MODE)  # header only; pixels arrive band by band
+    width, height = img.size
+    sizes = HIERARCHY_TILE_SIZES if (COMPACT_BLOCKS and HIERARCHICAL_HASHING) else []
 
-    # 5. Calculate Block Hash (The "Crypto" part)
-    block_string = json.dumps(block_content, sort_keys=True).encode()
-    current_block_hash = hashlib.sha256(block_string).hexdigest()
-    
-    block_content["block_hash"] = current_block_hash
+    if any(STREAM_BAND_ROWS % size for size in [BLOCK_SIZE] + sizes):
+        raise ValueError("STREAM_BAND_ROWS must be a multiple of BLOCK_SIZE and every hierarchy tile size.")
 
-    # 6. Save
-    data[str(new_index)] = block_content
+    block_hashes = []
+    positions = []
+    levels = [[] for _ in sizes]
+    hash_seconds = store_seconds = hierarchy_seconds = phash_seconds = 0.0
+
+    # Perceptual hash for near-duplicate search (core/similarity.py)
+    phash = similarity.BandPHash(width, height, COLOR_MODE) if SIMILARITY_ENABLED else None
+
+    # Band by band: peak memory is one STREAM_BAND_ROWS strip regardless of image size.
+    # Bands are whole tile rows, so concatenated digests stay row-major.
+    # Stages are interleaved per band, so they are timed by hand.
+    for band_y, band in iter_bands(img):
+        t0 = time.perf_counter()
+        band_hashes = hash_tiles(band, BLOCK_SIZE)
+        t1 = time.perf_counter()
+
+        # Colour modes store HxWx3 blocks
+        for ((y, x), block), h in zip(slice_blocks(band), band_hashes):
+            positions.append((band_y + y, x))
+
+            with open(os.path.join(BLOCK_STORAGE, h), "wb") as f:
+                pickle.dump(block, f)
+        t2 = time.perf_counter()
+
+        block_hashes.extend(band_hashes)
+        for level, size in zip(levels, sizes):
+            level.extend(hash_tiles(band, size))
+
+        t3 = time.perf_counter()
+        if phash:
+            phash.update(band_y, band)
+
+        hash_seconds += t1 - t0
+        store_seconds += t2 - t1
+        hierarchy_seconds += t3 - t2
+        phash_seconds += time.perf_counter() - t3
+
+    metrics.record_stage("register.image.hash", hash_seconds)
+    metrics.record_stage("register.image.store_blocks", store_seconds)
+    if sizes:
+        metrics.record_stage("register.image.hierarchy", hierarchy_seconds)
+
+    with metrics.span("register.image.merkle"):
+        root = merkle_root(block_hashes)
+
+    extra = {}
+    if phash:
+        extra["phash"] = phash.hexdigest()
+        metrics.record_stage("register.image.phash", phash_seconds)
+
+    if not COMPACT_BLOCKS:
+        return {"merkle_root": root, "blocks": block_hashes, "positions": positions, "color_mode": COLOR_MODE, **extra}
+
+    # Compact layout: packed digests in a side file, positions derived from the grid
+    with metrics.span("register.image.pack"):
+        pack_id = write_pack(block_hashes)
+    record = {
+        "merkle_root": root,
+        "blocks_pack": pack_id,
+        "block_count": len(block_hashes),
+        "width": width,
+        "height": height,
+        "block_size": BLOCK_SIZE,
+        "grid": grid_shape(height, width, BLOCK_SIZE),
+        "color_mode": COLOR_MODE,
+        **extra
+    }
 
-    with open(path, "w") as f:
-        json.dump(data, f, indent=2)
+    # Tile pyramid for coarse-to-fine localization at verify time
+    if sizes:
+        record["hierarchy"] = pack_levels(sizes, levels)
 
-    return new_index
+    return record
 
 
 # ================================
 # REGISTER IMAGE FUNCTION
 # ================================
-def register_image(ref_id, image_path, owner):
+def register_image(ref_id, image_path, owner, sha=None, original_filename=None):
     ref_id = ref_id.strip()
 
     # 1. Validation
@@ -93,55 +129,49 @@ def register_image(ref_id, image_path, owner):
     if get_reference(ref_id):
         return {"status": "error", "message": "Reference ID already exists."}
 
-    # 2. Compute SHA
-    with open(image_path, "rb") as f:
-        sha = sha256_bytes(f.read())
+    # 2. Compute SHA (skipped when the upload layer already hashed the stream)
+    if not sha:
+        with metrics.span("register.image.sha"):
+            sha = sha256_file(image_path)
 
     # 3. Duplicate Check
-    chain_path = "registry/blockchain.json"
-    if os.path.exists(chain_path):
-        with open(chain_path, "r") as f:
-            try:
-                chain = json.load(f)
-                for entry in chain.values():
-                    if entry.get("sha") == sha:
-                        return {"status": "duplicate", "message": "Media already on blockchain."}
-            except:
-                pass
-
-    # 4. Processing
-    img = load_grayscale(image_path)
-    blocks = slice_blocks(img)
-
-    block_hashes = []
-    positions = []
-
-    for pos, block in blocks:
-        h = hash_block(block)
-        block_hashes.append(h)
-        positions.append(pos)
-
-        with open(os.path.join(BLOCK_STORAGE, h), "wb") as f:
-            pickle.dump(block, f)
-
-    # 5. Merkle Root
-    merkle_root_hash = merkle_root(block_hashes)
-    filename = os.path.basename(image_path)
-
-    # 6. Save to Registry
-    register_reference(ref_id, {
-        "media_type": "image",
-        "filename": filename,
-        "owner": owner,
-        "sha": sha,
-        "merkle_root": merkle_root_hash,
-        "blocks": block_hashes,
-        "positions": positions,
-        "timestamp": datetime.utcnow().isoformat()
-    })
-
-    # 7. Log to Ledger (Calls the updated function above)
-    block_index = log_to_ledger(ref_id, sha, owner, filename)
+    with metrics.span("register.image.lookup"):
+        duplicate = find_by_sha(sha)[1]
+    if duplicate:
+        return {"status": "duplicate", "message": "Media already on blockchain."}
+
+    # 4. Processing (blocks, positions, Merkle root)
+    record = build_image_record(image_path)
+    filename = original_filename or os.path.basename(image_path)
+
+    # Re-encoded / resized copies of registered media are not SHA duplicates
+    with metrics.span("register.similar"):
+        similar = similarity.find_similar(similarity.record_hashes(record))
+
+    # 5. Log to Ledger, then save to Registry (both under the registry lock):
+    #    a refused ledger write leaves no registry entry without a ledger block
+    def append_ledger(_fresh):
+        with metrics.span("register.ledger_append"):
+            return log_to_ledger(ref_id, sha, owner, filename)
+
+    with metrics.span("register.registry_write"):
+        try:
+            fresh, _, block_index = add_references({ref_id: {
+                "media_type": "image",
+                "filename": filename,
+                "owner": owner,
+                "sha": sha,
+                **record,
+                "timestamp": datetime.utcnow().isoformat()
+            }}, before_write=append_ledger)
+        except LedgerIntegrityError as e:
+            return {"status": "error", "message": f"Ledger integrity check failed, nothing was registered: {e}"}
+
+    # Registered by a concurrent request since the checks above
+    if not fresh:
+        if get_reference(ref_id):
+            return {"status": "error", "message": "Reference ID already exists."}
+        return {"status": "duplicate", "message": "Media already on blockchain."}
 
     return {
         "status": "registered",
@@ -149,5 +179,6 @@ def register_image(ref_id, image_path, owner):
         "media_type": "image",
         "sha": sha,
         "block_index": block_index,
-        "filename": filename
+        "filename": filename,
+        "similar": similar
     }
\ No newline at end of file
@@ -1,74 +1,322 @@
 import os
-import json
 import uuid
+import logging
 import traceback
-import numpy as np
+from functools import partial
 from PIL import Image
 
 # Core Imports
-from core.hashing import sha256_bytes, hash_block
-from core.preprocess import load_grayscale, slice_blocks
+from core.hashing import sha256_file, hash_tiles
+from core.preprocess import decode_shared, load_preview
+from core.blockpack import grid_shape, grid_positions
 from core.verify import compare_blocks
-from core.recovery import recover_image
-from core.registry import get_reference 
-from config import BLOCK_STORAGE 
+from core.recovery import render_forensic, render_clean, recover_image_streamed
+from core.encoding import artifact_format, save_image
+import metrics
+from services import artifact_service
+from core.streaming import open_image, iter_bands
+from core.registry import find_reference, find_by_sha, get_reference, get_block_hashes, get_block_positions, get_hierarchy_levels
+from core.hierarchy import locate_tampering, tiles_to_blocks
+from core import similarity
+from config import BLOCK_SIZE, STREAMING_MIN_PIXELS, FORENSIC_PREVIEW_MAX_SIDE, SIMILARITY_ENABLED
+
+log = logging.getLogger(__name__)
 
 # Output directory
 RECOVERY_OUTPUT_DIR = "static/reconstructed"
 os.makedirs(RECOVERY_OUTPUT_DIR, exist_ok=True)
 
-def verify_image(ref_id, file_path, original_filename=None):
-    print(f"--- VERIFYING IMAGE: {ref_id} ---")
-
-    # 1. Compute Hash of the incoming file
-    try:
-        with open(file_path, "rb") as f:
-            incoming_sha = sha256_bytes(f.read())
-    except Exception as e:
-        return {"status": "ERROR", "message": f"File read error: {e}"}
-
-    # 2. Find the authentic record
+# ==========================================
+# RECORD LOOKUP (hash-only, no pixels needed)
+# ==========================================
+def find_image_record(ref_id, incoming_sha):
     matched_entry = None
-    
+
     # Strategy A: Search by Reference ID
     if ref_id:
-        matched_entry = get_reference(ref_id)
-        if not matched_entry:
-            chain_path = "registry/blockchain.json"
-            if os.path.exists(chain_path):
-                with open(chain_path, "r") as f:
-                    chain = json.load(f)
-                    for key, block in chain.items():
-                        if key.lower() == str(ref_id).lower():
-                            matched_entry = block
-                            matched_entry["reference_id"] = key
-                            break
+        key, entry = find_reference(ref_id)
+        if entry:
+            matched_entry = dict(entry, reference_id=key)
 
     # Strategy B: Search by SHA
     if not matched_entry:
-        chain_path = "registry/blockchain.json"
-        if os.path.exists(chain_path):
-            with open(chain_path, "r") as f:
-                chain = json.load(f)
-                for key, block in chain.values():
-                    stored_hash = block.get("sha") or block.get("fingerprint")
-                    if stored_hash == incoming_sha:
-                        matched_entry = block
-                        matched_entry["reference_id"] = key
-                        break
+        key, entry = find_by_sha(incoming_sha)
+        if entry:
+            matched_entry = dict(entry, reference_id=key)
+
+    return matched_entry
+
+
+def _unregistered_result(ref_id, incoming_sha, original_filename):
+    return {
+        "status": "UNREGISTERED",
+        "message": f"No record found for ID '{ref_id}' or this file hash.",
+        "details": {
+            "incoming_sha": incoming_sha,
+            "incoming_filename": original_filename
+        }
+    }
+
+
+def _similar_images(file_path):
+    """Likely originals of an unregistered upload (near-duplicate search)."""
+    if not SIMILARITY_ENABLED:
+        return []
+    try:
+        with metrics.span("verify.image.similar"):
+            return similarity.find_similar([similarity.image_phash(file_path)])
+    except Exception:
+        metrics.inc("similarity_failures_total")
+        log.exception("Similarity search failed")
+        return []
+
+
+def _authentic_result(incoming_sha, target_ref_id, matched_entry):
+    return {
+        "status": "AUTHENTIC",
+        "message": "Integrity is intact. Image is authentic.",
+        "details": {
+            "sha": incoming_sha,
+            "matched_id": target_ref_id,
+            "matched_filename": matched_entry.get("filename"),
+            "tamper_score": 0
+        }
+    }
+
+
+def _tamper_map(width, height, tampered_indices, tamper_regions=None):
+    """Compact JSON form of the result, enough for client-side overlay drawing."""
+    return {
+        "width": width,
+        "height": height,
+        "block_size": BLOCK_SIZE,
+        "grid": list(grid_shape(height, width, BLOCK_SIZE)),
+        "blocks": list(tampered_indices),
+        "regions": tamper_regions
+    }
+
+
+def _tampered_result(matched_entry, target_ref_id, incoming_sha, stored_sha, percent,
+                     forensic_url, clean_url, tamper_map, tamper_regions=None, tiles_hashed=None,
+                     forensic_full_url=None):
+    return {
+        "status": "TAMPERED",
+        "message": "Visual manipulation detected.",
+        "details": {
+            "matched_id": target_ref_id,
+            "matched_filename": matched_entry.get("filename"),
+            "sha": incoming_sha,
+            "expected_sha": stored_sha,
+            "tamper_score": round(percent, 2),
+
+            # --- RECOMMENDATION FLAGS ---
+            "can_reconstruct": True, # Always true for images if we got this far
+            # Artifact URLs resolve once rendered (see /artifacts/<name>)
+            "reconstructed_url": forensic_url, # Default view
+            "clean_url": clean_url,            # Alternative view, rendered on first request
+            "forensic_full_url": forensic_full_url,  # Full-resolution overlay when the default is a preview
+            "tamper_map": tamper_map,
+
+            # Fine-grained localization (hierarchical records only)
+            "tamper_regions": tamper_regions,
+            "tiles_hashed": tiles_hashed
+        }
+    }
+
+
+def _artifact_names(forensic_ext, clean_ext, full_ext=None):
+    unique_id = uuid.uuid4().hex[:8]
+    return (
+        f"forensic_{unique_id}.{forensic_ext}",
+        f"clean_{unique_id}.{clean_ext}",
+        f"forensic_full_{unique_id}.{full_ext}" if full_ext else None
+    )
+
+
+def _streamed_stats(path, encode_seconds):
+    # PNG bands are encoded while rendering; the writers time their share
+    fmt = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"format": fmt, "encode_seconds": encode_seconds, "bytes": os.path.getsize(path)}
+
+
+def _needs_preview(width, height):
+    return bool(FORENSIC_PREVIEW_MAX_SIDE) and max(width, height) > FORENSIC_PREVIEW_MAX_SIDE
+
+
+# ==========================================
+# LAZY ARTIFACT RENDERERS
+# Module-level and bound with functools.partial to JSON-serializable
+# arguments (paths, ref_id, tamper indices), so a job that nobody has asked
+# for yet can be handed to another process; see artifact_service.
+# Each re-decodes the upload and re-reads the record's digests, so nothing
+# heavy is held while waiting.
+# ==========================================
+def _upload_positions(upload, record, ref_id):
+    """The block positions verify_image compared against (see its steps 3a/3b)."""
+    width, height = upload.size
+    if get_hierarchy_levels(record) and (width, height) == (record.get("width"), record.get("height")):
+        return get_block_positions(record, ref_id)
+    return grid_positions(*grid_shape(height, width, BLOCK_SIZE), BLOCK_SIZE)
+
+
+def _stored_blocks(ref_id):
+    return get_block_hashes(get_reference(ref_id) or {}, ref_id)
+
+
+@artifact_service.deferrable
+def _render_clean_image(file_path, color_mode, ref_id, tampered_indices, path):
+    record = get_reference(ref_id) or {}
+    with Image.open(file_path) as upload:
+        positions = _upload_positions(upload, record, ref_id)
+        _, pixels = decode_shared(upload, color_mode)
+    stored_blocks = get_block_hashes(record, ref_id)
+    return save_image(render_clean(pixels, tampered_indices, positions, stored_blocks, color_mode), path)
+
+
+@artifact_service.deferrable
+def _render_full_image(file_path, ref_id, tampered_indices, tamper_regions, path):
+    record = get_reference(ref_id) or {}
+    with Image.open(file_path) as upload:
+        positions = _upload_positions(upload, record, ref_id)
+        rgb, _ = decode_shared(upload, "RGB")
+    return save_image(render_forensic(rgb, tampered_indices, positions, tamper_regions), path)
+
+
+@artifact_service.deferrable
+def _render_clean_streamed(file_path, color_mode, ref_id, tampered_indices, path):
+    encode_seconds = recover_image_streamed(open_image(file_path, color_mode), tampered_indices,
+                                            _stored_blocks(ref_id), None, path, color_mode=color_mode)
+    return _streamed_stats(path, encode_seconds)
+
+
+@artifact_service.deferrable
+def _render_full_streamed(file_path, color_mode, tampered_indices, path):
+    encode_seconds = recover_image_streamed(open_image(file_path, color_mode), tampered_indices,
+                                            [], path, None, color_mode=color_mode)
+    return _streamed_stats(path, encode_seconds)
+
+
+# ==========================================
+# BAND-STREAMED FORENSICS (very large images)
+# ==========================================
+def _verify_streamed(file_path, color_mode, matched_entry, target_ref_id, incoming_sha, stored_sha, stored_blocks):
+    """
+    Hashes and renders STREAM_BAND_ROWS rows at a time, each pass reading
+    the upload band by band (see core.streaming). Peak memory: one band for
+    lossless PNGs, the natively decoded source plus one band otherwise.
+    """
+    with metrics.span("verify.image.decode"):
+        src = open_image(file_path, color_mode)
+
+    with metrics.span("verify.image.hash"):
+        current_hashes = []
+        for _, band in iter_bands(src):
+            current_hashes.extend(hash_tiles(band, BLOCK_SIZE))
+
+    with metrics.span("verify.image.compare"):
+        tampered_indices, percent = compare_blocks(current_hashes, stored_blocks)
+    del current_hashes
+
+    metrics.inc("blocks_compared_total", len(stored_blocks))
+    metrics.inc("blocks_tampered_total", len(tampered_indices))
+
+    if not tampered_indices:
+        return {"status": "AUTHENTIC", "message": "Metadata mismatch only.", "details": {"tamper_score": 0}}
+
+    width, height = src.size
+    use_preview = _needs_preview(width, height)
+
+    if use_preview:
+        # Overlay on a preview (JPEGs re-decoded at reduced scale via draft()):
+        # the job only needs the header
+        src = None
+        forensic_ext = artifact_format(FORENSIC_PREVIEW_MAX_SIDE, FORENSIC_PREVIEW_MAX_SIDE)
+        forensic_filename, clean_filename, full_filename = _artifact_names(forensic_ext, "png", "png")
+    else:
+        forensic_filename, clean_filename, full_filename = _artifact_names("png", "png")
+
+    def render_forensic_streamed(path):
+        if src is None:
+            preview = load_preview(file_path, FORENSIC_PREVIEW_MAX_SIDE)
+            with Image.open(file_path) as header:
+                encode_seconds = recover_image_streamed(header, tampered_indices, stored_blocks, path, None,
+                                                        color_mode=color_mode, preview_img=preview)
+        else:
+            encode_seconds = recover_image_streamed(src, tampered_indices, stored_blocks, path, None,
+                                                    color_mode=color_mode)
+        return _streamed_stats(path, encode_seconds)
+
+    forensic_url = artifact_service.submit(forensic_filename, render_forensic_streamed)
+    clean_url = artifact_service.submit(
+        clean_filename, partial(_render_clean_streamed, file_path, color_mode, target_ref_id, tampered_indices),
+        eager=False
+    )
+    full_url = artifact_service.submit(
+        full_filename, partial(_render_full_streamed, file_path, color_mode, tampered_indices),
+        eager=False
+    ) if full_filename else None
+
+    return _tampered_result(matched_entry, target_ref_id, incoming_sha, stored_sha, percent,
+                            forensic_url, clean_url, _tamper_map(width, height, tampered_indices),
+                            forensic_full_url=full_url)
+
+
+# ==========================================
+# PRE-CHECK (client-supplied SHA, no upload)
+# ==========================================
+def precheck_image(ref_id, sha, original_filename=None):
+    """
+    Answers AUTHENTIC / UNREGISTERED from the hash alone.
+    Returns UPLOAD_REQUIRED when the file must be sent for block forensics,
+    or for the near-duplicate search when nothing is registered under it.
+    """
+    matched_entry = find_image_record(ref_id, sha)
+
+    if not matched_entry:
+        if SIMILARITY_ENABLED:
+            return {
+                "status": "UPLOAD_REQUIRED",
+                "message": "No exact match. Upload the file to search for similar registered images.",
+                "details": {"incoming_sha": sha}
+            }
+        return _unregistered_result(ref_id, sha, original_filename)
+
+    stored_sha = matched_entry.get("sha") or matched_entry.get("fingerprint")
+    target_ref_id = matched_entry.get("reference_id") or ref_id
+
+    if stored_sha == sha:
+        return _authentic_result(sha, target_ref_id, matched_entry)
+
+    return {
+        "status": "UPLOAD_REQUIRED",
+        "message": "Hash mismatch. Upload the file for forensic analysis.",
+        "details": {"matched_id": target_ref_id}
+    }
+
+
+def verify_image(ref_id, file_path, original_filename=None, sha=None):
+    print(f"--- VERIFYING IMAGE: {ref_id} ---")
+
+    # 1. Compute Hash of the incoming file (unless supplied by the upload layer)
+    incoming_sha = sha
+    if not incoming_sha:
+        try:
+            with metrics.span("verify.image.sha"):
+                incoming_sha = sha256_file(file_path)
+        except Exception as e:
+            return {"status": "ERROR", "message": f"File read error: {e}"}
+
+    # 2. Find the authentic record
+    with metrics.span("verify.image.lookup"):
+        matched_entry = find_image_record(ref_id, incoming_sha)
 
     # ==========================================
     # CASE: UNREGISTERED
     # ==========================================
     if not matched_entry:
-        return {
-            "status": "UNREGISTERED",
-            "message": f"No record found for ID '{ref_id}' or this file hash.",
-            "details": {
-                "incoming_sha": incoming_sha,
-                "incoming_filename": original_filename
-            }
-        }
+        result = _unregistered_result(ref_id, incoming_sha, original_filename)
+        result["details"]["similar"] = _similar_images(file_path)
+        return result
 
     # Record Found! Check Content.
     stored_sha = matched_entry.get("sha") or matched_entry.get("fingerprint")
@@ -78,16 +326,7 @@ def verify_image(ref_id, file_path, original_filename=None):
     # CASE: AUTHENTIC
     # ==========================================
     if stored_sha == incoming_sha:
-        return {
-            "status": "AUTHENTIC",
-            "message": "Integrity is intact. Image is authentic.",
-            "details": {
-                "sha": incoming_sha,
-                "matched_id": target_ref_id,
-                "matched_filename": matched_entry.get("filename"),
-                "tamper_score": 0
-            }
-        }
+        return _authentic_result(incoming_sha, target_ref_id, matched_entry)
 
     # ==========================================
     # CASE: TAMPERED (Hash Mismatch)
@@ -95,24 +334,10 @@ def verify_image(ref_id, file_path, original_filename=None):
     print(f"-> Hash Mismatch. Starting Forensics on {target_ref_id}...")
     
     try:
-        # 1. Load Image for Forensics
-        img_gray = load_grayscale(file_path) 
-        img_pil = Image.open(file_path).convert("RGB") 
-
-        # 2. Slice and Hash
-        img_blocks = slice_blocks(img_gray)
-        current_hashes = [hash_block(b) for _, b in img_blocks]
-        
-        # 3. Get Positions
-        current_positions = []
-        for pos_tuple, _ in img_blocks:
-            if len(pos_tuple) >= 2:
-                current_positions.append((pos_tuple[0], pos_tuple[1]))
-            else:
-                current_positions.append((0, 0))
-
-        # 4. Get Stored Blocks
-        stored_blocks = matched_entry.get("blocks", [])
+        # 1. Get Stored Blocks
+        # Heavy payload: only loaded here, on the TAMPERED path
+        with metrics.span("verify.image.load_blocks"):
+            stored_blocks = get_block_hashes(matched_entry, target_ref_id)
 
         if not stored_blocks:
             return {
@@ -121,57 +346,83 @@ def verify_image(ref_id, file_path, original_filename=None):
                 "details": {"matched_id": target_ref_id, "tamper_score": 100}
             }
 
-        # 5. Compare Blocks
-        tampered_indices, percent = compare_blocks(current_hashes, stored_blocks)
+        # 2. Load Image for Forensics (in the mode the record was hashed in)
+        color_mode = matched_entry.get("color_mode", "L")
+        src = Image.open(file_path)
+        width, height = src.size  # header only, no decode yet
+
+        if width * height >= STREAMING_MIN_PIXELS:
+            src.close()
+            return _verify_streamed(file_path, color_mode, matched_entry, target_ref_id,
+                                    incoming_sha, stored_sha, stored_blocks)
+
+        # Single decode: the hashing buffer and the overlay base share one raster
+        with metrics.span("verify.image.decode"):
+            img_pil, img_pixels = decode_shared(src, color_mode)
+            preview = None
+            if _needs_preview(width, height):
+                preview = load_preview(file_path, FORENSIC_PREVIEW_MAX_SIDE, decoded=img_pil)
+
+        levels = get_hierarchy_levels(matched_entry)
+        tamper_regions = None
+        tiles_hashed = None
+
+        if levels and (width, height) == (matched_entry.get("width"), matched_entry.get("height")):
+            # 3a. Coarse-to-fine: only tiles under a mismatching parent are hashed
+            sizes = matched_entry["hierarchy"]["sizes"]
+            with metrics.span("verify.image.locate"):
+                fine_tiles, tiles_hashed = locate_tampering(img_pixels, sizes, levels)
+            metrics.inc("tiles_hashed_total", tiles_hashed)
+
+            fine = sizes[-1]
+            block_size = matched_entry.get("block_size", BLOCK_SIZE)
+            tampered_indices = tiles_to_blocks(fine_tiles, fine, height, width, block_size)
+            current_positions = get_block_positions(matched_entry, target_ref_id)
+            percent = (len(tampered_indices) / len(current_positions)) * 100 if current_positions else 0
+
+            # [x, y, w, h] at the finest tile size
+            tamper_regions = [
+                [c * fine, r * fine, min(fine, width - c * fine), min(fine, height - r * fine)]
+                for r, c in fine_tiles
+            ]
+        else:
+            # 3b. Flat: hash every block (legacy records, resized uploads)
+            with metrics.span("verify.image.hash"):
+                current_hashes = hash_tiles(img_pixels, BLOCK_SIZE)
+            current_positions = grid_positions(*grid_shape(height, width, BLOCK_SIZE), BLOCK_SIZE)
+
+            with metrics.span("verify.image.compare"):
+                tampered_indices, percent = compare_blocks(current_hashes, stored_blocks)
+
+        metrics.inc("blocks_compared_total", len(stored_blocks))
+        metrics.inc("blocks_tampered_total", len(tampered_indices))
 
         if not tampered_indices:
             return {"status": "AUTHENTIC", "message": "Metadata mismatch only.", "details": {"tamper_score": 0}}
 
-        # 6. Reconstruct / Recover (Call Dual Generator)
-        forensic_arr, clean_arr = recover_image(
-            img_pil,
-            tampered_indices,
-            current_positions, 
-            stored_blocks 
+        # 4. Schedule Artifacts (the response does not wait for pixels)
+        full_ext = artifact_format(width, height)
+        forensic_ext = artifact_format(*preview.size) if preview is not None else full_ext
+        forensic_filename, clean_filename, full_filename = _artifact_names(
+            forensic_ext, full_ext, full_ext if preview is not None else None
         )
 
-        # 7. Save BOTH Results
-        unique_id = uuid.uuid4().hex[:8]
-        
-        # A. Save Forensic Image (Red Grid)
-        forensic_filename = f"forensic_{unique_id}.png"
-        forensic_path = os.path.join(RECOVERY_OUTPUT_DIR, forensic_filename)
-        
-        if forensic_arr.dtype != np.uint8: forensic_arr = forensic_arr.astype(np.uint8)
-        Image.fromarray(forensic_arr).save(forensic_path)
-        
-        # B. Save Clean Reconstruction (Grayscale Authentic)
-        clean_filename = f"clean_{unique_id}.png"
-        clean_path = os.path.join(RECOVERY_OUTPUT_DIR, clean_filename)
-        
-        if clean_arr.dtype != np.uint8: clean_arr = clean_arr.astype(np.uint8)
-        Image.fromarray(clean_arr).save(clean_path)
-        
-        # URLs for frontend
-        forensic_url = f"/static/reconstructed/{forensic_filename}"
-        clean_url = f"/static/reconstructed/{clean_filename}"
+        # A. Forensic Image (Red Grid): rendered now, in the background
+        def render_forensic_image(path):
+            return save_image(render_forensic(img_pil, tampered_indices, current_positions, tamper_regions, preview), path)
 
-        return {
-            "status": "TAMPERED",
-            "message": "Visual manipulation detected.",
-            "details": {
-                "matched_id": target_ref_id,
-                "matched_filename": matched_entry.get("filename"),
-                "sha": incoming_sha,
-                "expected_sha": stored_sha,
-                "tamper_score": round(percent, 2),
-                
-                # --- RECOMMENDATION FLAGS ---
-                "can_reconstruct": True, # Always true for images if we got this far
-                "reconstructed_url": forensic_url, # Default view
-                "clean_url": clean_url            # Alternative view
-            }
-        }
+        # B. Clean Reconstruction (and full-resolution overlay when A is a preview):
+        #    only when first requested
+        render_clean_image = partial(_render_clean_image, file_path, color_mode, target_ref_id, tampered_indices)
+        render_full_image = partial(_render_full_image, file_path, target_ref_id, tampered_indices, tamper_regions)
+
+        forensic_url = artifact_service.submit(forensic_filename, render_forensic_image)
+        clean_url = artifact_service.submit(clean_filename, render_clean_image, eager=False)
+        full_url = artifact_service.submit(full_filename, render_full_image, eager=False) if full_filename else None
+
+        return _tampered_result(matched_entry, target_ref_id, incoming_sha, stored_sha, percent,
+                                forensic_url, clean_url, _tamper_map(width, height, tampered_indices, tamper_regions),
+                                tamper_regions, tiles_hashed, forensic_full_url=full_url)
 
     except Exception as e:
         print(f"Forensics Failed: {e}")
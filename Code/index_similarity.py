@@ -0,0 +1,89 @@
+import os
+import re
+import sys
+
+from core.registry import load_chain, register_references, get_block_hashes, get_block_positions
+from core import similarity
+from config import VIDEO_FRAMES_PATH, BLOCK_SIZE
+
+# -------------------------------
+# One-off backfill: adds the perceptual hashes used by near-duplicate
+# search (core/similarity.py) to records registered before them.
+#   images  pHash of the original rebuilt from stored blocks
+#   videos  keyframe pHashes of the stored frames
+# Usage: python index_similarity.py [--dry-run]
+# -------------------------------
+
+
+def image_hashes(ref_id, entry):
+    import numpy as np
+    from PIL import Image
+    from core.recovery import render_clean
+
+    stored = get_block_hashes(entry, ref_id)
+    positions = get_block_positions(entry, ref_id)
+    if not stored or not positions:
+        return None
+
+    color_mode = entry.get("color_mode", "L")
+    # Legacy records have no dimensions: use the block grid's extent
+    height = entry.get("height") or max(y for y, _ in positions) + BLOCK_SIZE
+    width = entry.get("width") or max(x for _, x in positions) + BLOCK_SIZE
+    canvas = np.zeros((height, width) if color_mode == "L" else (height, width, 3), dtype=np.uint8)
+
+    # Every block "tampered" on a black canvas: the original from block storage
+    pixels = render_clean(canvas, range(len(stored)), positions, stored, color_mode)
+    return {"phash": similarity.phash(Image.fromarray(pixels))}
+
+
+def video_hashes(ref_id, entry):
+    frames_dir = os.path.join(VIDEO_FRAMES_PATH, str(ref_id))
+    if not os.path.isdir(frames_dir):
+        return None
+
+    numbered = []
+    for name in os.listdir(frames_dir):
+        match = re.fullmatch(r"frame_(\d+)\.png", name)
+        if match:
+            numbered.append((int(match.group(1)), os.path.join(frames_dir, name)))
+    if not numbered:
+        return None
+    return {"keyframe_phashes": similarity.frame_files_keyframes([path for _, path in sorted(numbered)])}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    dry_run = "--dry-run" in argv
+
+    chain = load_chain()
+    missing = [(ref_id, entry) for ref_id, entry in chain.items()
+               if entry.get("media_type") in ("image", "video") and not similarity.record_hashes(entry)]
+
+    if not missing:
+        print("Every record already has perceptual hashes.")
+        return 0
+    if dry_run:
+        print(f"Would index {len(missing)} records.")
+        return 0
+
+    updates = {}
+    skipped = 0
+    for ref_id, entry in missing:
+        try:
+            hashes = video_hashes(ref_id, entry) if entry["media_type"] == "video" else image_hashes(ref_id, entry)
+        except Exception as e:
+            print(f"{ref_id}: {e}")
+            hashes = None
+        if hashes:
+            updates[ref_id] = dict(entry, **hashes)
+        else:
+            skipped += 1
+
+    if updates:
+        register_references(updates)
+    print(f"Indexed {len(updates)} records ({skipped} without stored blocks / frames).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
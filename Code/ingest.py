@@ -0,0 +1,169 @@
+import os
+import hashlib
+import tempfile
+import threading
+
+from flask import Request, request, has_request_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+from core.hashing import CHUNK_SIZE
+from config import UPLOAD_STAGING_DIR, MAX_UPLOAD_BYTES
+
+# =========================
+# HASHING SPOOL FILE
+# =========================
+class HashingUploadFile:
+    """
+    Write-through upload container handed to Werkzeug's multipart parser.
+    Every chunk is size-checked, fed into SHA-256 and written to the staging
+    directory exactly once, so nothing is buffered in RAM or re-read to hash.
+    """
+
+    def __init__(self, staging_dir=UPLOAD_STAGING_DIR, max_bytes=MAX_UPLOAD_BYTES):
+        os.makedirs(staging_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=staging_dir, suffix=".part")
+        self._file = os.fdopen(fd, "w+b")
+        self._sha = hashlib.sha256()
+        self.size = 0
+        self.max_bytes = max_bytes
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.discard()
+            raise RequestEntityTooLarge(f"Upload exceeds the {self.max_bytes} byte limit.")
+        self._sha.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._sha.hexdigest()
+
+    def discard(self):
+        self.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    # read / seek / tell / flush etc. behave like the underlying file
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class IngestRequest(Request):
+    """Flask request class that spools file parts through HashingUploadFile."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        spool = HashingUploadFile()
+        self.__dict__.setdefault("_spools", []).append(spool)
+        return spool
+
+    def discard_spools(self):
+        """Removes spools no view finalized (rejected requests, unsupported types)."""
+        for spool in self.__dict__.get("_spools", ()):
+            if spool.path:
+                spool.discard()
+
+    def release_uploads(self):
+        """Lets the janitor evict this request's uploads again (see _hold)."""
+        for path in self.__dict__.pop("_held", ()):
+            _release(path)
+
+
+# =========================
+# UPLOADS IN USE
+# Uploads handed to a request stay protected from the janitor until the
+# request is torn down (streamed batch responses included).
+# =========================
+_held = {}  # path -> number of requests using it
+_held_lock = threading.Lock()
+
+
+def _hold(path):
+    if not has_request_context() or not isinstance(request._get_current_object(), IngestRequest):
+        return  # CLI / bulk ingest: no request to release the hold
+    with _held_lock:
+        _held[path] = _held.get(path, 0) + 1
+    request.__dict__.setdefault("_held", []).append(path)
+
+
+def _release(path):
+    with _held_lock:
+        count = _held.get(path, 0) - 1
+        if count > 0:
+            _held[path] = count
+        else:
+            _held.pop(path, None)
+
+
+def uploads_in_use():
+    with _held_lock:
+        return {os.path.normpath(path) for path in _held}
+
+
+# =========================
+# FINALIZE UPLOAD
+# =========================
+def _content_addressed_path(upload_dir, sha, original_filename):
+    ext = os.path.splitext(secure_filename(original_filename or ""))[1].lower()
+    return os.path.join(upload_dir, f"{sha}{ext}")
+
+
+def _commit(spool, upload_dir, original_filename):
+    spool.flush()
+    sha = spool.hexdigest()
+    size = spool.size
+    target = _content_addressed_path(upload_dir, sha, original_filename)
+
+    spool.close()
+    try:
+        # Reused content: refresh its mtime so the janitor treats it as in use
+        os.utime(target)
+        spool.discard()
+    except FileNotFoundError:
+        # Same filesystem as the staging dir -> rename, no second write
+        os.replace(spool.path, target)
+        spool.path = None
+
+    _hold(target)
+    return {"sha": sha, "path": target, "size": size}
+
+
+def finalize_upload(media, upload_dir):
+    """
+    Moves an uploaded FileStorage into uploads/<type>/<sha256><ext>.
+    Returns {"sha", "path", "size"}. Identical content is stored only once.
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    spool = media.stream
+
+    if isinstance(spool, HashingUploadFile) and spool.path:
+        return _commit(spool, upload_dir, media.filename)
+
+    # Fallback for streams not created by IngestRequest (e.g. test clients)
+    return ingest_stream(spool, media.filename, upload_dir)
+
+
+def ingest_stream(stream, filename, upload_dir, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Single-pass copy of any readable stream (archive member, foreign upload)
+    into the content-addressed upload dir, hashing while copying.
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    staged = HashingUploadFile(max_bytes=max_bytes)
+    try:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            staged.write(chunk)
+    except Exception:
+        staged.discard()
+        raise
+
+    return _commit(staged, upload_dir, filename)
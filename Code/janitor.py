@@ -0,0 +1,187 @@
+import os
+import time
+import logging
+import threading
+
+import metrics
+from core.registry import load_chain
+from ingest import uploads_in_use
+from config import (
+    UPLOAD_STAGING_DIR, UPLOAD_DIRS, ARTIFACT_DIRS,
+    STAGING_TTL_SECONDS, UPLOAD_TTL_SECONDS, ARTIFACT_TTL_SECONDS,
+    STORAGE_BUDGET_BYTES, JANITOR_INTERVAL_SECONDS, JANITOR_MIN_AGE_SECONDS
+)
+
+# =========================
+# METRICS
+# =========================
+_metrics = {
+    "runs": 0,
+    "files_evicted": 0,
+    "bytes_reclaimed": 0,
+    "last_run": None,
+    "last_run_seconds": 0.0,
+    "last_files_evicted": 0,
+    "last_bytes_reclaimed": 0,
+    "managed_bytes": 0,
+    "protected_bytes": 0
+}
+_lock = threading.Lock()
+_thread = None
+_stop = threading.Event()
+log = logging.getLogger(__name__)
+
+
+def get_metrics():
+    with _lock:
+        return dict(_metrics)
+
+
+# =========================
+# PROTECTED (REGISTERED) FILES
+# =========================
+def _registered_names():
+    """
+    Upload names that back a registry entry. New uploads are content-addressed
+    (<sha><ext>), legacy ones are matched by the filename stored on the record.
+    """
+    shas, filenames = set(), set()
+    for entry in load_chain().values():
+        sha = entry.get("sha") or entry.get("fingerprint")
+        if sha:
+            shas.add(sha)
+        if entry.get("filename"):
+            filenames.add(entry["filename"])
+    return shas, filenames
+
+
+def _scan(directory):
+    files = []
+    if not os.path.isdir(directory):
+        return files
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # removed under us
+            files.append((path, st.st_size, st.st_mtime))
+    return files
+
+
+def _evict(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+# =========================
+# SWEEP
+# =========================
+def sweep(now=None):
+    """
+    One retention pass. Returns {"files_evicted", "bytes_reclaimed"}.
+    1. Evict unprotected files older than their TTL.
+    2. If still over STORAGE_BUDGET_BYTES, evict the oldest unprotected files
+       older than JANITOR_MIN_AGE_SECONDS.
+    Uploads held by an in-flight request are never evicted.
+    """
+    started = time.time()
+    now = now or started
+    shas, filenames = _registered_names()
+    in_use = uploads_in_use()
+
+    candidates = []  # (mtime, path, size, ttl)
+    managed_bytes = 0
+    protected_bytes = 0
+
+    for path, size, mtime in _scan(UPLOAD_STAGING_DIR):
+        managed_bytes += size
+        candidates.append((mtime, path, size, STAGING_TTL_SECONDS))
+
+    for directory in UPLOAD_DIRS:
+        for path, size, mtime in _scan(directory):
+            managed_bytes += size
+            name = os.path.basename(path)
+            if os.path.splitext(name)[0] in shas or name in filenames or os.path.normpath(path) in in_use:
+                protected_bytes += size
+                continue
+            candidates.append((mtime, path, size, UPLOAD_TTL_SECONDS))
+
+    for directory in ARTIFACT_DIRS:
+        for path, size, mtime in _scan(directory):
+            managed_bytes += size
+            candidates.append((mtime, path, size, ARTIFACT_TTL_SECONDS))
+
+    evicted = 0
+    reclaimed = 0
+    remaining = []
+
+    # 1. TTL
+    for mtime, path, size, ttl in candidates:
+        if now - mtime > ttl and _evict(path):
+            evicted += 1
+            reclaimed += size
+            managed_bytes -= size
+            continue
+        remaining.append((mtime, path, size, ttl))
+
+    # 2. Size budget (oldest first)
+    if managed_bytes > STORAGE_BUDGET_BYTES:
+        for mtime, path, size, _ in sorted(remaining):
+            if managed_bytes <= STORAGE_BUDGET_BYTES:
+                break
+            if now - mtime < JANITOR_MIN_AGE_SECONDS:
+                continue  # may belong to a request still running (reused uploads are touched)
+            if _evict(path):
+                evicted += 1
+                reclaimed += size
+                managed_bytes -= size
+
+    with _lock:
+        _metrics["runs"] += 1
+        _metrics["files_evicted"] += evicted
+        _metrics["bytes_reclaimed"] += reclaimed
+        _metrics["last_run"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))
+        _metrics["last_run_seconds"] = round(time.time() - started, 4)
+        _metrics["last_files_evicted"] = evicted
+        _metrics["last_bytes_reclaimed"] = reclaimed
+        _metrics["managed_bytes"] = managed_bytes
+        _metrics["protected_bytes"] = protected_bytes
+
+    metrics.inc("janitor_files_evicted_total", evicted)
+    metrics.inc("janitor_bytes_reclaimed_total", reclaimed)
+    if evicted:
+        log.info("Evicted %d files, reclaimed %d bytes", evicted, reclaimed)
+
+    return {"files_evicted": evicted, "bytes_reclaimed": reclaimed}
+
+
+# =========================
+# BACKGROUND THREAD
+# =========================
+def _run(interval):
+    while not _stop.wait(interval):
+        try:
+            sweep()
+        except Exception:
+            metrics.inc("janitor_failures_total")
+            log.exception("Janitor sweep failed")
+
+
+def start_janitor(interval=JANITOR_INTERVAL_SECONDS):
+    """Starts the daemon sweeper once per process."""
+    global _thread
+    if _thread and _thread.is_alive():
+        return _thread
+    _stop.clear()
+    _thread = threading.Thread(target=_run, args=(interval,), name="upload-janitor", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def stop_janitor():
+    _stop.set()
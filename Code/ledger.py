@@ -0,0 +1,281 @@
+import os
+import json
+import bisect
+import hashlib
+import tempfile
+from datetime import datetime
+
+from core.cache import json_cache, locked
+from core import checkpoints
+
+LEDGER_PATH = "registry/ledger.json"
+LEGACY_PREV_HASH = "00000000000000000000000000000000_LEGACY"
+
+
+class LedgerIntegrityError(Exception):
+    """ledger.json no longer matches its checkpoints; nothing is appended."""
+
+# ================================
+# LOAD / SAVE
+# ================================
+def load_ledger():
+    # Cached parse (shared object): copy before mutating
+    return json_cache.load(LEDGER_PATH)
+
+def save_ledger(data):
+    # Never extend a history that was rewritten since the last write: the
+    # checkpoints would otherwise be re-pinned on top of it
+    error = checkpoints.check_history(data)
+    if error:
+        print(f"LEDGER ALARM: {error} Write refused.")
+        raise LedgerIntegrityError(error)
+
+    # Unique temp name: concurrent writers must not rename each other's file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(LEDGER_PATH), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, LEDGER_PATH)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    json_cache.notify_write(LEDGER_PATH, data)
+    # Derived sidecar: pins every LEDGER_CHECKPOINT_INTERVAL-th block (see core/checkpoints.py)
+    checkpoints.update(data)
+
+
+def rebuild_checkpoints():
+    """Operator action: re-pins the checkpoints to ledger.json as it is now."""
+    with locked(LEDGER_PATH):
+        return checkpoints.rebuild(load_ledger())
+
+
+def _genesis_block():
+    return {
+        "index": 0,
+        "timestamp": str(datetime.utcnow()),
+        "filename": "GENESIS",
+        "media_type": "none",
+        "owner": "system",
+        "fingerprint": "0" * 64,
+        "prev_hash": "0" * 64,
+        "block_hash": hashlib.sha256(b"GENESIS_BLOCK").hexdigest()
+    }
+
+
+def _tip(data):
+    """Returns (last_index, block_hash) of the chain head, creating genesis if empty."""
+    if not data:
+        data["0"] = _genesis_block()
+
+    # Link to the highest index
+    last_index = max(int(k) for k in data.keys())
+    prev_block = data[str(last_index)]
+
+    # Handle case where old ledger data might miss 'block_hash'
+    return last_index, prev_block.get("block_hash", LEGACY_PREV_HASH)
+
+
+def _make_block(index, prev_hash, ref_id, sha, owner, filename, media_type):
+    block_content = {
+        "index": index,
+        "reference_id": ref_id,
+        "media_type": media_type,
+        "filename": filename,
+        "owner": owner,
+        "fingerprint": sha,
+        "timestamp": datetime.utcnow().isoformat(),
+        "prev_hash": prev_hash
+    }
+
+    # Block Hash over the canonical JSON of the content
+    block_string = json.dumps(block_content, sort_keys=True).encode()
+    block_content["block_hash"] = hashlib.sha256(block_string).hexdigest()
+    return block_content
+
+
+# ================================
+# LEDGER LOGGING (With Blockchain Links)
+# ================================
+def append_to_ledger(ref_id, sha, owner, filename, media_type):
+    # Held from reading the tip to the rename: a block appended by another
+    # worker process in between would otherwise be dropped
+    with locked(LEDGER_PATH):
+        data = dict(load_ledger())
+        last_index, prev_hash = _tip(data)
+
+        new_index = last_index + 1
+        data[str(new_index)] = _make_block(new_index, prev_hash, ref_id, sha, owner, filename, media_type)
+
+        save_ledger(data)
+    return new_index
+
+
+def append_batch_to_ledger(entries):
+    """
+    entries: list of dicts with ref_id, sha, owner, filename, media_type.
+    Chains every entry in order and rewrites the ledger ONCE.
+    Returns the list of new block indexes.
+    """
+    if not entries:
+        return []
+
+    with locked(LEDGER_PATH):
+        data = dict(load_ledger())
+        last_index, prev_hash = _tip(data)
+
+        indexes = []
+        for e in entries:
+            last_index += 1
+            block = _make_block(last_index, prev_hash, e["ref_id"], e["sha"], e["owner"], e["filename"], e["media_type"])
+            data[str(last_index)] = block
+            prev_hash = block["block_hash"]
+            indexes.append(last_index)
+
+        save_ledger(data)
+    return indexes
+
+
+# ================================
+# QUERY INDEX (for the paginated /chain API)
+# Cached with the parsed ledger; rebuilt only when ledger.json changes.
+# ================================
+INDEXED_FIELDS = ("owner", "media_type", "reference_id")
+
+def _normalize_ts(ts):
+    # Genesis uses "YYYY-MM-DD HH:MM:SS", other blocks ISO "YYYY-MM-DDTHH:MM:SS"
+    return str(ts or "").replace(" ", "T")
+
+def _normalize_bound(ts, upper):
+    """since/until filter: UTC ("Z" accepted); an upper bound covers its whole day / minute / second."""
+    ts = _normalize_ts(ts).rstrip("Z")
+    if upper and len(ts) == len("YYYY-MM-DD"):
+        ts += "T23:59"
+    if upper and len(ts) == len("YYYY-MM-DDTHH:MM"):
+        ts += ":59"
+    if upper and len(ts) == len("YYYY-MM-DDTHH:MM:SS"):
+        ts += ".999999"
+    return ts
+
+
+def _build_index(data):
+    by_index = {int(b.get("index", k)): b for k, b in data.items()}
+    indices = sorted(by_index)
+    postings = {field: {} for field in INDEXED_FIELDS}
+    for i in indices:
+        for field in INDEXED_FIELDS:
+            value = by_index[i].get(field)
+            if value is not None:
+                postings[field].setdefault(str(value).lower(), []).append(i)
+
+    # Blocks are appended in time order, so timestamps line up with indices
+    # and a time range is a bisect (checked: a ledger written across a clock
+    # change falls back to filtering row by row)
+    timestamps = [_normalize_ts(by_index[i].get("timestamp")) for i in indices]
+    chronological = all(a <= b for a, b in zip(timestamps, timestamps[1:]))
+
+    return {"by_index": by_index, "indices": indices, "postings": postings,
+            "timestamps": timestamps, "chronological": chronological}
+
+
+def _time_range(idx, since, until):
+    """Lowest and highest block index inside [since, until], or None if none is."""
+    timestamps = idx["timestamps"]
+    first = bisect.bisect_left(timestamps, since) if since else 0
+    last = bisect.bisect_right(timestamps, until) if until else len(timestamps)
+    if first >= last:
+        return None
+    return idx["indices"][first], idx["indices"][last - 1]
+
+
+def _load_index():
+    return json_cache.derive(LEDGER_PATH, "query_index", _build_index)
+
+
+def query_ledger(cursor=None, limit=50, order="asc", owner=None, media_type=None,
+                 reference_id=None, since=None, until=None):
+    """
+    Cursor-paginated ledger query.
+    cursor: block index of the last row the client already has (exclusive).
+    Equality filters use per-field posting lists of block indexes; the time
+    range becomes a block index range (bisect over the timestamps).
+    Returns {"blocks", "next_cursor", "has_more"}.
+    """
+    idx = _load_index()
+    by_index = idx["by_index"]
+    descending = order == "desc"
+    empty = {"blocks": [], "next_cursor": None, "has_more": False}
+
+    # 1. Candidates: the smallest posting list among the equality filters
+    filters = {f: v for f, v in (("owner", owner), ("media_type", media_type), ("reference_id", reference_id)) if v}
+    if filters:
+        keys = min((idx["postings"][f].get(str(v).lower(), []) for f, v in filters.items()), key=len)
+    else:
+        keys = idx["indices"]
+
+    since = _normalize_bound(since, upper=False) if since else None
+    until = _normalize_bound(until, upper=True) if until else None
+
+    # 2. Time range -> the slice [lo, hi) of keys it covers
+    lo, hi = 0, len(keys)
+    if (since or until) and idx["chronological"]:
+        block_range = _time_range(idx, since, until)
+        if block_range is None:
+            return empty
+        lo = bisect.bisect_left(keys, block_range[0])
+        hi = bisect.bisect_right(keys, block_range[1])
+        since = until = None  # already applied
+
+    # 3. Seek past the cursor (keys are sorted block indexes)
+    if cursor is None:
+        start = hi - 1 if descending else lo
+    elif descending:
+        start = min(bisect.bisect_left(keys, int(cursor)), hi) - 1
+    else:
+        start = max(bisect.bisect_right(keys, int(cursor)), lo)
+
+    step = -1 if descending else 1
+
+    page = []
+    i = start
+    while lo <= i < hi:
+        block = by_index[keys[i]]
+        i += step
+
+        if any(str(block.get(f, "")).lower() != str(v).lower() for f, v in filters.items()):
+            continue
+        ts = _normalize_ts(block.get("timestamp"))
+        if (since and ts < since) or (until and ts > until):
+            continue
+
+        if len(page) == limit:
+            return {"blocks": page, "next_cursor": page[-1]["index"], "has_more": True}
+        page.append(block)
+
+    return {"blocks": page, "next_cursor": page[-1]["index"] if page else None, "has_more": False}
+
+# ================================
+# INCLUSION (for offline verification bundles)
+# ================================
+def find_block(reference_id, sha=None):
+    """Latest ledger block logged for reference_id (and fingerprint sha, if given), or None."""
+    idx = _load_index()
+    for i in reversed(idx["postings"]["reference_id"].get(str(reference_id).lower(), [])):
+        block = idx["by_index"][i]
+        if sha is None or block.get("fingerprint") == sha:
+            return block
+    return None
+
+
+def chain_segment(start_index, limit):
+    """
+    Blocks from start_index towards the tip (at most `limit`), in index order,
+    and the tip's index. Each block's prev_hash names its predecessor, so the
+    segment proves the first block is an ancestor of the last one.
+    Returns (blocks, tip_index).
+    """
+    idx = _load_index()
+    keys = idx["indices"]
+    i = bisect.bisect_left(keys, int(start_index))
+    return [idx["by_index"][k] for k in keys[i:i + limit]], keys[-1] if keys else None
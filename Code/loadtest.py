@@ -0,0 +1,195 @@
+import os
+import sys
+import time
+import uuid
+import argparse
+import subprocess
+import threading
+import statistics
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+# =========================
+# LOAD TEST (POST /verify against a running server)
+#   python serve.py --workers 4 &
+#   python loadtest.py tampered.png --ref-id IMG001 --concurrency 1,2,4,8,16
+# Prints throughput and latency per concurrency level; with a worker pool,
+# throughput should grow until concurrency reaches the worker (core) count.
+#   python loadtest.py tampered.png --ref-id IMG001 --serve-workers 1,2,4,8
+# starts serve.py once per worker count and drives each at the same levels,
+# so the speedup column shows scaling across cores.
+# =========================
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Keep the login response (and its session cookie) instead of loading the dashboard
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _open_session(base_url, username, email, password):
+    """Logs in (signing up first if needed) and returns a cookie-carrying opener."""
+    jar = CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar), _NoRedirect())
+    form = {"username": username, "email": email, "password": password}
+
+    try:
+        signup = dict(form, confirm_password=password)
+        opener.open(base_url + "/signup", urllib.parse.urlencode(signup).encode())
+    except urllib.error.HTTPError:
+        pass  # already registered (or the signup page failed to render)
+
+    try:
+        opener.open(base_url + "/", urllib.parse.urlencode(form).encode())
+    except urllib.error.HTTPError as e:
+        if e.code != 302:
+            raise
+    if not any(c.name == "session" for c in jar):
+        raise SystemExit("Login failed: check --username / --email / --password.")
+    return opener
+
+
+def _multipart(fields, file_field, filename, data):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for key, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def _post_verify(opener, url, body, content_type, timeout):
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+    started = time.perf_counter()
+    try:
+        with opener.open(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = "conn_error"
+    return status, time.perf_counter() - started
+
+
+def run_level(opener, url, body, content_type, concurrency, requests, timeout):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            status, seconds = _post_verify(opener, url, body, content_type, timeout)
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(seconds)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "seconds": round(elapsed, 2),
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p99_ms": round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000, 1) if latencies else None,
+        "statuses": statuses
+    }
+
+
+def _start_server(workers, port, timeout=60):
+    """Runs serve.py with `workers` compute processes and waits until it answers."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen([sys.executable, os.path.join(here, "serve.py"), "--workers", str(workers),
+                             "--host", "127.0.0.1", "--port", str(port)], cwd=here)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"serve.py exited with status {proc.returncode}.")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).close()
+            return proc
+        except urllib.error.HTTPError:
+            return proc  # answering, even if with an error page
+        except OSError:
+            time.sleep(0.5)
+    proc.terminate()
+    raise SystemExit(f"serve.py did not answer within {timeout} s.")
+
+
+def _stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test POST /verify at increasing concurrency.")
+    parser.add_argument("file", help="Image to upload on every request")
+    parser.add_argument("--ref-id", default="")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated levels")
+    parser.add_argument("--serve-workers", default="",
+                        help="Comma-separated worker counts: start serve.py for each (on the --url port)")
+    parser.add_argument("--requests", type=int, default=0, help="Requests per level (default: 4 x concurrency)")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--username", default="loadtest")
+    parser.add_argument("--email", default="loadtest@example.com")
+    parser.add_argument("--password", default="loadtest")
+    args = parser.parse_args(argv)
+
+    base_url = args.url.rstrip("/")
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    worker_counts = [int(c) for c in args.serve_workers.split(",") if c.strip()] or [None]
+
+    with open(args.file, "rb") as f:
+        data = f.read()
+    body, content_type = _multipart(
+        {"ref_id": args.ref_id, "media_type": "image"}, "media", os.path.basename(args.file), data
+    )
+
+    # Speedup: throughput relative to the first row (one worker, one client)
+    baseline = None
+    print(f"{'workers':>7} {'conc':>5} {'reqs':>5} {'secs':>7} {'req/s':>7} {'speedup':>7} "
+          f"{'p50 ms':>9} {'p99 ms':>9}  statuses")
+    for workers in worker_counts:
+        server = _start_server(workers, urllib.parse.urlparse(base_url).port or 80) if workers else None
+        try:
+            opener = _open_session(base_url, args.username, args.email, args.password)
+            if workers:
+                # Unmeasured: lets every freshly spawned worker finish importing and warming up
+                run_level(opener, base_url + "/verify", body, content_type, workers, 2 * workers, args.timeout)
+            for level in levels:
+                r = run_level(opener, base_url + "/verify", body, content_type, level,
+                              args.requests or 4 * level, args.timeout)
+                baseline = baseline or r["throughput"]
+                speedup = round(r["throughput"] / baseline, 2) if baseline else None
+                print(f"{workers or '-':>7} {r['concurrency']:>5} {r['requests']:>5} {r['seconds']:>7} "
+                      f"{r['throughput']:>7} {str(speedup):>7} {str(r['p50_ms']):>9} {str(r['p99_ms']):>9}  "
+                      f"{r['statuses']}")
+        finally:
+            if server:
+                _stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
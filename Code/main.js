@@ -47,14 +47,22 @@ async function handleVerify(event) {
     btn.disabled = true;
     btn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Verifying...';
 
-    const formData = new FormData();
-    formData.append('media', file);
-    formData.append('ref_id', refIdInput.value.trim());
-    formData.append('media_type', file.type.startsWith('video') ? 'video' : 'image');
+    const mediaType = file.type.startsWith('video') ? 'video' : 'image';
 
     try {
-        const response = await fetch('/verify', { method: 'POST', body: formData });
-        const result = await response.json();
+        // Phase 1: hash locally and ask the server (no upload)
+        let result = await precheckVerify(file, refIdInput.value.trim(), mediaType);
+
+        // Phase 2: full upload only when forensics need the pixels
+        if (!result) {
+            const formData = new FormData();
+            formData.append('media', file);
+            formData.append('ref_id', refIdInput.value.trim());
+            formData.append('media_type', mediaType);
+
+            const response = await fetch('/verify', { method: 'POST', body: formData });
+            result = await response.json();
+        }
 
         // UI Result
         document.getElementById('verify-loading').classList.add('hidden');
@@ -62,7 +70,7 @@ async function handleVerify(event) {
         btn.disabled = false;
         btn.innerHTML = '<i class="fas fa-search"></i> Verify Integrity';
 
-        updateVerifyUI(result, file.name, file.type.startsWith('video') ? 'video' : 'image');
+        updateVerifyUI(result, file.name, mediaType);
 
     } catch (error) {
         console.error(error);
@@ -74,6 +82,35 @@ async function handleVerify(event) {
     }
 }
 
+// Files above this are uploaded directly (WebCrypto digest needs the whole buffer)
+const PRECHECK_MAX_BYTES = 256 * 1024 * 1024;
+
+async function sha256Hex(file) {
+    const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+// Returns a final verify result, or null when the file must be uploaded
+async function precheckVerify(file, refId, mediaType) {
+    if (!window.crypto?.subtle || file.size > PRECHECK_MAX_BYTES) return null;
+
+    try {
+        const sha = await sha256Hex(file);
+        const response = await fetch('/verify/precheck', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ sha: sha, size: file.size, ref_id: refId, media_type: mediaType, filename: file.name })
+        });
+        if (!response.ok) return null;
+
+        const result = await response.json();
+        return (result.status === 'UPLOAD_REQUIRED' || result.status === 'error') ? null : result;
+    } catch (error) {
+        console.warn("Pre-check skipped:", error);
+        return null;
+    }
+}
+
 function updateVerifyUI(data, originalFilename, mediaType) {
     // Basic Info
     document.getElementById('v-filename').innerText = originalFilename;
@@ -149,7 +186,15 @@ function updateVerifyUI(data, originalFilename, mediaType) {
         badge.innerText = "UNREGISTERED";
         badge.classList.remove('hidden'); badge.classList.add('warning');
         statusText.innerText = "No Record Found"; statusText.style.color = "#fcd34d";
-        showToast("<strong>No Record Found</strong><br>File is not in blockchain.", "warning");
+
+        // Near-duplicate search: a re-encoded / resized copy of registered media
+        const similar = data.details?.similar || [];
+        if (similar.length) {
+            document.getElementById('v-matched-filename').innerText = "Likely original: " + similar.map(m => m.ref_id).join(", ");
+            showToast(`<strong>No Record Found</strong><br>Looks like a copy of ${similar[0].ref_id}.`, "warning");
+        } else {
+            showToast("<strong>No Record Found</strong><br>File is not in blockchain.", "warning");
+        }
     }
 }
 
@@ -368,49 +413,112 @@ document.addEventListener("DOMContentLoaded", () => {
 // ==========================================
 // 6. BLOCKCHAIN
 // ==========================================
-async function loadBlockchain() {
+// Explorer state: rows are fetched a page at a time as the sentinel scrolls into view
+const LEDGER_PAGE_SIZE = 50;
+const ledgerState = { cursor: null, hasMore: true, loading: false, generation: 0, count: 0, observer: null };
+
+function ledgerFilters() {
+    const val = (id) => (document.getElementById(id)?.value || '').trim();
+    const params = new URLSearchParams({ limit: LEDGER_PAGE_SIZE, order: 'desc' });
+    const fields = { owner: 'filter-owner', media_type: 'filter-media-type', reference_id: 'filter-ref-id', since: 'filter-since', until: 'filter-until' };
+    Object.entries(fields).forEach(([key, id]) => { if (val(id)) params.set(key, val(id)); });
+    // datetime-local is the browser's local time; the ledger stores UTC (minute precision, until inclusive)
+    ['since', 'until'].forEach((key) => {
+        if (params.has(key)) params.set(key, new Date(params.get(key)).toISOString().slice(0, 16));
+    });
+    return params;
+}
+
+function buildLedgerRow(block) {
+    const safeSub = (str) => (str && str.length > 10) ? str.substring(0, 10) + "..." : str;
+    const prevHash = block.prev_hash || "GENESIS";
+    const blockHash = block.block_hash || "LEGACY_DATA";
+    const ts = String(block.timestamp || "").replace(" ", "T");
+    const localTimeStr = new Date(ts + "Z").toLocaleString("en-IN");
+
+    const tr = document.createElement('tr');
+    if (block.index === 0) tr.className = 'genesis-row';
+
+    const cells = [
+        [`#${block.index}`], [localTimeStr], [block.filename], [block.media_type], [block.owner],
+        [safeSub(block.fingerprint), block.fingerprint], [safeSub(prevHash), prevHash], [safeSub(blockHash), blockHash]
+    ];
+    cells.forEach(([text, title]) => {
+        const td = document.createElement('td');
+        td.textContent = text ?? "";
+        if (title) { td.title = title; td.className = 'hash-cell'; }
+        tr.appendChild(td);
+    });
+    return tr;
+}
+
+async function loadLedgerPage() {
     const tbody = document.getElementById('ledger-body');
-    if(!tbody) return;
-    tbody.innerHTML = '<tr><td colspan="8" class="center-text">Loading ledger...</td></tr>';
-    
+    const sentinel = document.getElementById('ledger-sentinel');
+    if (!tbody || ledgerState.loading || !ledgerState.hasMore) return;
+
+    ledgerState.loading = true;
+    const generation = ledgerState.generation;
+    if (sentinel) sentinel.textContent = 'Loading ledger...';
+
     try {
-        const response = await fetch('/chain');
-        const data = await response.json();
-        tbody.innerHTML = '';
-        const blocks = Object.values(data).sort((a, b) => a.index - b.index);
-        
-        if (blocks.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="8" class="center-text">Ledger is initialized but empty.</td></tr>';
-            return;
-        }
+        const params = ledgerFilters();
+        if (ledgerState.cursor !== null) params.set('cursor', ledgerState.cursor);
 
-        blocks.forEach(block => {
-            const isGenesis = block.index === 0;
-            const rowClass = isGenesis ? 'genesis-row' : '';
-            const prevHash = block.prev_hash || "GENESIS";
-            const blockHash = block.block_hash || "LEGACY_DATA";
-            const safeSub = (str) => (str && str.length > 10) ? str.substring(0, 10) + "..." : str;
-            const timeObj = new Date(block.timestamp + "Z");
-            const localTimeStr = timeObj.toLocaleString("en-IN"); 
-
-            const tr = `
-                <tr class="${rowClass}">
-                    <td>#${block.index}</td>
-                    <td>${localTimeStr}</td>
-                    <td>${block.filename}</td>
-                    <td>${block.media_type}</td>
-                    <td>${block.owner}</td>
-                    <td class="hash-cell" title="${block.fingerprint}">${safeSub(block.fingerprint)}</td>
-                    <td class="hash-cell" title="${prevHash}">${safeSub(prevHash)}</td>
-                    <td class="hash-cell" title="${blockHash}">${safeSub(blockHash)}</td>
-                </tr>
-            `;
-            tbody.innerHTML += tr;
-        });
+        const response = await fetch(`/chain?${params.toString()}`);
+        const page = await response.json();
+        if (generation !== ledgerState.generation) return; // filters changed mid-flight
+        if (!response.ok) throw new Error(page.message || 'Request failed');
+
+        const fragment = document.createDocumentFragment();
+        page.blocks.forEach(block => fragment.appendChild(buildLedgerRow(block)));
+        tbody.appendChild(fragment);
+
+        ledgerState.count += page.blocks.length;
+        ledgerState.cursor = page.next_cursor;
+        ledgerState.hasMore = page.has_more;
+
+        if (sentinel) {
+            if (ledgerState.count === 0) sentinel.textContent = 'No blocks match the current filters.';
+            else sentinel.textContent = ledgerState.hasMore ? '' : `${ledgerState.count} blocks loaded.`;
+        }
     } catch (error) {
         console.error(error);
-        tbody.innerHTML = '<tr><td colspan="8" class="center-text error">Failed to load blockchain.</td></tr>';
+        if (sentinel) sentinel.textContent = 'Failed to load blockchain.';
+        ledgerState.hasMore = false;
+    } finally {
+        if (generation === ledgerState.generation) ledgerState.loading = false;
     }
+
+    // Short pages may leave the sentinel visible: keep filling
+    if (generation === ledgerState.generation && ledgerState.hasMore && sentinelVisible()) loadLedgerPage();
+}
+
+function sentinelVisible() {
+    const sentinel = document.getElementById('ledger-sentinel');
+    const scroller = document.getElementById('ledger-scroll');
+    if (!sentinel || !scroller) return false;
+    return sentinel.getBoundingClientRect().top <= scroller.getBoundingClientRect().bottom;
+}
+
+async function loadBlockchain() {
+    const tbody = document.getElementById('ledger-body');
+    const sentinel = document.getElementById('ledger-sentinel');
+    if(!tbody) return;
+
+    // Reset explorer (Refresh button / filter change)
+    tbody.innerHTML = '';
+    Object.assign(ledgerState, { cursor: null, hasMore: true, loading: false, count: 0 });
+    ledgerState.generation += 1;
+
+    if (sentinel && !ledgerState.observer && 'IntersectionObserver' in window) {
+        ledgerState.observer = new IntersectionObserver(entries => {
+            if (entries.some(e => e.isIntersecting)) loadLedgerPage();
+        }, { root: document.getElementById('ledger-scroll'), rootMargin: '200px' });
+        ledgerState.observer.observe(sentinel);
+    }
+
+    await loadLedgerPage();
 }
 
 async function validateChain() {
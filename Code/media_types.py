@@ -0,0 +1,11 @@
+from config import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS
+
+
+def detect_media_type(filename):
+    """"image", "video" or None, from the file extension (see config)."""
+    ext = filename.lower().rsplit(".", 1)[-1]
+    if ext in IMAGE_EXTENSIONS:
+        return "image"
+    if ext in VIDEO_EXTENSIONS:
+        return "video"
+    return None
@@ -15,3 +15,29 @@ def merkle_root(hashes):
         hashes = temp
 
     return hashes[0]
+
+def merkle_path(hashes, index):
+    """
+    Inclusion proof for hashes[index] under merkle_root(hashes):
+    [[sibling, "L" | "R"], ...] from the leaf up ("L": sibling is on the left).
+    """
+    path = []
+    while len(hashes) > 1:
+        if index % 2:
+            path.append([hashes[index - 1], "L"])
+        else:
+            # An odd last node is paired with itself, as in merkle_root()
+            path.append([hashes[index + 1] if index + 1 < len(hashes) else hashes[index], "R"])
+        hashes = [
+            hashlib.sha256((hashes[i] + (hashes[i + 1] if i + 1 < len(hashes) else hashes[i])).encode()).hexdigest()
+            for i in range(0, len(hashes), 2)
+        ]
+        index //= 2
+    return path
+
+def root_from_path(leaf, path):
+    node = leaf
+    for sibling, side in path:
+        pair = sibling + node if side == "L" else node + sibling
+        node = hashlib.sha256(pair.encode()).hexdigest()
+    return node
@@ -0,0 +1,202 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from config import METRICS_ENABLED, METRICS_PREFIX, METRICS_BUCKETS
+
+# =========================
+# REGISTRY
+# Process-wide counters and histograms, rendered in the Prometheus text
+# format by render(). Compute worker processes record into a per-call
+# event list instead, which the front process replays (see recording()).
+# =========================
+DESCRIPTIONS = {
+    "stage_seconds": "Time spent in one pipeline stage.",
+    "http_request_seconds": "Request latency by endpoint.",
+    "artifact_render_seconds": "Forensic artifact render time (including encode).",
+    "registrations_total": "Registration attempts by media type and result status.",
+    "verdicts_total": "Verification verdicts by media type and status.",
+    "blocks_compared_total": "Image blocks compared against the registry.",
+    "blocks_tampered_total": "Image blocks found tampered.",
+    "tiles_hashed_total": "Tiles hashed by hierarchical localization.",
+    "tiles_restored_total": "Blocks restored from block storage into clean reconstructions.",
+    "frames_hashed_total": "Video frames hashed at registration.",
+    "json_parses_total": "Full JSON parses of registry / ledger files.",
+    "compute_rejected_total": "Requests rejected with 429 because the compute queue was full.",
+    "compute_timeouts_total": "Compute jobs that exceeded COMPUTE_TIMEOUT_SECONDS (504).",
+    "artifact_failures_total": "Forensic artifact renders that raised.",
+    "compute_restarts_total": "Compute pools replaced after a worker process died.",
+    "janitor_files_evicted_total": "Upload / artifact files evicted by the janitor.",
+    "janitor_bytes_reclaimed_total": "Bytes reclaimed by the janitor.",
+    "janitor_failures_total": "Janitor sweeps that raised.",
+    "audit_flush_failures_total": "Audit log appends that failed (events stay buffered).",
+    "profile_failures_total": "Request profiles that could not be saved.",
+    "similarity_failures_total": "Near-duplicate searches that raised (verify answered without them).",
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> {"buckets": [...], "sum", "count"}
+
+# Events recorded during the current request / compute call: (kind, name, labels, value)
+_events = contextvars.ContextVar("metrics_events", default=None)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _apply(kind, name, labels, value):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        if kind == "counter":
+            _counters[key] = _counters.get(key, 0) + value
+        else:
+            h = _histograms.get(key)
+            if h is None:
+                h = _histograms[key] = {"buckets": [0] * len(METRICS_BUCKETS), "sum": 0.0, "count": 0}
+            i = bisect.bisect_left(METRICS_BUCKETS, value)
+            if i < len(METRICS_BUCKETS):
+                h["buckets"][i] += 1
+            h["sum"] += value
+            h["count"] += 1
+
+    events = _events.get()
+    if events is not None:
+        events.append((kind, name, labels, value))
+
+
+def inc(name, amount=1, **labels):
+    _apply("counter", name, labels, amount)
+
+
+def observe(name, value, **labels):
+    _apply("histogram", name, labels, value)
+
+
+# =========================
+# STAGE TIMING
+# =========================
+def record_stage(stage, seconds):
+    """For stages timed by hand (e.g. summed over bands): one observation per call."""
+    observe("stage_seconds", seconds, stage=stage)
+
+
+@contextmanager
+def span(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+# =========================
+# PER-REQUEST / CROSS-PROCESS RECORDING
+# =========================
+def start_recording():
+    """Starts collecting the metrics recorded in this context; returns a token for stop_recording()."""
+    return _events.set([])
+
+
+def stop_recording(token):
+    try:
+        _events.reset(token)
+    except ValueError:
+        pass  # streamed responses finish in a copied context; nothing left to undo
+
+
+@contextmanager
+def recording():
+    """Collects every metric recorded in this context (one request or one compute call)."""
+    token = start_recording()
+    try:
+        yield _events.get()
+    finally:
+        stop_recording(token)
+
+
+def replay(events):
+    """Applies events recorded in another process (compute workers) to this registry."""
+    for kind, name, labels, value in events:
+        _apply(kind, name, labels, value)
+
+
+def current_timings():
+    """{stage: seconds} for the stages run so far in the current recording context."""
+    events = _events.get() or []
+    timings = {}
+    for kind, name, labels, value in events:
+        if name == "stage_seconds":
+            stage = labels["stage"]
+            timings[stage] = round(timings.get(stage, 0.0) + value, 4)
+    return timings
+
+
+# =========================
+# PROMETHEUS TEXT FORMAT
+# =========================
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _header(lines, name, kind, text):
+    lines.append(f"# HELP {METRICS_PREFIX}{name} {text}")
+    lines.append(f"# TYPE {METRICS_PREFIX}{name} {kind}")
+
+
+def render(gauges=None):
+    """
+    Text exposition of all counters and histograms. `gauges` adds point-in-time
+    values: {name: value} or {name: [(labels_dict, value), ...]}.
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: dict(v, buckets=list(v["buckets"])) for k, v in _histograms.items()}
+
+    lines = []
+    for name in sorted({k[0] for k in counters}):
+        _header(lines, name, "counter", DESCRIPTIONS.get(name, name))
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{METRICS_PREFIX}{name}{_labels(labels)} {value}")
+
+    for name in sorted({k[0] for k in histograms}):
+        _header(lines, name, "histogram", DESCRIPTIONS.get(name, name))
+        for (n, labels), h in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(METRICS_BUCKETS, h["buckets"]):
+                cumulative += count
+                lines.append(f"{METRICS_PREFIX}{name}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{METRICS_PREFIX}{name}_bucket{_labels(labels, [('le', '+Inf')])} {h['count']}")
+            lines.append(f"{METRICS_PREFIX}{name}_sum{_labels(labels)} {round(h['sum'], 6)}")
+            lines.append(f"{METRICS_PREFIX}{name}_count{_labels(labels)} {h['count']}")
+
+    for name, value in sorted((gauges or {}).items()):
+        _header(lines, name, "gauge", name.replace("_", " ").capitalize() + ".")
+        samples = value if isinstance(value, list) else [({}, value)]
+        for labels, v in samples:
+            if isinstance(v, bool):
+                v = int(v)
+            lines.append(f"{METRICS_PREFIX}{name}{_labels(sorted(labels.items()))} {v}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
@@ -2,13 +2,41 @@ import numpy as np
 from PIL import Image
 from config import BLOCK_SIZE
 
-def load_grayscale(path):
-    img = Image.open(path).convert("L")
-    return np.array(img)
+def decode_shared(img, mode):
+    """
+    Decodes an opened image ONCE and derives both forensic inputs from it.
+    Returns (RGB PIL image for overlays, pixel array in `mode` for hashing).
+    For RGB records both come from the same raster with a single copy.
+    """
+    img.load()
+    rgb = img if img.mode == "RGB" else img.convert("RGB")
+    if mode == "RGB":
+        pixels = np.asarray(rgb)
+    else:
+        # Convert from the source mode, exactly as registration did
+        pixels = np.asarray(img if img.mode == mode else img.convert(mode))
+    return rgb, pixels
+
+def load_preview(path, max_side, decoded=None):
+    """
+    RGB overlay base no longer than max_side on its long edge.
+    decoded: an already-decoded image to reduce instead of reading the file.
+    Otherwise JPEGs use draft(), so the decoder downscales in the DCT
+    domain (1/2 to 1/8) and the full-resolution raster is never built.
+    """
+    if decoded is not None:
+        img = decoded.copy()
+    else:
+        img = Image.open(path)
+        if img.format == "JPEG":
+            img.draft("RGB", (max_side, max_side))
+        img = img.convert("RGB")
+    img.thumbnail((max_side, max_side))
+    return img
 
 def slice_blocks(img):
     blocks = []
-    h, w = img.shape
+    h, w = img.shape[:2]
 
     for y in range(0, h, BLOCK_SIZE):
         for x in range(0, w, BLOCK_SIZE):
@@ -0,0 +1,207 @@
+import io
+import os
+import json
+import time
+import uuid
+import pstats
+import random
+import cProfile
+import threading
+import contextvars
+from datetime import datetime
+
+from config import PROFILE_DIR, PROFILE_SAMPLE_PERCENT, PROFILE_KEEP, PROFILE_TEXT_LINES
+
+# =========================
+# PER-REQUEST PROFILING
+# A request is profiled when it carries the profile header, when an admin
+# armed the next N requests, or by PROFILE_SAMPLE_PERCENT sampling. The
+# request thread runs under cProfile; work handed to compute workers is
+# profiled there and merged in (see compute_service.run). Each profile is
+# saved as <PROFILE_DIR>/<id>.prof (pstats / snakeviz / flameprof) with a
+# <id>.json summary next to it.
+# =========================
+_lock = threading.Lock()
+_settings = {"sample_percent": PROFILE_SAMPLE_PERCENT, "next": 0}
+_metrics = {"profiled": 0, "skipped_busy": 0, "saved": 0, "pruned": 0}
+
+# The profiling session of the current request (None when not profiled)
+_current = contextvars.ContextVar("profile_session", default=None)
+
+
+class _RawStats:
+    # pstats.Stats accepts any object with create_stats() / .stats
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _valid_id(profile_id):
+    return bool(profile_id) and len(profile_id) <= 64 and all(c.isalnum() or c in "-_" for c in profile_id)
+
+
+# =========================
+# TRIGGERS
+# =========================
+def should_profile(header_value):
+    """Returns why this request should be profiled ("header", "admin", "sample") or None."""
+    if header_value == "1":
+        return "header"
+    with _lock:
+        if _settings["next"] > 0:
+            _settings["next"] -= 1
+            return "admin"
+        percent = _settings["sample_percent"]
+    if percent > 0 and random.random() * 100 < percent:
+        return "sample"
+    return None
+
+
+def configure(sample_percent=None, next_requests=None):
+    with _lock:
+        if sample_percent is not None:
+            _settings["sample_percent"] = max(0.0, min(100.0, float(sample_percent)))
+        if next_requests is not None:
+            _settings["next"] = max(0, int(next_requests))
+        return dict(_settings)
+
+
+# =========================
+# SESSION
+# =========================
+def start(trigger, request_id=None):
+    """
+    Starts profiling the current thread. Returns a session for finish(), or None.
+    The profile id is always generated here; a client-supplied request id is
+    only recorded in the summary.
+    """
+    profile_id = uuid.uuid4().hex[:16]
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+: only one profiler may be active at a time
+        with _lock:
+            _metrics["skipped_busy"] += 1
+        return None
+
+    session = {"id": profile_id, "trigger": trigger, "profiler": profiler,
+               "request_id": request_id if _valid_id(request_id) else None,
+               "compute_stats": [], "started": time.perf_counter()}
+    session["token"] = _current.set(session)
+    with _lock:
+        _metrics["profiled"] += 1
+    return session
+
+
+def is_active():
+    return _current.get() is not None
+
+
+def add_compute_stats(stats):
+    """Merges raw cProfile stats collected in a compute worker into the current profile."""
+    session = _current.get()
+    if session is not None and stats:
+        session["compute_stats"].append(stats)
+
+
+def finish(session, **meta):
+    """Stops the profiler and writes <id>.prof and <id>.json. Returns the summary dict."""
+    session["profiler"].disable()
+    seconds = time.perf_counter() - session["started"]
+    try:
+        _current.reset(session["token"])
+    except ValueError:
+        _current.set(None)  # finished from a copied context (streamed response)
+
+    stats = pstats.Stats(session["profiler"])
+    for compute_stats in session["compute_stats"]:
+        stats.add(_RawStats(compute_stats))
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, session["id"] + ".prof")
+    stats.dump_stats(path)
+
+    summary = {
+        "id": session["id"],
+        "trigger": session["trigger"],
+        "request_id": session["request_id"],
+        "created": datetime.utcnow().isoformat() + "Z",
+        "seconds": round(seconds, 4),
+        "compute_profiles": len(session["compute_stats"]),
+        "bytes": os.path.getsize(path),
+        **meta
+    }
+    with open(os.path.join(PROFILE_DIR, session["id"] + ".json"), "w") as f:
+        json.dump(summary, f)
+
+    with _lock:
+        _metrics["saved"] += 1
+    _prune()
+    return summary
+
+
+def _prune():
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith(".prof")]
+    except FileNotFoundError:
+        return
+    if len(names) <= PROFILE_KEEP:
+        return
+
+    names.sort(key=lambda n: os.path.getmtime(os.path.join(PROFILE_DIR, n)))
+    for name in names[:len(names) - PROFILE_KEEP]:
+        profile_id = name[:-len(".prof")]
+        for suffix in (".prof", ".json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+        with _lock:
+            _metrics["pruned"] += 1
+
+
+# =========================
+# LISTING / READING
+# =========================
+def list_profiles(limit=50):
+    """Newest first: the .json summaries of stored profiles."""
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith(".json")]
+    except FileNotFoundError:
+        return []
+
+    paths = sorted((os.path.join(PROFILE_DIR, n) for n in names), key=os.path.getmtime, reverse=True)
+    profiles = []
+    for path in paths[:limit]:
+        try:
+            with open(path, "r") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # pruned or half-written meanwhile
+    return profiles
+
+
+def profile_path(profile_id):
+    if not _valid_id(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + ".prof")
+    return path if os.path.exists(path) else None
+
+
+def profile_text(profile_id, sort="cumulative", lines=PROFILE_TEXT_LINES):
+    """pstats report of a stored profile (top `lines` functions by `sort`)."""
+    path = profile_path(profile_id)
+    if path is None:
+        return None
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(lines)
+    return out.getvalue()
+
+
+def get_metrics():
+    with _lock:
+        return dict(_metrics, **_settings)
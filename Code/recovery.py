@@ -2,76 +2,166 @@ import os
 import pickle
 import numpy as np
 from PIL import Image, ImageDraw
-from config import BLOCK_SIZE, BLOCK_STORAGE
+from config import BLOCK_SIZE, BLOCK_STORAGE, PNG_COMPRESS_LEVEL
+from core.streaming import iter_bands, PNGStreamWriter
+from core.encoding import save_image
+import metrics
 
-def recover_image(base_img_pil, tampered_indices, block_positions, stored_hashes):
+def _scaled(box, sx, sy):
+    x0, y0, x1, y1 = box
+    return [x0 * sx, y0 * sy, x1 * sx, y1 * sy]
+
+
+def _load_stored_block(block_hash):
+    block_path = os.path.join(BLOCK_STORAGE, block_hash)
+    if not os.path.exists(block_path):
+        return None
+    try:
+        with open(block_path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None # File corrupted? Leave black.
+
+
+def render_forensic(base_img_pil, tampered_indices, block_positions, regions=None, preview_img=None):
     """
-    Generates TWO images:
-    1. Forensic Image: Red boxes highlighting suspicious areas.
-    2. Reconstructed Image: A grayscale restoration using authentic blocks + backup storage.
+    Forensic Image: red boxes highlighting suspicious areas (RGB array).
+
+    regions: optional [x, y, w, h] boxes from the tile hierarchy. When given,
+    they are outlined instead of whole BLOCK_SIZE blocks.
+    preview_img: smaller RGB image to draw the overlay on.
     """
-    
-    # --- A. PREPARE IMAGES ---
-    # 1. Forensic (RGB for Red Boxes)
-    forensic_img = base_img_pil.convert("RGB")
+    forensic_img = (preview_img if preview_img is not None else base_img_pil).convert("RGB")
     draw = ImageDraw.Draw(forensic_img)
-    
-    # 2. Reconstructed (Grayscale Canvas)
-    # We start with a blank black canvas of the same size
     width, height = base_img_pil.size
-    reconstructed_array = np.zeros((height, width), dtype=np.uint8)
-    
-    # We need the base image as a numpy array to copy valid pixels
-    base_img_gray = base_img_pil.convert("L")
-    base_pixels = np.array(base_img_gray)
-
-    # --- B. PROCESS BLOCKS ---
-    print(f"--- RECOVERING: {len(tampered_indices)} blocks tampered ---")
-
-    # Set of tampered indices for fast lookup
-    tampered_set = set(tampered_indices)
-    
-    for idx, (y, x) in enumerate(block_positions):
-        # Calculate block bounds
-        y_end = min(y + BLOCK_SIZE, height)
-        x_end = min(x + BLOCK_SIZE, width)
-        
-        # LOGIC 1: AUTHENTIC BLOCK (Copy from Input)
-        if idx not in tampered_set:
-            # If the block is valid, we trust the input pixels
-            block_h = y_end - y
-            block_w = x_end - x
-            
-            # Safe copy (handling edge cases)
-            if y < base_pixels.shape[0] and x < base_pixels.shape[1]:
-                reconstructed_array[y:y_end, x:x_end] = base_pixels[y:y_end, x:x_end]
-                
-        # LOGIC 2: TAMPERED BLOCK (Forensics & Restoration)
-        else:
-            # 2a. Forensic View: Draw Red Box
-            draw.rectangle([x, y, x + BLOCK_SIZE, y + BLOCK_SIZE], outline="#ff0000", width=2)
-            draw.line([x, y, x + BLOCK_SIZE, y + BLOCK_SIZE], fill="#ff0000", width=1)
-            
-            # 2b. Reconstructed View: Try to Load from Storage (Old Model)
-            restored = False
-            if idx < len(stored_hashes):
-                block_hash = stored_hashes[idx]
-                block_path = os.path.join(BLOCK_STORAGE, block_hash)
-                
-                if os.path.exists(block_path):
-                    try:
-                        with open(block_path, "rb") as f:
-                            saved_block = pickle.load(f)
-                            # Ensure shape matches current slot
-                            h_s, w_s = saved_block.shape
-                            reconstructed_array[y:y+h_s, x:x+w_s] = saved_block
-                            restored = True
-                    except:
-                        pass # File corrupted? Leave black.
-            
-            # If we couldn't restore it, it stays BLACK (The "Void" of Truth)
-            if not restored:
-                pass 
-
-    # --- C. RETURN BOTH ---
-    return np.array(forensic_img), reconstructed_array
\ No newline at end of file
+    sx, sy = forensic_img.width / width, forensic_img.height / height
+
+    if regions is None:
+        for idx in tampered_indices:
+            if idx < len(block_positions):
+                y, x = block_positions[idx]
+                draw.rectangle(_scaled([x, y, x + BLOCK_SIZE, y + BLOCK_SIZE], sx, sy), outline="#ff0000", width=2)
+                draw.line(_scaled([x, y, x + BLOCK_SIZE, y + BLOCK_SIZE], sx, sy), fill="#ff0000", width=1)
+
+    for rx, ry, rw, rh in regions or []:
+        draw.rectangle(_scaled([rx, ry, rx + rw - 1, ry + rh - 1], sx, sy), outline="#ff0000", width=1)
+
+    return np.array(forensic_img)
+
+
+def render_clean(base_pixels, tampered_indices, block_positions, stored_hashes, color_mode="L"):
+    """
+    Reconstructed Image: the input's authentic blocks plus tampered blocks
+    restored from backup storage. Grayscale for "L" records, RGB otherwise.
+    Blocks that cannot be restored stay BLACK (The "Void" of Truth).
+    """
+    reconstructed_array = np.array(base_pixels, copy=True)
+    restored = 0
+
+    for idx in tampered_indices:
+        if idx >= len(block_positions):
+            continue  # block only exists in the registered image
+        y, x = block_positions[idx]
+        slot = reconstructed_array[y:y + BLOCK_SIZE, x:x + BLOCK_SIZE]
+        slot[...] = 0
+
+        saved_block = _load_stored_block(stored_hashes[idx]) if idx < len(stored_hashes) else None
+        # Ensure mode matches the current canvas
+        if saved_block is not None and saved_block.ndim == reconstructed_array.ndim:
+            h_s, w_s = min(saved_block.shape[0], slot.shape[0]), min(saved_block.shape[1], slot.shape[1])
+            slot[:h_s, :w_s] = saved_block[:h_s, :w_s]
+            restored += 1
+
+    metrics.inc("tiles_restored_total", restored)
+
+    # YCbCr blocks are restored in their own space, then shown as RGB
+    if color_mode == "YCbCr":
+        reconstructed_array = np.array(Image.fromarray(reconstructed_array, "YCbCr").convert("RGB"))
+
+    return reconstructed_array
+
+
+# =========================
+# BAND-STREAMED RECOVERY
+# =========================
+def recover_image_streamed(src_img, tampered_indices, stored_hashes, forensic_path, clean_path, color_mode="L",
+                           preview_img=None):
+    """
+    Band-by-band variant of render_forensic() / render_clean() for very large images.
+    src_img: core.streaming.open_image() of the source in color_mode (or a
+    PIL image already in it); read band by band.
+    Both outputs are PNG-encoded as bands are produced, so only one band of
+    forensic / clean pixels is ever held. The forensic view is rendered from
+    src_img (grayscale for "L" records), or drawn on preview_img and saved
+    whole when a preview is given. Pass None for a path to skip that output.
+    Returns the seconds spent encoding the outputs.
+    """
+    width, height = src_img.size
+    cols = -(-width // BLOCK_SIZE)
+
+    # Tampered blocks grouped by block row
+    by_row = {}
+    for idx in tampered_indices:
+        by_row.setdefault(idx // cols, []).append(idx % cols)
+
+    encode_seconds = 0.0
+    forensic_out = None
+    if forensic_path and preview_img is not None:
+        preview_draw = ImageDraw.Draw(preview_img)
+        sx, sy = preview_img.width / width, preview_img.height / height
+        for idx in tampered_indices:
+            y, x = (idx // cols) * BLOCK_SIZE, (idx % cols) * BLOCK_SIZE
+            preview_draw.rectangle(_scaled([x, y, x + BLOCK_SIZE, y + BLOCK_SIZE], sx, sy), outline="#ff0000", width=2)
+        encode_seconds += save_image(preview_img, forensic_path)["encode_seconds"]
+    elif forensic_path:
+        forensic_out = PNGStreamWriter(forensic_path, width, height, "RGB", PNG_COMPRESS_LEVEL)
+
+    clean_out = None
+    if clean_path:
+        clean_out = PNGStreamWriter(clean_path, width, height, "L" if color_mode == "L" else "RGB", PNG_COMPRESS_LEVEL)
+
+    if not (forensic_out or clean_out):
+        return encode_seconds
+
+    restored = 0
+    try:
+        for band_y, band in iter_bands(src_img):
+            if forensic_out:
+                forensic_band = Image.fromarray(band, color_mode).convert("RGB")
+                draw = ImageDraw.Draw(forensic_band)
+            clean_band = band.copy() if clean_out else None
+
+            for block_row in range(band_y // BLOCK_SIZE, (band_y + band.shape[0] - 1) // BLOCK_SIZE + 1):
+                y = block_row * BLOCK_SIZE - band_y
+                for block_col in by_row.get(block_row, ()):
+                    x = block_col * BLOCK_SIZE
+                    if forensic_out:
+                        draw.rectangle([x, y, x + BLOCK_SIZE - 1, y + BLOCK_SIZE - 1], outline="#ff0000", width=2)
+                        draw.line([x, y, x + BLOCK_SIZE - 1, y + BLOCK_SIZE - 1], fill="#ff0000", width=1)
+
+                    if clean_out:
+                        # Restore from the block store, else leave the block black
+                        idx = block_row * cols + block_col
+                        saved_block = _load_stored_block(stored_hashes[idx]) if idx < len(stored_hashes) else None
+                        slot = clean_band[y:y+BLOCK_SIZE, x:x+BLOCK_SIZE]
+                        slot[...] = 0
+                        if saved_block is not None and saved_block.ndim == clean_band.ndim:
+                            h_s, w_s = min(saved_block.shape[0], slot.shape[0]), min(saved_block.shape[1], slot.shape[1])
+                            slot[:h_s, :w_s] = saved_block[:h_s, :w_s]
+                            restored += 1
+
+            if forensic_out:
+                forensic_out.write_rows(np.asarray(forensic_band))
+            if clean_out:
+                if color_mode == "YCbCr":
+                    clean_band = np.asarray(Image.fromarray(clean_band, "YCbCr").convert("RGB"))
+                clean_out.write_rows(clean_band)
+    finally:
+        if forensic_out:
+            forensic_out.close()
+            encode_seconds += forensic_out.encode_seconds
+        if clean_out:
+            clean_out.close()
+            encode_seconds += clean_out.encode_seconds
+            metrics.inc("tiles_restored_total", restored)
+    return round(encode_seconds, 4)
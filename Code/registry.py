@@ -1,21 +1,176 @@
 import json
 import os
-from config import BLOCKCHAIN_PATH
+import tempfile
+from core.cache import json_cache, locked, LRUCache
+from core.blockpack import read_pack, grid_positions
+from config import BLOCKCHAIN_PATH, BLOCK_SIZE, PACK_CACHE_ENTRIES
 
 def load_chain():
-    if not os.path.exists(BLOCKCHAIN_PATH):
-        return {}
-    with open(BLOCKCHAIN_PATH, "r") as f:
-        return json.load(f)
+    # Cached parse (shared object): copy before mutating
+    return json_cache.load(BLOCKCHAIN_PATH, strict=True)
 
 def save_chain(data):
-    with open(BLOCKCHAIN_PATH, "w") as f:
-        json.dump(data, f, indent=2)
+    # Write-then-rename so a crash mid-write never leaves a truncated registry
+    # (unique temp name: concurrent writers must not rename each other's file)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(BLOCKCHAIN_PATH), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, BLOCKCHAIN_PATH)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    json_cache.notify_write(BLOCKCHAIN_PATH, data)
 
 def register_reference(ref_id, data):
-    chain = load_chain()
-    chain[ref_id] = data
-    save_chain(chain)
+    with locked(BLOCKCHAIN_PATH):  # other worker processes register concurrently
+        chain = dict(load_chain())
+        chain[ref_id] = data
+        save_chain(chain)
+
+def register_references(entries):
+    """Bulk insert: one registry rewrite for a whole batch of {ref_id: data}."""
+    with locked(BLOCKCHAIN_PATH):
+        chain = dict(load_chain())
+        chain.update(entries)
+        save_chain(chain)
+
+def add_references(entries, before_write=None):
+    """
+    Inserts the {ref_id: data} entries that are still new, in one rewrite.
+    Under the registry lock, ref_ids and SHAs registered in the meantime
+    (by another worker process, too) are skipped instead of overwritten.
+    before_write(fresh) runs under the same lock ahead of the write (the
+    ledger append): if it raises, the registry is left untouched.
+    Returns (fresh ref_ids, skipped ref_ids, result of before_write).
+    """
+    with locked(BLOCKCHAIN_PATH):
+        chain = dict(load_chain())
+        known_shas = set(_build_sha_index(chain))
+        fresh, skipped = [], []
+        for ref_id, data in entries.items():
+            sha = data.get("sha") or data.get("fingerprint")
+            if ref_id in chain or sha in known_shas:
+                skipped.append(ref_id)
+            else:
+                fresh.append(ref_id)
+                known_shas.add(sha)
+
+        logged = before_write(fresh) if before_write and fresh else None
+        if fresh:
+            chain.update((ref_id, entries[ref_id]) for ref_id in fresh)
+            save_chain(chain)
+    return fresh, skipped, logged
+
+# =========================
+# HEADERS vs PAYLOADS
+# get_reference() returns only the small header (sha, owner, filename,
+# merkle_root, dimensions, pack ids). Heavy per-block/per-frame lists are
+# loaded on demand via get_block_hashes() / get_frame_hashes().
+# =========================
+HEAVY_FIELDS = ("blocks", "positions", "frames", "frame_indexes")
+
+_pack_cache = LRUCache(PACK_CACHE_ENTRIES)
+
+def _build_headers(chain):
+    return {
+        key: {k: v for k, v in entry.items() if k not in HEAVY_FIELDS}
+        for key, entry in chain.items()
+    }
 
 def get_reference(ref_id):
-    return load_chain().get(ref_id)
+    headers = json_cache.derive(BLOCKCHAIN_PATH, "headers", _build_headers, strict=True)
+    return headers.get(ref_id)
+
+def _load_pack(pack_id):
+    hashes = _pack_cache.get(pack_id)
+    if hashes is None:
+        hashes = read_pack(pack_id)
+        _pack_cache.put(pack_id, hashes)
+    return hashes
+
+def _inline_payload(entry, ref_id, field):
+    if field in entry:
+        return entry[field]
+    full = load_chain().get(ref_id) if ref_id else None
+    return full.get(field) if full else None
+
+def pack_cache_stats():
+    return _pack_cache.stats()
+
+# =========================
+# HASH INDEX (sha -> ref_id)
+# =========================
+def _build_sha_index(chain):
+    index = {}
+    for key, entry in chain.items():
+        stored = entry.get("sha") or entry.get("fingerprint")
+        if stored:
+            index.setdefault(stored, key)
+    return index
+
+def _load_sha_index():
+    return json_cache.derive(BLOCKCHAIN_PATH, "sha_index", _build_sha_index, strict=True)
+
+def _build_lower_index(chain):
+    return {key.lower(): key for key in chain}
+
+def _build_filename_index(chain):
+    index = {}
+    for key, entry in chain.items():
+        if entry.get("filename"):
+            index.setdefault(entry["filename"], key)
+    return index
+
+def find_by_sha(sha):
+    """Returns (ref_id, header) for a registered SHA-256, or (None, None)."""
+    ref_id = _load_sha_index().get(sha)
+    if not ref_id:
+        return None, None
+    return ref_id, get_reference(ref_id)
+
+def find_reference(ref_id):
+    """Exact ref_id lookup with a case-insensitive fallback. Returns (key, header)."""
+    header = get_reference(ref_id)
+    if header:
+        return ref_id, header
+    key = json_cache.derive(BLOCKCHAIN_PATH, "lower_index", _build_lower_index, strict=True).get(str(ref_id).lower())
+    if key:
+        return key, get_reference(key)
+    return None, None
+
+def find_by_filename(filename):
+    """First record registered under an original filename. Returns (key, header)."""
+    key = json_cache.derive(BLOCKCHAIN_PATH, "filename_index", _build_filename_index, strict=True).get(filename)
+    if not key:
+        return None, None
+    return key, get_reference(key)
+
+# =========================
+# BLOCK DIGESTS / POSITIONS
+# Reads both layouts: inline lists (legacy) and compact packs.
+# =========================
+def get_block_hashes(entry, ref_id=None):
+    if entry.get("blocks_pack"):
+        return _load_pack(entry["blocks_pack"])
+    return _inline_payload(entry, ref_id or entry.get("reference_id"), "blocks") or []
+
+def get_block_positions(entry, ref_id=None):
+    if entry.get("grid"):
+        rows, cols = entry["grid"]
+        return grid_positions(rows, cols, entry.get("block_size", BLOCK_SIZE))
+    positions = _inline_payload(entry, ref_id or entry.get("reference_id"), "positions") or []
+    return [tuple(p) for p in positions]
+
+def get_hierarchy_levels(entry):
+    """Per-level tile digests of a hierarchical record, or None."""
+    hierarchy = entry.get("hierarchy")
+    if not hierarchy:
+        return None
+    return [_load_pack(pack_id) for pack_id in hierarchy["packs"]]
+
+def get_frame_hashes(entry, ref_id=None):
+    if entry.get("frames_pack"):
+        return _load_pack(entry["frames_pack"])
+    return _inline_payload(entry, ref_id or entry.get("reference_id"), "frames") or []
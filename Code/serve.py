@@ -0,0 +1,54 @@
+import logging
+import argparse
+
+from config import SERVE_HOST, SERVE_PORT, SERVE_THREADS, COMPUTE_WORKERS, COMPUTE_MAX_QUEUE
+
+try:
+    from waitress import serve as waitress_serve
+except ImportError:
+    waitress_serve = None
+
+# =========================
+# PRODUCTION ENTRY POINT
+#   python serve.py --workers 8 --threads 32
+# Front end: a threaded WSGI server (waitress when installed, Werkzeug's
+# otherwise) that streams uploads to disk and waits on results.
+# Back end: services.compute_service's process pool runs the CPU-heavy
+# forensics, with a bounded queue (429 when full) and per-job timeouts.
+# =========================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the forensics app with a worker process pool.")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--threads", type=int, default=SERVE_THREADS,
+                        help="Request threads (waitress only; Werkzeug starts one per request)")
+    parser.add_argument("--workers", type=int, default=COMPUTE_WORKERS, help="Forensics worker processes")
+    parser.add_argument("--max-queue", type=int, default=COMPUTE_MAX_QUEUE,
+                        help="Jobs allowed to wait for a worker before requests get 429")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    # Workers are started with "spawn" and re-import this module as
+    # __mp_main__, so the app (DB, janitor, audit threads) is only imported here
+    from services import compute_service
+    compute_service.start_pool(args.workers, args.max_queue)
+
+    from app import app
+
+    print(f"Serving on http://{args.host}:{args.port} "
+          f"({args.threads} threads, {args.workers} workers, {'waitress' if waitress_serve else 'werkzeug'})")
+    try:
+        if waitress_serve:
+            waitress_serve(app, host=args.host, port=args.port, threads=args.threads)
+        else:
+            from werkzeug.serving import make_server
+            server = make_server(args.host, args.port, app, threaded=True)
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        compute_service.stop_pool()
+
+
+if __name__ == "__main__":
+    main()
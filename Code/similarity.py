@@ -0,0 +1,257 @@
+import itertools
+
+from core.cache import json_cache
+from config import BLOCKCHAIN_PATH, SIMILARITY_MAX_DISTANCE, SIMILARITY_MAX_RESULTS
+from config import SIMILARITY_KEYFRAMES, SIMILARITY_KEYFRAME_MIN_DISTANCE, VIDEO_FRAME_STEP
+
+HASH_BITS = 64
+DCT_SIZE = 32
+LOW_FREQ = 8
+
+# Multi-index hashing: the 64-bit hash is split into CHUNKS substrings of
+# CHUNK_BITS. Two hashes within distance r agree to within r // CHUNKS bits
+# on at least one substring (pigeonhole), so a query probes each chunk
+# table with every value that close and only checks those candidates.
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+_dct_matrix = None
+_probe_masks = {}
+
+
+# ================================
+# PERCEPTUAL HASH (pHash)
+# Grayscale, box-downscaled to 32x32, 2D DCT; bit i is set when low
+# frequency coefficient i (top-left 8x8) is above their median.
+# Re-encoding, resizing and mild colour changes move only a few bits.
+# ================================
+def _dct():
+    global _dct_matrix
+    if _dct_matrix is None:
+        import numpy as np
+        n = np.arange(DCT_SIZE)
+        _dct_matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * DCT_SIZE))
+    return _dct_matrix
+
+
+def phash(img):
+    """64-bit pHash of a PIL image, as 16 hex digits."""
+    import numpy as np
+    from PIL import Image
+
+    # Resize first: converting a gigapixel scan to "L" would copy it whole
+    small = img.resize((DCT_SIZE, DCT_SIZE), Image.BOX).convert("L")
+    return _phash_pixels(np.asarray(small, dtype=np.float64))
+
+
+def _phash_pixels(pixels):
+    import numpy as np
+
+    matrix = _dct()
+    coeffs = (matrix @ pixels @ matrix.T)[:LOW_FREQ, :LOW_FREQ].flatten()
+    bits = coeffs > np.median(coeffs)
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):016x}"
+
+
+def _box_weights(length):
+    """length x DCT_SIZE: how much of each source pixel falls in each output box."""
+    import numpy as np
+
+    edges = np.arange(DCT_SIZE + 1) * (length / DCT_SIZE)
+    x = np.arange(length)[:, None]
+    return np.clip(np.minimum(x + 1, edges[None, 1:]) - np.maximum(x, edges[None, :-1]), 0, None)
+
+
+class BandPHash:
+    """
+    phash() of an image read in bands (core.streaming.iter_bands): each band
+    is box-averaged into the 32x32 grid as it arrives, so the whole image is
+    never held for it. Agrees with phash() up to rounding (a bit or two).
+    """
+
+    def __init__(self, width, height, mode):
+        import numpy as np
+
+        self.mode = mode
+        self._cols = _box_weights(width)
+        self._rows = _box_weights(height)
+        self._sums = np.zeros((DCT_SIZE, DCT_SIZE))
+        self._area = (width / DCT_SIZE) * (height / DCT_SIZE)
+
+    def update(self, y, band):
+        import numpy as np
+        from PIL import Image
+
+        gray = np.asarray(Image.fromarray(band, self.mode).convert("L"), dtype=np.float64)
+        self._sums += self._rows[y:y + gray.shape[0]].T @ gray @ self._cols
+
+    def hexdigest(self):
+        import numpy as np
+
+        return _phash_pixels(np.round(self._sums / self._area))
+
+
+def image_phash(path):
+    from PIL import Image
+
+    with Image.open(path) as img:
+        if img.format == "JPEG":
+            img.draft("L", (DCT_SIZE * 2, DCT_SIZE * 2))  # decode at 1/2..1/8 scale
+        return phash(img)
+
+
+def distance(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def _step(count):
+    """Sampling step that spreads SIMILARITY_KEYFRAMES frames over `count`."""
+    return max(1, count // SIMILARITY_KEYFRAMES)
+
+
+def select_keyframes(hashes):
+    """
+    Keyframes of a video from the pHashes of its evenly spaced sample
+    frames: a frame within SIMILARITY_KEYFRAME_MIN_DISTANCE of the last
+    kept one adds nothing (static shots) and is skipped.
+    """
+    keyframes = []
+    for h in hashes:
+        if not keyframes or distance(h, keyframes[-1]) >= SIMILARITY_KEYFRAME_MIN_DISTANCE:
+            keyframes.append(h)
+    return keyframes[:SIMILARITY_KEYFRAMES]
+
+
+def frame_files_keyframes(frame_paths):
+    """
+    Keyframe hashes from extracted frame images (only the sampled ones are
+    decoded): every _step(len(frame_paths))-th extracted frame.
+    """
+    from PIL import Image
+
+    hashes = []
+    for path in frame_paths[::_step(len(frame_paths))]:
+        with Image.open(path) as img:
+            hashes.append(phash(img))
+    return select_keyframes(hashes)
+
+
+def video_keyframes(video_path):
+    """
+    Keyframe hashes straight from a video file (frames decoded in memory),
+    sampled exactly like registration: every VIDEO_FRAME_STEP-th frame as
+    extract_frames() keeps it, then frame_files_keyframes()' step over those.
+    The container's frame count is unreliable, so each kept frame is reduced
+    to phash()'s 32x32 grayscale input (1 KB) until the count is known.
+    """
+    import cv2
+    from PIL import Image
+
+    cap = cv2.VideoCapture(video_path)
+    thumbnails = []
+    index = 0
+    while cap.grab():
+        if index % VIDEO_FRAME_STEP == 0:
+            ok, frame = cap.retrieve()
+            if ok:
+                img = Image.fromarray(frame[:, :, ::-1])  # BGR -> RGB
+                thumbnails.append(img.resize((DCT_SIZE, DCT_SIZE), Image.BOX).convert("L"))
+        index += 1
+    cap.release()
+    return select_keyframes([phash(img) for img in thumbnails[::_step(len(thumbnails))]])
+
+
+def record_hashes(entry):
+    """The pHashes a registry record is indexed under ([] for records without any)."""
+    if entry.get("phash"):
+        return [entry["phash"]]
+    return list(entry.get("keyframe_phashes") or [])
+
+
+# ================================
+# INDEX (derived from the registry, like the SHA index)
+# ================================
+def _build_index(chain):
+    hashes = []
+    refs = []
+    tables = [{} for _ in range(CHUNKS)]
+    for ref_id, entry in chain.items():
+        for h in record_hashes(entry):
+            value = int(h, 16)
+            slot = len(hashes)
+            hashes.append(value)
+            refs.append(ref_id)
+            for i, table in enumerate(tables):
+                table.setdefault((value >> (i * CHUNK_BITS)) & CHUNK_MASK, []).append(slot)
+    return {"hashes": hashes, "refs": refs, "tables": tables,
+            "media_types": {ref_id: chain[ref_id].get("media_type") for ref_id in set(refs)}}
+
+
+def _load_index():
+    return json_cache.derive(BLOCKCHAIN_PATH, "similarity_index", _build_index, strict=True)
+
+
+def _masks(bits):
+    """XOR masks flipping up to `bits` of CHUNK_BITS bits."""
+    if bits not in _probe_masks:
+        _probe_masks[bits] = [sum(1 << b for b in combo)
+                              for k in range(bits + 1)
+                              for combo in itertools.combinations(range(CHUNK_BITS), k)]
+    return _probe_masks[bits]
+
+
+def _nearest(index, value, max_distance):
+    """{ref_id: smallest distance} of indexed hashes within max_distance of value."""
+    masks = _masks(max_distance // CHUNKS)
+    seen = set()
+    best = {}
+    for i, table in enumerate(index["tables"]):
+        chunk = (value >> (i * CHUNK_BITS)) & CHUNK_MASK
+        for mask in masks:
+            for slot in table.get(chunk ^ mask, ()):
+                if slot in seen:
+                    continue
+                seen.add(slot)
+                d = bin(index["hashes"][slot] ^ value).count("1")
+                if d <= max_distance:
+                    ref_id = index["refs"][slot]
+                    if d < best.get(ref_id, HASH_BITS + 1):
+                        best[ref_id] = d
+    return best
+
+
+def find_similar(hashes, max_distance=SIMILARITY_MAX_DISTANCE, limit=SIMILARITY_MAX_RESULTS, exclude=None):
+    """
+    Registered media perceptually close to `hashes` (one pHash for an
+    image, the keyframe hashes of a video). Ranked by how many of the
+    query hashes matched, then by mean distance:
+    [{"ref_id", "media_type", "distance", "similarity", "matched"}]
+    """
+    if not hashes:
+        return []
+    index = _load_index()
+    matches = {}
+    for h in hashes:
+        for ref_id, d in _nearest(index, int(h, 16), max_distance).items():
+            if ref_id != exclude:
+                matches.setdefault(ref_id, []).append(d)
+
+    ranked = sorted(matches.items(), key=lambda item: (-len(item[1]), sum(item[1]) / len(item[1])))
+    results = []
+    for ref_id, distances in ranked[:limit]:
+        mean = sum(distances) / len(distances)
+        results.append({
+            "ref_id": ref_id,
+            "media_type": index["media_types"].get(ref_id),
+            "distance": round(mean, 2),
+            "similarity": round(1 - mean / HASH_BITS, 3),
+            "matched": f"{len(distances)}/{len(hashes)}"
+        })
+    return results
+
+
+def index_stats():
+    index = _load_index()
+    return {"hashes": len(index["hashes"]), "references": len(index["media_types"]),
+            "chunks": CHUNKS, "max_distance": SIMILARITY_MAX_DISTANCE}
@@ -0,0 +1,219 @@
+import io
+import time
+import zlib
+import struct
+
+import numpy as np
+from PIL import Image
+
+from config import STREAM_BAND_ROWS, MAX_IMAGE_PIXELS
+
+# =========================
+# LARGE TRUSTED IMAGES
+# PIL's decompression-bomb guard stays at its default for everything the
+# server decodes (uploads). Processes that only register files an operator
+# chose (bulk_register.py, register.py) lift it to MAX_IMAGE_PIXELS.
+# =========================
+def allow_large_images():
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+
+# =========================
+# BAND READER
+# Pixels are read and converted to the record's colour mode one band at a
+# time. Non-interlaced 8-bit PNGs (the usual lossless upload) are inflated
+# band by band, so no more than one band is ever decoded. Other formats
+# (JPEG, 16-bit / interlaced PNG, WebP) are decoded once in PIL's native
+# buffer (1 byte per channel) and cropped: a JPEG cannot be decoded in
+# parts, and draft() would change the pixels the record's hashes cover.
+# =========================
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # colour type -> samples per pixel
+
+
+class BandImage:
+    """A source image on disk, read through iter_bands(). Each pass re-reads the file."""
+
+    def __init__(self, path, mode):
+        self.path = path
+        self.mode = mode
+        with Image.open(path) as img:  # header only (and PIL's decompression-bomb check)
+            self.size = img.size
+            self.format = img.format
+        width, height = self.size
+        if width * height > MAX_IMAGE_PIXELS:
+            raise ValueError(f"Image of {width}x{height} exceeds MAX_IMAGE_PIXELS ({MAX_IMAGE_PIXELS}).")
+        self._png = _png_header(path) if self.format == "PNG" else None
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    def bands(self, rows=STREAM_BAND_ROWS):
+        if self._png is not None:
+            for y, band in _png_bands(self.path, self._png, rows):
+                yield y, np.asarray(band if band.mode == self.mode else band.convert(self.mode))
+            return
+
+        with Image.open(self.path) as img:
+            width, height = img.size
+            for y in range(0, height, rows):
+                band = img.crop((0, y, width, min(y + rows, height)))
+                yield y, np.asarray(band if band.mode == self.mode else band.convert(self.mode))
+
+
+def open_image(path, mode):
+    """The image at path, to be read in bands of `mode` pixels (see iter_bands)."""
+    return BandImage(path, mode)
+
+
+def iter_bands(img, rows=STREAM_BAND_ROWS):
+    """Yields (y, HxW[x3] uint8 array) for horizontal bands of `rows` pixel rows."""
+    if isinstance(img, BandImage):
+        yield from img.bands(rows)
+        return
+    width, height = img.size
+    for y in range(0, height, rows):
+        yield y, np.asarray(img.crop((0, y, width, min(y + rows, height))))
+
+
+def _png_header(path):
+    """IHDR fields when the PNG can be inflated band by band, else None."""
+    with open(path, "rb") as f:
+        head = f.read(33)
+    if head[:8] != _PNG_SIGNATURE or head[12:16] != b"IHDR":
+        return None
+    width, height, depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", head[16:29])
+    if depth != 8 or interlace or color_type not in _PNG_CHANNELS:
+        return None
+    return {"width": width, "height": height, "color_type": color_type}
+
+
+def _png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def _png_bands(path, header, rows):
+    """
+    Yields (y, PIL image) per band of a non-interlaced 8-bit PNG. The
+    filtered scanlines of each band are inflated and handed to PIL as a
+    small PNG of their own, led by the previous band's last row (unfiltered,
+    as filter type 0) so the band's first row unfilters against it.
+    """
+    width, height = header["width"], header["height"]
+    stride = 1 + width * _PNG_CHANNELS[header["color_type"]]
+    band_bytes = stride * rows
+    extra_chunks = b""  # PLTE / tRNS
+    inflater = zlib.decompressobj()
+    pending = bytearray()
+    previous = None
+    y = 0
+
+    def decode(filtered):
+        nonlocal previous, y
+        count = len(filtered) // stride
+        lead = 1 if previous is not None else 0
+        ihdr = struct.pack(">IIBBBBB", width, count + lead, 8, header["color_type"], 0, 0, 0)
+        data = (b"\x00" + previous if lead else b"") + bytes(filtered)
+        png = (_PNG_SIGNATURE + _png_chunk(b"IHDR", ihdr) + extra_chunks
+               + _png_chunk(b"IDAT", zlib.compress(data, 0)) + _png_chunk(b"IEND", b""))
+        band = Image.open(io.BytesIO(png))
+        band.load()
+        if lead:
+            band = band.crop((0, 1, width, count + 1))
+        previous = band.crop((0, count - 1, width, count)).tobytes()
+        band_y, y = y, y + count
+        return band_y, band
+
+    with open(path, "rb") as f:
+        f.seek(len(_PNG_SIGNATURE))
+        while y < height:
+            size_tag = f.read(8)
+            if len(size_tag) < 8:
+                break
+            length, tag = struct.unpack(">I4s", size_tag)
+            if tag == b"IEND":
+                break
+            if tag != b"IDAT":
+                data = f.read(length)
+                if tag in (b"PLTE", b"tRNS"):
+                    extra_chunks += _png_chunk(tag, data)
+                f.seek(4, 1)  # CRC
+                continue
+
+            remaining = length
+            while remaining:
+                data = f.read(min(remaining, 1 << 20))
+                if not data:
+                    break
+                remaining -= len(data)
+                # max_length: a tiny, highly compressed chunk never inflates past one band
+                while data:
+                    pending += inflater.decompress(data, band_bytes)
+                    data = inflater.unconsumed_tail
+                    while len(pending) >= band_bytes and y < height:
+                        yield decode(pending[:band_bytes])
+                        del pending[:band_bytes]
+            f.seek(4, 1)
+
+    pending += inflater.flush()
+    pending = pending[:(height - y) * stride]
+    if len(pending) >= stride:
+        yield decode(pending[:len(pending) - len(pending) % stride])
+    if y < height:
+        raise ValueError(f"Truncated PNG: {y} of {height} rows.")
+
+
+# =========================
+# INCREMENTAL PNG WRITER
+# Rows are filtered (type 0) and deflated as they arrive, so a forensic
+# output never exists in memory as a whole image.
+# =========================
+_PNG_COLOR_TYPES = {"L": 0, "RGB": 2}
+
+class PNGStreamWriter:
+    def __init__(self, path, width, height, mode="RGB", compress_level=6):
+        self.width = width
+        self.mode = mode
+        self._f = open(path, "wb")
+        self._z = zlib.compressobj(compress_level)
+        self.encode_seconds = 0.0  # filter + deflate + write, summed over bands
+
+        self._f.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, _PNG_COLOR_TYPES[mode], 0, 0, 0))
+
+    def _chunk(self, tag, data):
+        self._f.write(struct.pack(">I", len(data)))
+        self._f.write(tag)
+        self._f.write(data)
+        self._f.write(struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF))
+
+    def write_rows(self, rows):
+        started = time.perf_counter()
+        rows = np.ascontiguousarray(rows, dtype=np.uint8).reshape(rows.shape[0], -1)
+        filtered = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 0
+        filtered[:, 1:] = rows
+        data = self._z.compress(filtered.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+        self.encode_seconds += time.perf_counter() - started
+
+    def close(self):
+        if self._f.closed:
+            return
+        started = time.perf_counter()
+        self._chunk(b"IDAT", self._z.flush())
+        self._chunk(b"IEND", b"")
+        self._f.close()
+        self.encode_seconds += time.perf_counter() - started
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,77 @@
+import os
+import json
+from functools import partial
+
+import numpy as np
+from PIL import Image
+
+import config
+from services import artifact_service
+from services.image_register_service import register_image
+from services.image_verify_service import verify_image
+
+
+def _tampered_upload():
+    pixels = np.random.default_rng(7).integers(0, 256, (96, 128, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save("original.png")
+    assert register_image("IMG001", "original.png", "alice")["status"] == "registered"
+    pixels[10:30, 10:30] = 255 - pixels[10:30, 10:30]
+    Image.fromarray(pixels).save("edited.png")
+
+
+def _name(url):
+    return url.rsplit("/", 1)[-1]
+
+
+def test_lazy_job_from_a_worker_is_deferred_as_json_and_rendered_by_the_front(workdir, monkeypatch):
+    _tampered_upload()
+
+    # Inline reference render in this process
+    inline = verify_image("IMG001", "edited.png")
+    assert inline["status"] == "TAMPERED"
+    assert artifact_service.resolve(_name(inline["details"]["clean_url"]))["status"] == "ready"
+
+    # A compute worker: the lazy clean reconstruction is handed over as a JSON spec
+    monkeypatch.setattr(artifact_service, "_detached", False)
+    monkeypatch.setattr(artifact_service, "ASYNC_ARTIFACTS", True)
+    artifact_service.detach()
+    worker = verify_image("IMG001", "edited.png")
+    forensic, clean = _name(worker["details"]["reconstructed_url"]), _name(worker["details"]["clean_url"])
+    with open(os.path.join(config.ARTIFACT_DEFERRED_DIR, clean + ".json")) as f:
+        spec = json.load(f)
+    assert spec["renderer"] == "services.image_verify_service:_render_clean_image"
+    assert spec["args"][:3] == ["edited.png", "RGB", "IMG001"]
+    assert not os.path.exists(os.path.join(config.RECONSTRUCTED_DIR, clean))
+    assert artifact_service.resolve(forensic)["status"] == "ready"  # the eager overlay still renders here
+
+    # The front process (empty job table) rebuilds and renders it on first request
+    monkeypatch.setattr(artifact_service, "_detached", False)
+    artifact_service._jobs.invalidate()
+    assert artifact_service.resolve(clean)["status"] == "ready"
+    assert os.listdir(config.ARTIFACT_DEFERRED_DIR) == []
+
+    with Image.open(os.path.join(config.RECONSTRUCTED_DIR, clean)) as a, \
+            Image.open(os.path.join(config.RECONSTRUCTED_DIR, _name(inline["details"]["clean_url"]))) as b:
+        assert np.array_equal(np.asarray(a), np.asarray(b))
+
+
+def test_only_registered_renderers_are_deferred_or_adopted(workdir, monkeypatch):
+    monkeypatch.setattr(artifact_service, "_detached", False)
+    artifact_service.detach()
+
+    def closure(path):
+        raise AssertionError("not rendered in this test")
+
+    assert not artifact_service._defer("a.png", closure)
+    assert not artifact_service._defer("b.png", partial(json.dumps, "x"))
+    assert os.listdir(config.ARTIFACT_DEFERRED_DIR) == []
+
+    # A spec naming anything else is never imported or called
+    with open(os.path.join(config.ARTIFACT_DEFERRED_DIR, "c.png.json"), "w") as f:
+        json.dump({"renderer": "os:remove", "args": ["original.png"]}, f)
+    assert artifact_service._load_deferred("c.png") is None
+    assert artifact_service.resolve("c.png", wait=0)["status"] == "missing"
+
+
+def test_deferred_jobs_are_not_janitor_files():
+    assert config.ARTIFACT_DEFERRED_DIR not in config.ARTIFACT_DIRS
@@ -0,0 +1,58 @@
+import os
+import logging
+
+import pytest
+
+import audit
+import metrics
+
+
+@pytest.fixture
+def audit_log(workdir, monkeypatch):
+    audit.flush()  # nothing left over from another test
+    monkeypatch.setattr(audit, "_thread", None)  # every event is written synchronously
+    yield
+    audit.flush()
+
+
+def _events(**filters):
+    return [(e["event"], e.get("ref_id")) for e in audit.query_audit(**filters)["events"]]
+
+
+def test_events_are_queried_newest_first_with_filters(audit_log):
+    audit.log_event("REGISTER", "Alice", ref_id="IMG1")
+    audit.log_event("VERIFY", "bob", ref_id="IMG1", status="AUTHENTIC")
+    audit.log_event("VERIFY", "alice", ref_id="IMG2", status="TAMPERED")
+
+    assert _events() == [("VERIFY", "IMG2"), ("VERIFY", "IMG1"), ("REGISTER", "IMG1")]
+    assert _events(username="ALICE") == [("VERIFY", "IMG2"), ("REGISTER", "IMG1")]
+    assert _events(event="verify", ref_id="IMG1") == [("VERIFY", "IMG1")]
+    page = audit.query_audit(limit=1, offset=1)
+    assert [e["ref_id"] for e in page["events"]] == ["IMG1"] and page["has_more"]
+
+
+def test_rotated_segments_are_still_queried(audit_log, monkeypatch):
+    monkeypatch.setattr(audit, "AUDIT_MAX_BYTES", 200)
+    for i in range(6):
+        audit.log_event("VERIFY", "alice", ref_id=f"IMG{i}")
+    assert audit._rotated_files()
+    assert [ref for _, ref in _events()] == [f"IMG{i}" for i in reversed(range(6))]
+
+
+def test_failed_flush_keeps_the_events_and_is_counted(audit_log, caplog):
+    metrics.reset()
+    os.makedirs(os.path.dirname(audit.AUDIT_DIR), exist_ok=True)
+    with open(audit.AUDIT_DIR, "w"):  # a file where the directory should be
+        pass
+
+    with caplog.at_level(logging.ERROR, logger="audit"):
+        audit.log_event("LOGIN", "alice")
+    assert "Audit flush failed" in caplog.text
+    assert audit.get_metrics()["buffered"] == 1
+    assert "audit_flush_failures_total 1" in metrics.render()
+    assert _events() == [("LOGIN", None)]  # still visible from the buffer
+
+    os.remove(audit.AUDIT_DIR)
+    assert audit.flush() == 1
+    assert audit.get_metrics()["buffered"] == 0
+    assert _events() == [("LOGIN", None)]
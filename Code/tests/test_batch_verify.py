@@ -0,0 +1,43 @@
+import numpy as np
+from PIL import Image
+
+from core.media_types import detect_media_type
+from services import batch_verify_service, compute_service
+from services.image_register_service import register_image
+
+
+def _png(path, seed):
+    pixels = np.random.default_rng(seed).integers(0, 256, (96, 128, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path)
+    return pixels
+
+
+def test_detect_media_type():
+    assert detect_media_type("a/B.JPG") == "image"
+    assert detect_media_type("clip.mp4") == "video"
+    assert detect_media_type("notes.txt") is None
+
+
+def test_batch_verdicts_and_forensics_on_the_compute_pool(workdir, monkeypatch):
+    pixels = _png("original.png", 1)
+    assert register_image("IMG001", "original.png", "alice")["status"] == "registered"
+    pixels[10:30, 10:30] = 255 - pixels[10:30, 10:30]
+    Image.fromarray(pixels).save("edited.png")
+    _png("unknown.png", 2)
+
+    calls = []
+    real_run = compute_service.run
+    monkeypatch.setattr(compute_service, "run", lambda fn, *a, **kw: calls.append(fn.__name__) or real_run(fn, *a, **kw))
+
+    items = [
+        {"path": "original.png"},
+        {"path": "edited.png", "ref_id": "img001"},
+        {"path": "unknown.png"},
+        {"path": "notes.txt"},
+    ]
+    results = sorted(batch_verify_service.verify_batch(items, workers=2), key=lambda r: r["index"])
+
+    assert [r["status"] for r in results] == ["AUTHENTIC", "TAMPERED", "UNREGISTERED", "ERROR"]
+    assert results[0]["details"]["matched_id"] == "IMG001"
+    assert [r["media_type"] for r in results] == ["image", "image", "image", None]
+    assert calls == ["verify_image"]  # only the mismatch needs forensics
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+import bulk_register
+from core import registry
+from core import checkpoints
+from core.ledger import load_ledger
+
+
+def _images(root, count):
+    os.makedirs(root, exist_ok=True)
+    for i in range(count):
+        pixels = np.random.default_rng(i).integers(0, 256, (64, 80, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(os.path.join(root, f"img{i}.png"))
+
+
+def _ledger_refs():
+    return [block.get("reference_id") for _, block in sorted(load_ledger().items(), key=lambda kv: int(kv[0]))][1:]
+
+
+def test_directory_is_registered_once(workdir):
+    _images("archive", 4)
+    stats = bulk_register.run(bulk_register.iter_directory("archive", "ARC/", "importer"), workers=2, commit_size=3)
+    assert (stats["registered"], stats["duplicates"], stats["errors"]) == (4, 0, 0)
+    assert sorted(_ledger_refs()) == [f"ARC/img{i}" for i in range(4)]
+    assert registry.get_reference("ARC/img0")["owner"] == "importer"
+
+    again = bulk_register.run(bulk_register.iter_directory("archive", "ARC/", "importer"), workers=1)
+    assert (again["registered"], again["skipped"]) == (0, 4)
+    assert len(_ledger_refs()) == 4
+
+
+def test_commit_skips_records_registered_concurrently(workdir):
+    _images("archive", 3)
+    pending = [bulk_register._process_item((f"ARC/img{i}", f"archive/img{i}.png", "importer")) for i in range(3)]
+
+    # An upload registers one of the ref_ids and another's content mid-run
+    registry.register_reference("ARC/img0", {"media_type": "image", "owner": "alice", "sha": "0" * 64})
+    registry.register_reference("UPLOAD/1", {"media_type": "image", "owner": "bob", "sha": pending[1]["sha"]})
+
+    committed = bulk_register.commit_batch(pending)
+    assert committed["duplicates"] == ["ARC/img0", "ARC/img1"]
+    assert list(committed["registered"]) == ["ARC/img2"]
+    assert registry.get_reference("ARC/img0")["owner"] == "alice"
+    assert registry.get_reference("ARC/img1") is None
+    assert _ledger_refs() == ["ARC/img2"]
+    assert committed["registered"]["ARC/img2"] == 1
+
+def test_refused_ledger_write_stops_the_run(workdir, monkeypatch):
+    _images("archive", 4)
+    monkeypatch.setattr(checkpoints, "check_history", lambda data: "Ledger history was rewritten.")
+
+    stats = bulk_register.run(bulk_register.iter_directory("archive", "ARC/", "importer"), workers=1, commit_size=2)
+    assert stats["ledger_error"] == "Ledger history was rewritten."
+    assert (stats["registered"], stats["errors"]) == (0, 2)
+    assert registry.get_reference("ARC/img0") is None
+    assert _ledger_refs() == []
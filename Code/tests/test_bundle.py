@@ -0,0 +1,87 @@
+import io
+import json
+import zipfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import bundle_verifier
+from core.ledger import load_ledger
+from services.bundle_service import export_bundle
+from services.image_register_service import register_image
+
+
+@pytest.fixture
+def bundle(workdir):
+    pixels = np.random.default_rng(3).integers(0, 256, (96, 128, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save("original.png")
+    assert register_image("IMG001", "original.png", "alice")["status"] == "registered"
+    pixels[10:30, 10:30] = 255 - pixels[10:30, 10:30]
+    Image.fromarray(pixels).save("edited.png")
+
+    exported = export_bundle("img001")
+    assert exported["status"] == "success" and exported["filename"] == "IMG001.bundle.zip"
+    with open(exported["filename"], "wb") as f:
+        f.write(exported["data"])
+    return exported["filename"]
+
+
+def _head():
+    ledger = load_ledger()
+    return ledger[str(len(ledger) - 1)]["block_hash"]
+
+
+def test_verdicts_need_a_trusted_head(bundle):
+    assert bundle_verifier.verify(bundle)["status"] == "UNANCHORED"
+    assert bundle_verifier.verify(bundle, "original.png")["status"] == "UNANCHORED"
+    assert bundle_verifier.verify(bundle, trusted_heads=[_head()])["status"] == "VALID_BUNDLE"
+
+    result = bundle_verifier.verify(bundle, "original.png", trusted_heads=[_head().upper()])
+    assert result["status"] == "AUTHENTIC"
+    assert result["details"]["reference_id"] == "IMG001"
+
+    # A head the segment does not reach anchors nothing
+    assert bundle_verifier.verify(bundle, "original.png", trusted_heads=["0" * 64])["status"] == "UNANCHORED"
+
+
+def test_tampered_blocks_are_located_offline(bundle):
+    result = bundle_verifier.verify(bundle, "edited.png", trusted_heads=[_head()])
+    assert result["status"] == "TAMPERED"
+    details = result["details"]
+    assert details["tampered_blocks"] >= 1 and 0 < details["tamper_score"] < 100
+    assert any(x <= 10 < x + w and y <= 10 < y + h for x, y, w, h in details["tamper_regions"])
+
+
+def _rewrite(path, edit):
+    with zipfile.ZipFile(path) as src:
+        files = {name: src.read(name) for name in src.namelist()}
+    manifest = json.loads(files["manifest.json"])
+    edit(manifest, files)
+    files["manifest.json"] = json.dumps(manifest).encode()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as dst:
+        for name, data in files.items():
+            dst.writestr(name, data)
+    with open(path, "wb") as f:
+        f.write(buffer.getvalue())
+
+
+def test_edited_bundles_are_invalid(bundle):
+    def swap_sha(manifest, files):
+        manifest["record"]["sha"] = "f" * 64
+    _rewrite(bundle, swap_sha)
+    result = bundle_verifier.verify(bundle, "edited.png", trusted_heads=[_head()])
+    assert result["status"] == "INVALID_BUNDLE"
+    assert "fingerprint" in result["message"]
+
+
+def test_edited_digests_are_invalid(bundle):
+    def flip_digest(manifest, files):
+        files["blocks.bin"] = bytes([files["blocks.bin"][0] ^ 1]) + files["blocks.bin"][1:]
+    _rewrite(bundle, flip_digest)
+    assert bundle_verifier.verify(bundle, trusted_heads=[_head()])["status"] == "INVALID_BUNDLE"
+
+
+def test_unknown_reference_has_no_bundle(workdir):
+    assert export_bundle("NOPE")["status"] == "error"
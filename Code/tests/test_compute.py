@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from werkzeug.exceptions import TooManyRequests, GatewayTimeout
+
+from services import compute_service
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # One worker, no queue. A thread stands in for the worker process: spawned
+    # children would not see the test-only package aliases from conftest.
+    monkeypatch.setattr(compute_service, "_workers", 1)
+    monkeypatch.setattr(compute_service, "_max_queue", 0)
+    monkeypatch.setattr(compute_service, "_executor", ThreadPoolExecutor(max_workers=1))
+    yield
+    compute_service.stop_pool()
+
+
+def test_without_a_pool_jobs_run_inline():
+    assert compute_service.stats()["enabled"] is False
+    assert compute_service.run(_sleep, 0) == 0
+
+
+def test_full_pool_rejects_and_a_slow_job_times_out(pool):
+    before = compute_service.stats()
+    assert compute_service.run(_sleep, 0) == 0
+
+    # The only worker is busy and there is no queue: the next job is refused
+    with pytest.raises(GatewayTimeout):
+        compute_service.run(_sleep, 2, timeout=0.2)
+    with pytest.raises(TooManyRequests) as excinfo:
+        compute_service.run(_sleep, 0)
+    assert excinfo.value.retry_after
+
+    stats = compute_service.stats()
+    assert stats["rejected"] == before["rejected"] + 1
+    assert stats["timeouts"] == before["timeouts"] + 1
+    assert stats["inflight"] == 1  # the timed-out job keeps its slot until it finishes
@@ -0,0 +1,85 @@
+import queue
+import sqlite3
+import threading
+
+import pytest
+
+import db
+from core.cache import LRUCache
+
+
+@pytest.fixture
+def pool(workdir, monkeypatch):
+    """An empty pool and user cache over a fresh users.db in the test directory."""
+    monkeypatch.setattr(db, "_pool", queue.LifoQueue(maxsize=db.DB_POOL_SIZE))
+    monkeypatch.setattr(db, "_opened", 0)
+    monkeypatch.setattr(db, "_user_cache", LRUCache(16))
+    db.init_db()
+    yield db._pool
+    while not db._pool.empty():
+        db._pool.get_nowait().close()
+
+
+def test_users_round_trip(pool):
+    assert db.create_user("alice", "alice@example.com", "s3cret")
+    assert not db.create_user("alice2", "alice@example.com", "other")  # email taken
+    assert db.get_user("alice@example.com", "alice", "s3cret")["username"] == "alice"
+    assert db.get_user("alice@example.com", "alice", "wrong") is None
+    assert db.get_user("alice@example.com", "bob", "s3cret") is None
+    assert db.get_user("nobody@example.com", "alice", "s3cret") is None
+
+
+def test_plain_text_passwords_are_upgraded_on_login(pool):
+    with db.get_connection() as conn:
+        conn.execute(db.SQL_INSERT_USER, ("legacy", "old@example.com", "plain", None))
+    assert db.get_user("old@example.com", "legacy", "plain")
+
+    with db.get_connection() as conn:
+        stored = conn.execute(db.SQL_SELECT_BY_EMAIL, ("old@example.com",)).fetchone()["password"]
+    assert stored.startswith(("pbkdf2:", "scrypt:"))
+    assert db.get_user("old@example.com", "legacy", "plain")
+
+
+def test_connections_are_reused_across_threads(pool):
+    db.create_user("alice", "alice@example.com", "s3cret")
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(20):
+                with db.get_connection() as conn:
+                    conn.execute(db.SQL_SELECT_BY_EMAIL, ("alice@example.com",)).fetchone()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(db.DB_POOL_SIZE * 2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert db._opened <= db.DB_POOL_SIZE
+    assert pool.qsize() == db._opened
+
+
+def test_exhausted_pool_times_out(pool, monkeypatch):
+    assert db._opened == 1  # init_db's connection
+    monkeypatch.setattr(db, "DB_POOL_SIZE", 1)
+    monkeypatch.setattr(db, "DB_BUSY_TIMEOUT_MS", 50)
+    with db.get_connection():
+        with pytest.raises(sqlite3.OperationalError, match="pool exhausted"):
+            with db.get_connection():
+                pass
+
+
+def test_a_failed_block_rolls_back_and_returns_the_connection(pool):
+    with pytest.raises(RuntimeError):
+        with db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(db.SQL_INSERT_USER, ("ghost", "ghost@example.com", "x", None))
+            raise RuntimeError("request failed")
+
+    assert pool.qsize() == db._opened
+    with db.get_connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute(db.SQL_SELECT_BY_EMAIL, ("ghost@example.com",)).fetchone() is None
@@ -0,0 +1,56 @@
+import io
+import os
+import time
+import hashlib
+
+import pytest
+from flask import Flask, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import ingest
+from config import UPLOAD_STAGING_DIR
+
+
+def _staged_parts():
+    if not os.path.isdir(UPLOAD_STAGING_DIR):
+        return []
+    return [name for name in os.listdir(UPLOAD_STAGING_DIR) if name.endswith(".part")]
+
+
+def test_upload_is_content_addressed_and_stored_once(workdir):
+    data = os.urandom(300 * 1024)
+    first = ingest.ingest_stream(io.BytesIO(data), "Photo.PNG", "uploads/images")
+    assert first["sha"] == hashlib.sha256(data).hexdigest()
+    assert first["path"] == os.path.join("uploads/images", first["sha"] + ".png")
+    assert first["size"] == len(data)
+
+    # Age the stored copy: re-uploading the same bytes reuses and refreshes it
+    old = time.time() - 3600
+    os.utime(first["path"], (old, old))
+    second = ingest.ingest_stream(io.BytesIO(data), "copy.png", "uploads/images")
+    assert second["path"] == first["path"]
+    assert os.path.getmtime(first["path"]) > old + 1800
+    assert os.listdir("uploads/images") == [os.path.basename(first["path"])]
+    assert _staged_parts() == []
+
+
+def test_oversized_upload_leaves_nothing_behind(workdir):
+    with pytest.raises(RequestEntityTooLarge):
+        ingest.ingest_stream(io.BytesIO(b"x" * 5000), "big.png", "uploads/images", max_bytes=4096)
+    assert os.listdir("uploads/images") == []
+    assert _staged_parts() == []
+
+
+def test_uploads_are_held_until_the_request_releases_them(workdir):
+    app = Flask(__name__)
+    app.request_class = ingest.IngestRequest
+
+    with app.test_request_context("/verify", method="POST"):
+        upload = ingest.ingest_stream(io.BytesIO(b"held"), "a.png", "uploads/images")
+        assert os.path.normpath(upload["path"]) in ingest.uploads_in_use()
+        request.release_uploads()
+    assert os.path.normpath(upload["path"]) not in ingest.uploads_in_use()
+
+    # Outside a request (CLI, bulk register) nothing would release a hold
+    cli = ingest.ingest_stream(io.BytesIO(b"cli"), "b.png", "uploads/images")
+    assert os.path.normpath(cli["path"]) not in ingest.uploads_in_use()
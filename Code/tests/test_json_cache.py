@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from core.cache import JSONFileCache
+
+
+def test_non_strict_fallback_is_not_cached_for_strict_callers(tmp_path):
+    path = str(tmp_path / "blockchain.json")
+    with open(path, "w") as f:
+        f.write('{"IMG001": {"sha": "ab')  # truncated write
+    cache = JSONFileCache()
+
+    # A lenient reader gets the default ...
+    assert cache.derive(path, "blocks", lambda data: list(data)) == []
+    assert cache.load(path) == {}
+
+    # ... but a strict reader of the same file must still see the corruption
+    with pytest.raises(ValueError):
+        cache.load(path, strict=True)
+    with pytest.raises(ValueError):
+        cache.derive(path, "index", dict, strict=True)
+
+
+def test_repaired_file_is_parsed_after_a_failure(tmp_path):
+    path = str(tmp_path / "ledger.json")
+    with open(path, "w") as f:
+        f.write("{")
+    cache = JSONFileCache()
+    assert cache.load(path) == {}
+
+    with open(path, "w") as f:
+        json.dump({"0": {"index": 0}}, f)
+    assert cache.load(path, strict=True) == {"0": {"index": 0}}
@@ -0,0 +1,91 @@
+import json
+import hashlib
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from core import checkpoints, registry
+from core.ledger import LEDGER_PATH, LedgerIntegrityError, append_to_ledger, load_ledger, rebuild_checkpoints
+from services.image_register_service import register_image
+
+
+@pytest.fixture
+def ledger(workdir):
+    for i in range(120):  # one checkpoint (block 100) and a tail after it
+        append_to_ledger(f"IMG{i:03d}", "%064x" % i, "alice", f"{i}.png", "image")
+
+
+def _rewrite_owner(index, owner):
+    """What an attacker with write access does: edit one block and rehash every block after it."""
+    with open(LEDGER_PATH) as f:
+        data = json.load(f)
+    data[str(index)]["owner"] = owner
+    for i in range(index, len(data)):
+        block = data[str(i)]
+        if i > index:
+            block["prev_hash"] = data[str(i - 1)]["block_hash"]
+        content = {k: v for k, v in block.items() if k != "block_hash"}
+        block["block_hash"] = hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+    with open(LEDGER_PATH, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def _statuses():
+    data = load_ledger()
+    return checkpoints.validate_tip(data)["status"], checkpoints.validate_full(data)["status"]
+
+
+def test_rewritten_history_is_not_repinned_by_the_next_append(ledger):
+    assert _statuses() == ("valid", "valid")
+    with open(checkpoints.LEDGER_CHECKPOINT_PATH) as f:
+        sidecar = f.read()
+
+    _rewrite_owner(50, "mallory")
+    assert _statuses() == ("invalid", "invalid")
+
+    # A legitimate registration must neither succeed on top of it nor make it valid again
+    with pytest.raises(LedgerIntegrityError):
+        append_to_ledger("IMG999", "f" * 64, "bob", "999.png", "image")
+    assert len(load_ledger()) == 121  # genesis + 120
+    assert _statuses() == ("invalid", "invalid")
+    with open(checkpoints.LEDGER_CHECKPOINT_PATH) as f:
+        assert f.read() == sidecar
+
+
+def test_rewrite_after_the_last_checkpoint_is_refused(ledger):
+    _rewrite_owner(110, "mallory")
+    assert _statuses() == ("invalid", "invalid")
+    with pytest.raises(LedgerIntegrityError):
+        append_to_ledger("IMG999", "f" * 64, "bob", "999.png", "image")
+
+
+def test_truncated_ledger_is_invalid(ledger):
+    data = dict(load_ledger())
+    for i in range(117, 120):
+        del data[str(i)]
+    with open(LEDGER_PATH, "w") as f:
+        json.dump(data, f)
+    assert _statuses() == ("invalid", "invalid")
+
+
+def test_operator_rebuild_accepts_the_current_history(ledger):
+    _rewrite_owner(50, "mallory")
+    rebuild_checkpoints()
+    assert _statuses() == ("valid", "valid")
+    assert append_to_ledger("IMG999", "f" * 64, "bob", "999.png", "image") == 121
+
+def test_refused_ledger_write_leaves_no_orphan_registry_entry(ledger):
+    pixels = np.random.default_rng(5).integers(0, 256, (64, 80, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save("b.png")
+    _rewrite_owner(50, "mallory")
+
+    result = register_image("B", "b.png", "bob")
+    assert result["status"] == "error" and "Ledger integrity" in result["message"]
+    assert registry.get_reference("B") is None
+    assert len(load_ledger()) == 121
+
+    rebuild_checkpoints()
+    result = register_image("B", "b.png", "bob")
+    assert result["status"] == "registered" and result["block_index"] == 121
+    assert registry.get_reference("B")["owner"] == "bob"
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from core.cache import json_cache
+from core.ledger import LEDGER_PATH, query_ledger
+
+
+@pytest.fixture
+def ledger(workdir):
+    # Two blocks a day from 2026-10-17 to 2026-10-20, owners alternating
+    data = {"0": {"index": 0, "timestamp": "2026-10-01 00:00:00", "owner": "genesis"}}
+    for i in range(1, 9):
+        day = 17 + (i - 1) // 2
+        hour = "08:00:00" if i % 2 else "23:59:30.250000"
+        data[str(i)] = {"index": i, "timestamp": f"2026-10-{day}T{hour}",
+                        "owner": "alice" if i % 2 else "bob", "reference_id": f"IMG{i}"}
+    with open(LEDGER_PATH, "w") as f:
+        json.dump(data, f)
+    json_cache.invalidate()
+    return data
+
+
+def _indexes(**kwargs):
+    return [block["index"] for block in query_ledger(**kwargs)["blocks"]]
+
+
+def test_date_only_until_covers_the_whole_day(ledger):
+    assert _indexes(since="2026-10-19", until="2026-10-19") == [5, 6]
+    assert _indexes(since="2026-10-18T00:00Z", until="2026-10-19T08:00") == [3, 4, 5]
+    assert _indexes(until="2026-10-17", owner="bob") == [2]
+    assert _indexes(since="2026-10-21") == []
+
+
+def test_time_range_pages_with_a_cursor_in_both_orders(ledger):
+    first = query_ledger(limit=2, since="2026-10-18", until="2026-10-19")
+    assert [b["index"] for b in first["blocks"]] == [3, 4]
+    assert first["has_more"]
+    assert _indexes(limit=2, cursor=first["next_cursor"], since="2026-10-18", until="2026-10-19") == [5, 6]
+
+    assert _indexes(order="desc", since="2026-10-18", until="2026-10-19") == [6, 5, 4, 3]
+    assert _indexes(order="desc", cursor=5, since="2026-10-18", until="2026-10-19") == [4, 3]
+    assert _indexes(order="desc", cursor=20, until="2026-10-17") == [2, 1, 0]
+
+
+def test_out_of_order_timestamps_are_still_filtered(ledger):
+    ledger["3"]["timestamp"] = "2026-10-30T00:00:00"  # clock jumped
+    with open(LEDGER_PATH, "w") as f:
+        json.dump(ledger, f)
+    json_cache.invalidate()
+    assert _indexes(since="2026-10-18", until="2026-10-19") == [4, 5, 6]
+    assert _indexes(since="2026-10-30") == [3]
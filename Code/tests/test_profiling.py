@@ -0,0 +1,21 @@
+import logging
+
+import metrics
+import profiling
+
+
+def test_a_profile_that_cannot_be_saved_is_logged_and_counted(client, monkeypatch, caplog):
+    metrics.reset()
+    monkeypatch.setattr(profiling, "should_profile", lambda header: "sample")
+
+    def broken_finish(session, **meta):
+        session["profiler"].disable()
+        profiling._current.reset(session["token"])
+        raise OSError("disk full")
+    monkeypatch.setattr(profiling, "finish", broken_finish)
+
+    with caplog.at_level(logging.ERROR):
+        response = client.post("/verify", data={"ref_id": "IMG1"})
+    assert response.status_code == 400  # the request itself is unaffected
+    assert "Saving profile" in caplog.text and "disk full" in caplog.text
+    assert "profile_failures_total 1" in metrics.render()
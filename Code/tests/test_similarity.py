@@ -0,0 +1,66 @@
+import hashlib
+
+import numpy as np
+from PIL import Image
+
+from core import similarity
+from services import image_verify_service
+from services.image_register_service import register_image
+
+
+def _scene(path, size=(160, 120)):
+    """A smooth picture: pHash survives re-encoding and resizing, unlike noise."""
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    pixels[height // 4:height // 2, width // 3:width // 2] = [250, 30, 30]
+    Image.fromarray(pixels.astype(np.uint8)).save(path)
+
+
+def _sha(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_resized_copy_is_found_but_unrelated_media_is_not(workdir):
+    _scene("original.png")
+    assert register_image("IMG001", "original.png", "alice")["status"] == "registered"
+
+    with Image.open("original.png") as img:
+        img.resize((120, 90)).save("copy.jpg", quality=85)
+    found = similarity.find_similar([similarity.image_phash("copy.jpg")])
+    assert [m["ref_id"] for m in found] == ["IMG001"]
+
+    Image.fromarray(np.random.default_rng(1).integers(0, 256, (120, 160, 3), dtype=np.uint8)).save("noise.png")
+    assert similarity.find_similar([similarity.image_phash("noise.png")]) == []
+
+
+def test_unregistered_precheck_asks_for_the_upload_that_finds_the_original(client):
+    _scene("original.png")
+    assert register_image("IMG001", "original.png", "alice")["status"] == "registered"
+    with Image.open("original.png") as img:
+        img.resize((120, 90)).save("copy.jpg", quality=85)
+
+    precheck = client.post("/verify/precheck", json={
+        "sha": _sha("copy.jpg"), "size": 1, "media_type": "image", "filename": "copy.jpg"
+    }).get_json()
+    assert precheck["status"] == "UPLOAD_REQUIRED"
+
+    with open("copy.jpg", "rb") as f:
+        verdict = client.post("/verify", data={"media": (f, "copy.jpg"), "media_type": "image"}).get_json()
+    assert verdict["status"] == "UNREGISTERED"
+    assert [m["ref_id"] for m in verdict["details"]["similar"]] == ["IMG001"]
+
+    # The exact original is still answered from its hash alone
+    exact = client.post("/verify/precheck", json={
+        "sha": _sha("original.png"), "size": 1, "media_type": "image", "filename": "original.png"
+    }).get_json()
+    assert exact["status"] == "AUTHENTIC"
+
+
+def test_without_similarity_search_the_precheck_is_final(client, monkeypatch):
+    monkeypatch.setattr(image_verify_service, "SIMILARITY_ENABLED", False)
+    precheck = client.post("/verify/precheck", json={
+        "sha": "a" * 64, "size": 1, "media_type": "image", "filename": "new.png"
+    }).get_json()
+    assert precheck["status"] == "UNREGISTERED"
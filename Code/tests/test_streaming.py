@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import subprocess
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from core import similarity
+from core.streaming import open_image, iter_bands
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _noise(height, width, channels, seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width, channels), dtype=np.uint8)
+    pixels[:, : width // 3] = 40  # a flat region, so the PNG encoder mixes filter types
+    return pixels
+
+
+def _read(path, mode, rows=64):
+    return np.concatenate([band for _, band in iter_bands(open_image(path, mode), rows)])
+
+
+@pytest.mark.parametrize("source_mode, channels", [("RGBA", 4), ("RGB", 3), ("L", 1)])
+@pytest.mark.parametrize("mode", ["RGB", "L", "YCbCr"])
+def test_png_bands_match_a_full_decode(tmp_path, source_mode, channels, mode):
+    path = str(tmp_path / "a.png")
+    Image.fromarray(_noise(300, 170, channels).squeeze(), source_mode).save(path)
+    assert open_image(path, mode).size == (170, 300)
+    assert np.array_equal(_read(path, mode), np.asarray(Image.open(path).convert(mode)))
+
+
+def test_palette_and_jpeg_sources(tmp_path):
+    rgb = Image.fromarray(_noise(200, 150, 3))
+    rgb.convert("P", palette=Image.ADAPTIVE).save(tmp_path / "p.png", transparency=2)
+    rgb.save(tmp_path / "a.jpg")
+    for name in ("p.png", "a.jpg"):
+        path = str(tmp_path / name)
+        assert np.array_equal(_read(path, "RGB"), np.asarray(Image.open(path).convert("RGB")))
+
+
+def test_truncated_png_is_an_error(tmp_path):
+    path = tmp_path / "a.png"
+    Image.fromarray(_noise(400, 200, 3)).save(path)
+    data = path.read_bytes()
+    path.write_bytes(data[: len(data) // 2])
+    with pytest.raises(ValueError):
+        _read(str(path), "RGB")
+
+
+def test_band_phash_matches_the_whole_image(tmp_path):
+    path = str(tmp_path / "a.png")
+    gradient = np.add.outer(np.arange(333), np.arange(517)) % 256
+    Image.fromarray(np.stack([gradient, gradient[::-1], gradient // 2], -1).astype(np.uint8)).save(path)
+    band_hash = similarity.BandPHash(517, 333, "RGB")
+    for y, band in iter_bands(open_image(path, "RGB"), 64):
+        band_hash.update(y, band)
+    assert similarity.distance(band_hash.hexdigest(), similarity.image_phash(path)) <= 2
+
+
+MEASURE = """
+import sys, json, resource
+sys.path.insert(0, sys.argv[1])
+import conftest
+from core.streaming import open_image, iter_bands
+from core.hashing import hash_tiles
+from core.similarity import BandPHash
+
+def read(path):
+    src = open_image(path, "RGB")
+    phash = BandPHash(*src.size, "RGB")
+    for y, band in iter_bands(src):
+        hash_tiles(band, 32)
+        phash.update(y, band)
+
+read(sys.argv[2])  # imports, allocator warm-up
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+read(sys.argv[3])
+print(json.dumps((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024))
+"""
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="peak RSS via the resource module")
+def test_reading_a_large_png_stays_within_a_few_bands(tmp_path):
+    # 2048 x 8192 RGBA: 64 MB decoded, 112 MB once converted to RGB whole
+    width, height = 2048, 8192
+    gradient = (np.arange(width, dtype=np.uint16)[None, :] + np.arange(height, dtype=np.uint16)[:, None]) % 256
+    pixels = np.repeat(gradient.astype(np.uint8)[..., None], 4, axis=2)
+    Image.fromarray(pixels, "RGBA").save(tmp_path / "large.png")
+    Image.fromarray(pixels[:256], "RGBA").save(tmp_path / "small.png")
+    del gradient, pixels
+
+    out = subprocess.run([sys.executable, "-c", MEASURE, TESTS_DIR, str(tmp_path / "small.png"),
+                          str(tmp_path / "large.png")], capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout) < 32  # MB
@@ -0,0 +1,44 @@
+import pytest
+
+import video_verify_service
+from core import registry
+from video_verify_service import verify_video_sha, precheck_video
+
+
+@pytest.fixture
+def videos(workdir):
+    registry.register_references({
+        "VID001": {"media_type": "video", "filename": "clip.mp4", "owner": "alice", "sha": "a" * 64},
+        "VID002": {"media_type": "video", "filename": "other.mp4", "owner": "bob", "sha": "b" * 64},
+    })
+
+
+def test_video_lookup_matches_by_sha_then_id_then_filename(videos):
+    authentic = verify_video_sha("", "b" * 64)
+    assert authentic["status"] == "AUTHENTIC"
+    assert authentic["details"]["matched_id"] == "VID002"
+
+    by_id = verify_video_sha(" vid001 ", "c" * 64)
+    assert by_id["status"] == "TAMPERED"
+    assert by_id["details"]["matched_id"] == "VID001"
+    assert by_id["details"]["expected_sha"] == "a" * 64
+
+    by_name = verify_video_sha("", "c" * 64, "clip.mp4")
+    assert by_name["details"]["matched_id"] == "VID001"
+
+    assert verify_video_sha("VID404", "c" * 64, "new.mp4")["status"] == "UNREGISTERED"
+
+
+def test_video_lookup_sees_new_registrations(videos):
+    assert verify_video_sha("", "d" * 64)["status"] == "UNREGISTERED"  # indexes now cached
+    registry.register_reference("VID003", {"media_type": "video", "filename": "new.mp4", "sha": "d" * 64})
+    assert verify_video_sha("", "d" * 64)["details"]["matched_id"] == "VID003"
+    assert verify_video_sha("", "e" * 64, "new.mp4")["details"]["matched_id"] == "VID003"
+
+def test_unregistered_precheck_needs_the_upload_for_similarity(videos, monkeypatch):
+    assert precheck_video("", "b" * 64)["status"] == "AUTHENTIC"
+    assert precheck_video("VID001", "c" * 64)["status"] == "TAMPERED"  # final: no pixels compared
+    assert precheck_video("", "c" * 64)["status"] == "UPLOAD_REQUIRED"
+
+    monkeypatch.setattr(video_verify_service, "SIMILARITY_ENABLED", False)
+    assert precheck_video("", "c" * 64)["status"] == "UNREGISTERED"
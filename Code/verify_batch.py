@@ -0,0 +1,63 @@
+import sys
+import os
+import json
+import argparse
+
+from services.batch_verify_service import verify_batch_ndjson
+from core.media_types import detect_media_type
+from config import BATCH_VERIFY_WORKERS
+
+# -------------------------------
+# Usage:
+#   python verify_batch.py <file-or-dir> [...] [--ref-map refs.json] [--workers N]
+# Prints one JSON result per file (NDJSON) followed by a summary line.
+# -------------------------------
+
+
+def collect_items(paths, ref_map):
+    items = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    items.append(os.path.join(root, name))
+        else:
+            items.append(path)
+
+    return [
+        {
+            "path": p,
+            "filename": os.path.basename(p),
+            "ref_id": ref_map.get(os.path.basename(p)) or ref_map.get(p, "")
+        }
+        for p in items
+        if detect_media_type(os.path.basename(p))
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify many media files against the registry in one run.")
+    parser.add_argument("paths", nargs="+", help="Media files or directories")
+    parser.add_argument("--ref-map", help="JSON file mapping filename (or path) -> reference ID")
+    parser.add_argument("--workers", type=int, default=BATCH_VERIFY_WORKERS)
+    args = parser.parse_args(argv)
+
+    ref_map = {}
+    if args.ref_map:
+        with open(args.ref_map, "r") as f:
+            ref_map = json.load(f)
+
+    items = collect_items(args.paths, ref_map)
+    if not items:
+        print("No supported media files found.", file=sys.stderr)
+        return 1
+
+    for line in verify_batch_ndjson(items, workers=args.workers):
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
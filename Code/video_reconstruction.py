@@ -36,7 +36,7 @@ def reconstruct_video_from_frames(frames_dir, output_path, fps=6):
             img_path = os.path.join(frames_dir, image)
             video.write(cv2.imread(img_path))
 
-        cv2.destroyAllWindows()
+        # No windows are opened here; cv2.destroyAllWindows() raises on headless OpenCV builds
         video.release()
         return True
 
@@ -1,14 +1,15 @@
 import os
-import json
-import hashlib
 from datetime import datetime
 
-from core_video.extract_frames import extract_frames
 from core_video.frame_hashing import hash_frame
 from core_video.video_merkle import video_merkle_root
-from core.hashing import sha256_bytes
-from core.registry import register_reference, get_reference
-from config import VIDEO_FRAMES_PATH
+from core.hashing import sha256_file
+from core.registry import add_references, get_reference, find_by_sha
+from core.ledger import append_to_ledger, LedgerIntegrityError
+from core.blockpack import write_pack
+from core import similarity
+from config import VIDEO_FRAMES_PATH, COMPACT_BLOCKS, SIMILARITY_ENABLED
+import metrics
 
 os.makedirs(VIDEO_FRAMES_PATH, exist_ok=True)
 
@@ -16,70 +17,56 @@ os.makedirs(VIDEO_FRAMES_PATH, exist_ok=True)
 # UPDATED: LEDGER LOGGING (With Blockchain Links)
 # ================================
 def log_to_ledger(ref_id, sha, owner, filename):
-    path = "registry/ledger.json"
-    data = {}
-    
-    # 1. Load Existing Chain
-    if os.path.exists(path):
-        with open(path, "r") as f:
-            try:
-                data = json.load(f)
-            except:
-                data = {}
-
-    # 2. Initialize Genesis Block if empty
-    if not data:
-        genesis_block = {
-            "index": 0,
-            "timestamp": str(datetime.utcnow()),
-            "filename": "GENESIS",
-            "media_type": "none",
-            "owner": "system",
-            "fingerprint": "0" * 64,
-            "prev_hash": "0" * 64,
-            "block_hash": hashlib.sha256(b"GENESIS_BLOCK").hexdigest()
-        }
-        data["0"] = genesis_block
-
-    # 3. Get Previous Block Info
-    indices = [int(k) for k in data.keys()]
-    last_index = max(indices) if indices else 0
-    prev_block = data[str(last_index)]
-    
-    prev_hash = prev_block.get("block_hash", "00000000000000000000000000000000_LEGACY")
-    new_index = last_index + 1
-
-    # 4. Create New Block Data
-    block_content = {
-        "index": new_index,
-        "reference_id": ref_id,
-        "media_type": "video",
-        "filename": filename,
-        "owner": owner,
-        "fingerprint": sha,
-        "timestamp": datetime.utcnow().isoformat(),
-        "prev_hash": prev_hash
-    }
+    return append_to_ledger(ref_id, sha, owner, filename, "video")
+
+
+# ================================
+# FRAME PROCESSING (No Registry Access)
+# Shared with bulk_register.py worker processes.
+# ================================
+def build_video_record(ref_id, video_path):
+    from core_video.extract_frames import extract_frames  # OpenCV, loaded on first use
+
+    frames_dir = os.path.join(VIDEO_FRAMES_PATH, ref_id)
+    os.makedirs(frames_dir, exist_ok=True)
+
+    with metrics.span("register.video.extract"):
+        frames = extract_frames(video_path, frames_dir)
 
-    # 5. Calculate Block Hash
-    block_string = json.dumps(block_content, sort_keys=True).encode()
-    current_block_hash = hashlib.sha256(block_string).hexdigest()
-    
-    block_content["block_hash"] = current_block_hash
+    frame_hashes = []
+    frame_indexes = []
 
-    # 6. Save
-    data[str(new_index)] = block_content
+    with metrics.span("register.video.hash_frames"):
+        for idx, frame_path in frames:
+            frame_hashes.append(hash_frame(frame_path))
+            frame_indexes.append(idx)
+    metrics.inc("frames_hashed_total", len(frame_hashes))
 
-    with open(path, "w") as f:
-        json.dump(data, f, indent=2)
+    with metrics.span("register.video.merkle"):
+        root = video_merkle_root(frame_hashes)
 
-    return new_index
+    # Keyframe perceptual hashes for near-duplicate search (core/similarity.py)
+    extra = {}
+    if SIMILARITY_ENABLED:
+        with metrics.span("register.video.phash"):
+            extra["keyframe_phashes"] = similarity.frame_files_keyframes([path for _, path in frames])
+
+    if not COMPACT_BLOCKS:
+        return {"merkle_root": root, "frames": frame_hashes, "frame_indexes": frame_indexes, **extra}
+
+    # Compact layout: frame digests in a side pack (indexes are always 0..n-1)
+    return {
+        "merkle_root": root,
+        "frames_pack": write_pack(frame_hashes),
+        "frame_count": len(frame_hashes),
+        **extra
+    }
 
 
 # ================================
 # REGISTER VIDEO FUNCTION
 # ================================
-def register_video(ref_id, video_path, owner):
+def register_video(ref_id, video_path, owner, sha=None, original_filename=None):
     ref_id = ref_id.strip()
 
     # ---- Basic Validation ----
@@ -96,58 +83,65 @@ def register_video(ref_id, video_path, owner):
             "message": "Reference ID already exists. Registration aborted."
         }
 
-    # ---- Compute Full Video SHA ----
-    with open(video_path, "rb") as f:
-        video_sha = sha256_bytes(f.read())
+    # ---- Compute Full Video SHA (unless supplied by the upload layer) ----
+    if not sha:
+        with metrics.span("register.video.sha"):
+            sha = sha256_file(video_path)
+    video_sha = sha
 
     # ---- Duplicate MEDIA Check ----
-    chain_path = "registry/blockchain.json"
-    if os.path.exists(chain_path):
-        with open(chain_path, "r") as f:
-            try:
-                chain = json.load(f)
-                for entry in chain.values():
-                    if entry.get("sha") == video_sha:
-                        return {
-                            "status": "duplicate",
-                            "message": "This video already exists on the blockchain.",
-                            "existing_ref": entry
-                        }
-            except:
-                pass
-
-    # ---- Extract Frames ----
-    frames_dir = os.path.join(VIDEO_FRAMES_PATH, ref_id)
-    os.makedirs(frames_dir, exist_ok=True)
-
-    frames = extract_frames(video_path, frames_dir)
-
-    frame_hashes = []
-    frame_indexes = []
-
-    for idx, frame_path in frames:
-        frame_hashes.append(hash_frame(frame_path))
-        frame_indexes.append(idx)
-
-    # ---- Merkle Root ----
-    merkle_root_hash = video_merkle_root(frame_hashes)
-
-    filename = os.path.basename(video_path)
-
-    # ---- Core Registry Write ----
-    register_reference(ref_id, {
-        "media_type": "video",
-        "filename": filename,
-        "owner": owner,
-        "sha": video_sha,
-        "merkle_root": merkle_root_hash,
-        "frames": frame_hashes,
-        "frame_indexes": frame_indexes,
-        "timestamp": datetime.utcnow().isoformat()
-    })
+    with metrics.span("register.video.lookup"):
+        existing_ref, existing = find_by_sha(video_sha)
+    if existing:
+        return {
+            "status": "duplicate",
+            "message": "This video already exists on the blockchain.",
+            "existing_ref": existing
+        }
 
-    # ---- Ledger Logging ----
-    block_index = log_to_ledger(ref_id, video_sha, owner, filename)
+    # ---- Extract Frames, Hash, Merkle Root ----
+    record = build_video_record(ref_id, video_path)
+
+    filename = original_filename or os.path.basename(video_path)
+
+    # ---- Near Duplicates (re-encoded copies are not SHA duplicates) ----
+    with metrics.span("register.similar"):
+        similar = similarity.find_similar(similarity.record_hashes(record))
+
+    # ---- Ledger Logging, then Core Registry Write (under the registry lock) ----
+    # A refused ledger write leaves no registry entry without a ledger block
+    def append_ledger(_fresh):
+        with metrics.span("register.ledger_append"):
+            return log_to_ledger(ref_id, video_sha, owner, filename)
+
+    with metrics.span("register.registry_write"):
+        try:
+            fresh, _, block_index = add_references({ref_id: {
+                "media_type": "video",
+                "filename": filename,
+                "owner": owner,
+                "sha": video_sha,
+                **record,
+                "timestamp": datetime.utcnow().isoformat()
+            }}, before_write=append_ledger)
+        except LedgerIntegrityError as e:
+            return {
+                "status": "error",
+                "message": f"Ledger integrity check failed, nothing was registered: {e}"
+            }
+
+    # ---- Registered by a concurrent request since the checks above ----
+    if not fresh:
+        if get_reference(ref_id):
+            return {
+                "status": "error",
+                "message": "Reference ID already exists. Registration aborted."
+            }
+        return {
+            "status": "duplicate",
+            "message": "This video already exists on the blockchain.",
+            "existing_ref": find_by_sha(video_sha)[1]
+        }
 
     return {
         "status": "registered",
@@ -155,6 +149,7 @@ def register_video(ref_id, video_path, owner):
         "media_type": "video",
         "sha": video_sha,
         "block_index": block_index,
-        "total_frames": len(frame_hashes),
-        "filename": filename
+        "total_frames": record.get("frame_count", len(record.get("frames", []))),
+        "filename": filename,
+        "similar": similar
     }
\ No newline at end of file
@@ -1,107 +1,119 @@
 import os
 import json
+import logging
+import importlib.util
 import uuid
 import traceback
 from werkzeug.utils import secure_filename
 
 # --- IMPORTS ---
-from core.hashing import sha256_bytes
-from config import VIDEO_FRAMES_PATH, OUTPUTS_DIR
+from core.hashing import sha256_file
+from core.registry import find_by_sha, find_reference, find_by_filename
+from core import similarity
+from config import VIDEO_FRAMES_PATH, OUTPUTS_DIR, SIMILARITY_ENABLED
+import metrics
 
-# Import the reconstruction tool safely
-try:
-    from core_video.video_reconstruction import reconstruct_video_from_frames
-except ImportError:
-    reconstruct_video_from_frames = None
+log = logging.getLogger(__name__)
 
-# =======================================================
-# HELPER: ROBUST BLOCKCHAIN LOADER
-# =======================================================
-def load_blockchain_blocks():
-    """Loads blocks from blockchain.json or ledger.json and normalizes IDs."""
-    blocks = []
-    
-    def load_from_file(path):
-        loaded = []
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                try:
-                    data = json.load(f)
-                    if isinstance(data, dict):
-                        # Inject Key as Ref ID
-                        for key, block in data.items():
-                            if isinstance(block, dict):
-                                if "reference_id" not in block:
-                                    block["reference_id"] = key
-                                loaded.append(block)
-                    elif isinstance(data, list):
-                        loaded = data
-                except: pass
-        return loaded
-
-    # Try Primary
-    blocks = load_from_file("registry/blockchain.json")
-    # Try Backup
-    if not blocks:
-        blocks = load_from_file("registry/ledger.json")
-        
-    return blocks
+# Import the reconstruction tool safely (and lazily: it pulls in OpenCV,
+# which hash-only video verification never needs)
+def _reconstruction_tool():
+    try:
+        from core_video.video_reconstruction import reconstruct_video_from_frames
+    except ImportError:
+        return None
+    return reconstruct_video_from_frames
+
+
+def _can_reconstruct():
+    # Whether OpenCV is installed, without importing it on every tampered verify
+    return importlib.util.find_spec("cv2") is not None
 
 # =======================================================
 # 1. VERIFY ONLY (FAST)
 # Checks hash & metadata. "Recommends" reconstruction if tampered.
 # =======================================================
-def verify_video(ref_id, video_path, original_filename=None):
-    # 1. Compute Hash
-    try:
-        with open(video_path, "rb") as f:
-            incoming_sha = sha256_bytes(f.read())
-    except Exception as e:
-        return {"status": "ERROR", "message": f"File read error: {e}"}
-
-    # 2. Load Blocks
-    blocks = load_blockchain_blocks()
-    matched_entry = None
-    
-    def normalize(s): return str(s).strip().lower() if s else ""
-    target_id = normalize(ref_id)
+def verify_video(ref_id, video_path, original_filename=None, sha=None):
+    # 1. Compute Hash (unless supplied by the upload layer)
+    incoming_sha = sha
+    if not incoming_sha:
+        try:
+            with metrics.span("verify.video.sha"):
+                incoming_sha = sha256_file(video_path)
+        except Exception as e:
+            return {"status": "ERROR", "message": f"File read error: {e}"}
+
+    result = verify_video_sha(ref_id, incoming_sha, original_filename)
+
+    # Unregistered: suggest likely originals from keyframe pHashes
+    if result["status"] == "UNREGISTERED" and SIMILARITY_ENABLED:
+        try:
+            with metrics.span("verify.video.similar"):
+                result["details"]["similar"] = similarity.find_similar(similarity.video_keyframes(video_path))
+        except Exception:
+            metrics.inc("similarity_failures_total")
+            log.exception("Similarity search failed")
+            result["details"]["similar"] = []
+    return result
+
+
+# =======================================================
+# 1b. VERIFY BY HASH
+# Video verification never looks past the SHA, so a client-supplied
+# hash (see /verify/precheck) is enough to reach a final verdict.
+# =======================================================
+def verify_video_sha(ref_id, incoming_sha, original_filename=None):
+    with metrics.span("verify.video.lookup"):
+        return _match_video(ref_id, incoming_sha, original_filename)
+
+
+def precheck_video(ref_id, incoming_sha, original_filename=None):
+    """
+    verify_video_sha for /verify/precheck: an unregistered hash needs the
+    upload when the keyframe similarity search is on (see verify_video).
+    """
+    result = verify_video_sha(ref_id, incoming_sha, original_filename)
+    if result["status"] == "UNREGISTERED" and SIMILARITY_ENABLED:
+        return {
+            "status": "UPLOAD_REQUIRED",
+            "message": "No exact match. Upload the file to search for similar registered videos.",
+            "details": {"incoming_sha": incoming_sha}
+        }
+    return result
+
+
+def _match_video(ref_id, incoming_sha, original_filename):
+    # Indexed registry lookups (cached until the registry changes), no block scan
+    matched_key, matched_entry = None, None
 
     # STRATEGY 1: Search by HASH (Authentic)
-    for block in blocks:
-        stored_sha = block.get("sha") or block.get("fingerprint")
-        if stored_sha == incoming_sha:
-            return {
-                "status": "AUTHENTIC",
-                "details": {
-                    "sha": incoming_sha,
-                    "matched_id": block.get("reference_id"),
-                    "matched_filename": block.get("filename"),
-                    "tamper_score": 0
-                }
+    key, entry = find_by_sha(incoming_sha)
+    if entry:
+        return {
+            "status": "AUTHENTIC",
+            "details": {
+                "sha": incoming_sha,
+                "matched_id": key,
+                "matched_filename": entry.get("filename"),
+                "tamper_score": 0
             }
+        }
 
     # STRATEGY 2: Search by ID (Tampered)
-    if target_id:
-        for block in blocks:
-            bid = block.get("reference_id") or block.get("ref_id") or block.get("id")
-            if normalize(bid) == target_id:
-                matched_entry = block
-                break
+    if ref_id and str(ref_id).strip():
+        matched_key, matched_entry = find_reference(str(ref_id).strip())
 
     # STRATEGY 3: Search by Filename (Last Resort)
     if not matched_entry and original_filename:
-        for block in blocks:
-            if block.get("filename") == original_filename:
-                matched_entry = block
-                break
+        matched_key, matched_entry = find_by_filename(original_filename)
 
     # FINAL DECISION
     if matched_entry:
-        target_ref_id = matched_entry.get("reference_id")
+        target_ref_id = matched_key
         
         # Check if frames exist (THE RECOMMENDATION)
         frames_dir = os.path.join(VIDEO_FRAMES_PATH, str(target_ref_id))
-        can_reconstruct = os.path.exists(frames_dir) and (reconstruct_video_from_frames is not None)
+        can_reconstruct = os.path.exists(frames_dir) and _can_reconstruct()
 
         return {
             "status": "TAMPERED",
@@ -150,8 +162,10 @@ def reconstruct_video_content(ref_id):
     os.makedirs(OUTPUTS_DIR, exist_ok=True)
 
     # 3. Run Reconstruction Tool
+    reconstruct_video_from_frames = _reconstruction_tool()
     if reconstruct_video_from_frames:
-        success = reconstruct_video_from_frames(frames_dir, rec_path)
+        with metrics.span("reconstruct.video"):
+            success = reconstruct_video_from_frames(frames_dir, rec_path)
         
         if success and os.path.exists(rec_path):
             return f"/outputs/{rec_filename}"